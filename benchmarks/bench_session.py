@@ -0,0 +1,926 @@
+"""
+Benchmarks of realistic sessions, run end-to-end through the client,
+decoder and wrapper against a local :class:`ib_insync.mocktws.MockTWS`.
+
+Usage::
+
+    python benchmarks/bench_session.py [--memory] [scenario ...]
+    python benchmarks/bench_session.py replay session.cap [--speed 0]
+
+Scenarios:
+
+* startup: connect with 10k open orders;
+* ticks: stream 500k ticks for 100 tickers;
+* orders: order acknowledgement latency, one at a time and in bulk;
+* lines: snapshots of 2000 contracts over 100 market data lines,
+  in batches, rotated and streamed;
+* depth: 500k L2 depth updates of a 10-level book, kept in lists
+  and in arrays;
+* smartdepth: top 5 levels of a 40-row SMART depth book consolidated
+  across market makers, re-aggregated and incremental;
+* bars: 1M trade ticks through the Tickfilter bar and rolling
+  aggregators, each with a bounded history;
+* framing: bursts of 1k, 10k and 100k tick messages through the frame
+  parser of the client, against the former parser that re-sliced the
+  buffer for every message as baseline;
+* decode: a 200k-message corpus of ticks, order statuses and account
+  values through the decoder with a no-op wrapper, against the former
+  generic message handlers as baseline;
+* compact: memory per object of 3000 instances of Ticker, BarData,
+  RealTimeBar, Execution and OrderStatus against their slotted compact
+  variants, and the attribute access time of both tickers;
+* columns: 500k intraday and daily bars received as columns and
+  converted with to_pandas, against a BarDataList and util.df as
+  baseline, and the memory that the received bars take;
+* status: order status changes, duplicate statuses and openOrder
+  updates of 1000 existing trades through the wrapper, against the
+  former change detection that merged dicts as baseline;
+* serialize: placeOrder, reqMktData and cancelMktData requests for
+  200 contracts, encoded into a connection that discards them, against
+  the former serialization without contract cache as baseline;
+* replay: replay a recorded session capture.
+
+The mock server runs in the same process and event loop, but it sends
+pre-encoded data in large writes so that its share of the time is small.
+With ``--memory`` the scenarios are run again under tracemalloc to
+report the memory in use by the session at its end, and the peak.
+"""
+
+import argparse
+import asyncio
+import copy
+import datetime
+import io
+import math
+import random
+import statistics
+import struct
+import time
+import tracemalloc
+
+from ib_insync import (
+    AggregatedBook, BarData, Client, CompactBarData, CompactExecution,
+    CompactOrderStatus, CompactRealTimeBar, CompactTicker, Contract,
+    Execution, IB, LimitOrder, Option, OrderState, OrderStatus,
+    RealTimeBar, Stock, Ticker, Trade, TradeLogEntry, Wrapper, util)
+from ib_insync.decoder import Decoder
+from ib_insync.mktdatalines import MktDataLines
+from ib_insync.mocktws import MockSession, MockTWS, SessionCapture, encode
+from ib_insync.ticker import Tickfilter
+
+UNSET = '1.7976931348623157E308'
+UNSET_INT = '2147483647'
+
+
+def openOrderMsgs(orderId: int, clientId: int, permId: int) -> bytes:
+    """Encoded openOrder and orderStatus of a limit order."""
+    symbol = f'SYM{orderId % 500}'
+    fields = [
+        5, orderId, 1000 + orderId % 500, symbol, 'STK', '', 0, '', '',
+        'SMART', 'USD', symbol, 'NMS', 'BUY', 100, 'LMT', 10.5, 0, 'DAY',
+        '', 'DU123456', 'O', 0, 'ref', clientId, permId, 0, 0, 0, '', '',
+        '', '', '',
+        '', '', '', '', '', 0, '', '', 0, '', '', '', '', '', 0, 0, 0, 0,
+        '', 3, 0, 0, '', 0, 0, '', 0, '', UNSET,
+        0, 0, UNSET, '', '', '', '',
+        0, 0, 0,
+        '', '', '', '',
+        0, '', '', 0, 0,
+        '',
+        0, 0, 'Submitted', *[UNSET] * 12, '', '', 0, 0,
+        0,
+        'None', 0, UNSET, 0, 0, 0, 0, 0, '', '', '', UNSET, 0, 0, 0, '',
+        0, 0, 0,
+        UNSET_INT, UNSET_INT, UNSET, UNSET, UNSET]
+    return encode(*fields) + encode(
+        3, orderId, 'Submitted', 0, 100, 0, permId, 0, 0, clientId, '', 0)
+
+
+async def connect(mock: MockTWS, clientId: int = 1, ib=None) -> IB:
+    ib = ib or IB()
+    ib.client.MaxRequests = 0
+    await ib.connectAsync(port=mock.port, clientId=clientId, timeout=600)
+    return ib
+
+
+def sessionMemory() -> dict:
+    """Memory in use by the session, if memory is being traced."""
+    if not tracemalloc.is_tracing():
+        return {}
+    current, peak = tracemalloc.get_traced_memory()
+    return {'session (MB)': current / 1e6, 'peak (MB)': peak / 1e6}
+
+
+async def benchStartup(numOrders: int = 10000) -> dict:
+    mock = await MockTWS().startAsync()
+    clientId = 1
+
+    def reqOpenOrders(session: MockSession, fields):
+        session.write(b''.join(
+            openOrderMsgs(i, clientId, 100000 + i)
+            for i in range(1, numOrders + 1)) + encode(53, 1))
+
+    mock.handlers[5] = reqOpenOrders
+    t0 = time.perf_counter()
+    ib = await connect(mock, clientId)
+    dt = time.perf_counter() - t0
+    assert len(ib.openTrades()) == numOrders
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'open orders': numOrders,
+        'connect (s)': dt,
+        'orders/s': numOrders / dt}
+
+
+async def benchTicks(numTickers: int = 100, numTicks: int = 500000) -> dict:
+    mock = await MockTWS().startAsync()
+    reqIds = []
+    mock.handlers[1] = lambda session, fields: reqIds.append(int(fields[2]))
+    ib = await connect(mock)
+    tickers = [
+        ib.reqMktData(Stock(f'SYM{i}', 'SMART', 'USD'))
+        for i in range(numTickers)]
+    await ib.reqCurrentTimeAsync()
+    assert len(reqIds) == numTickers
+
+    # bid, ask and last price with size, and the volume,
+    # in packets of 100 messages
+    packets = []
+    for i in range(0, numTicks, 100):
+        packet = []
+        for j in range(i, min(i + 100, numTicks)):
+            reqId = reqIds[j % numTickers]
+            kind = j % 4
+            if kind < 3:
+                packet.append(encode(
+                    1, 6, reqId, (1, 2, 4)[kind], 100 + j % 50 / 100,
+                    100, 0))
+            else:
+                packet.append(encode(2, 6, reqId, 8, j))
+        packets.append(b''.join(packet))
+
+    session = mock.sessions[0]
+    t0 = time.perf_counter()
+    for packet in packets:
+        session.write(packet)
+        await asyncio.sleep(0)
+    await ib.reqCurrentTimeAsync()
+    dt = time.perf_counter() - t0
+    assert tickers[-1].volume > 0
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'tickers': numTickers,
+        'ticks': numTicks,
+        'ticks/s': numTicks / dt}
+
+
+async def benchOrders(numOrders: int = 1000) -> dict:
+    mock = await MockTWS().startAsync()
+    ib = await connect(mock)
+    contract = Stock('AAPL', 'SMART', 'USD', conId=265598)
+
+    latencies = []
+    for _ in range(numOrders):
+        t0 = time.perf_counter()
+        trade = ib.placeOrder(contract, LimitOrder('BUY', 100, 10))
+        await trade.statusEvent
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+
+    t0 = time.perf_counter()
+    trades, acked = ib.placeOrders([
+        (contract, LimitOrder('BUY', 100, 10)) for _ in range(numOrders)])
+    await acked
+    dt = time.perf_counter() - t0
+    assert all(t.orderStatus.status == 'Submitted' for t in trades)
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'orders': numOrders,
+        'ack median (us)': statistics.median(latencies) * 1e6,
+        'ack p99 (us)': latencies[int(0.99 * len(latencies))] * 1e6,
+        'bulk acks/s': numOrders / dt}
+
+
+async def benchLines(numContracts: int = 2000, budget: int = 100) -> dict:
+    mock = await MockTWS().startAsync()
+    loop = asyncio.get_event_loop()
+    rnd = random.Random(1)
+
+    def reqMktData(session: MockSession, fields):
+        # answer a snapshot after a long-tailed delay of up to 110 ms
+        reqId = fields[2]
+
+        def answer():
+            session.send(1, 6, reqId, 4, 100.5, 10, 0)
+            session.send(57, 1, reqId)
+
+        loop.call_later(min(0.11, rnd.lognormvariate(-4, 0.8)), answer)
+
+    mock.handlers[1] = reqMktData
+    ib = await connect(mock)
+    contracts = [
+        Stock(f'SYM{i}', 'SMART', 'USD') for i in range(numContracts)]
+
+    t0 = time.perf_counter()
+    for i in range(0, numContracts, budget):
+        await ib.reqTickersAsync(*contracts[i:i + budget])
+        if not i:
+            dtBatchedFirst = time.perf_counter() - t0
+    dtBatched = time.perf_counter() - t0
+
+    lines = MktDataLines(ib, budget)
+    t0 = time.perf_counter()
+    coverages = await lines.rotateAsync(contracts)
+    dtRotated = time.perf_counter() - t0
+    latencies = sorted(c.latency for c in coverages)
+
+    t0 = time.perf_counter()
+    numTickers = 0
+    async for ticker in lines.snapshots(contracts):
+        if not numTickers:
+            dtStreamedFirst = time.perf_counter() - t0
+        numTickers += 1
+    dtStreamed = time.perf_counter() - t0
+    assert numTickers == numContracts
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'contracts': numContracts,
+        'batched/s': numContracts / dtBatched,
+        'rotated/s': numContracts / dtRotated,
+        'streamed/s': numContracts / dtStreamed,
+        'first batched (ms)': dtBatchedFirst * 1e3,
+        'first streamed (ms)': dtStreamedFirst * 1e3,
+        'latency median (ms)': statistics.median(latencies) * 1e3,
+        'latency p99 (ms)': latencies[int(0.99 * len(latencies))] * 1e3}
+
+
+def depthMsgs(reqId: int, numUpdates: int, numRows: int = 10) -> list:
+    """
+    Encoded L2 depth updates that keep a book of around ``numRows``
+    levels per side, as lists of fields and in packets of 100 messages.
+    """
+    rnd = random.Random(1)
+    numLevels = [0, 0]
+    updates = []
+    for i in range(numUpdates):
+        side = i % 2
+        n = numLevels[side]
+        r = rnd.random()
+        if n < numRows and (not n or r < 0.2):
+            operation = 0
+            position = rnd.randrange(n + 1)
+            numLevels[side] += 1
+        elif n >= numRows and r < 0.2:
+            operation = 2
+            position = rnd.randrange(n)
+            numLevels[side] -= 1
+        else:
+            operation = 1
+            position = rnd.randrange(n)
+        price = 100 + (position if side == 0 else -position) / 4
+        updates.append((
+            reqId, position, f'MM{position}', operation, side, price,
+            rnd.randrange(1, 50), 0))
+    packets = [
+        b''.join(encode(13, 1, *u) for u in updates[i:i + 100])
+        for i in range(0, numUpdates, 100)]
+    return updates, packets
+
+
+async def benchDepth(numUpdates: int = 500000) -> dict:
+    mock = await MockTWS().startAsync()
+    reqIds = []
+    mock.handlers[10] = lambda session, fields: reqIds.append(int(fields[2]))
+    result = {'updates': numUpdates}
+    listBids: list = []
+    for arrays in (False, True):
+        ib = IB()
+        ib.DepthBookArrays = arrays
+        await connect(mock, ib=ib)
+        ticker = ib.reqMktDepth(Stock('ES', 'SMART', 'USD'), 10)
+        await ib.reqCurrentTimeAsync()
+        updates, packets = depthMsgs(reqIds[-1], numUpdates)
+        name = 'arrays' if arrays else 'lists'
+
+        # through the wrapper only
+        wrapper = ib.wrapper
+        t0 = time.perf_counter()
+        for i, u in enumerate(updates):
+            wrapper.updateMktDepthL2(*u)
+            if i % 100 == 99:
+                ticker.domTicks.clear()
+        dt = time.perf_counter() - t0
+        result[f'{name} wrapper/s'] = numUpdates / dt
+
+        # end-to-end from the socket
+        session = mock.sessions[-1]
+        t0 = time.perf_counter()
+        for packet in packets:
+            session.write(packet)
+            await asyncio.sleep(0)
+        await ib.reqCurrentTimeAsync()
+        dt = time.perf_counter() - t0
+        result[f'{name} end-to-end/s'] = numUpdates / dt
+        if arrays:
+            assert ticker.domBook and not ticker.domTicks
+            assert ticker.domBook.domLevels(1) == listBids
+        else:
+            listBids = list(ticker.domBids)
+        memory = sessionMemory()
+        ib.disconnect()
+    mock.stop()
+    return memory or result
+
+
+async def benchSmartDepth(
+        numUpdates: int = 200000, numRows: int = 40, topN: int = 5) -> dict:
+    mock = await MockTWS().startAsync()
+    reqIds = []
+    mock.handlers[10] = lambda session, fields: reqIds.append(int(fields[2]))
+    ib = IB()
+    ib.AggregateSmartDepth = True
+    await connect(mock, ib=ib)
+    contract = Stock('AAPL', 'SMART', 'USD')
+    ticker = ib.reqMktDepth(contract, numRows, isSmartDepth=True)
+    await ib.reqCurrentTimeAsync()
+    updates, _ = depthMsgs(reqIds[-1], numUpdates, numRows)
+    # around four market makers per price
+    updates = [
+        (reqId, pos, f'MM{pos % 4}', op, side, 100 + (pos // 4) / 4
+            if side == 0 else 100 - (pos // 4) / 4, size, smart)
+        for reqId, pos, _, op, side, _, size, smart in updates]
+    wrapper = ib.wrapper
+
+    # re-aggregate the positional levels on every update
+    ticker.domAggregate = None
+    t0 = time.perf_counter()
+    for u in updates:
+        wrapper.updateMktDepthL2(*u)
+        totals: dict = {}
+        for level in ticker.domBids:
+            totals[level.price] = totals.get(level.price, 0) + level.size
+        top = sorted(totals.items(), reverse=True)[:topN]
+        ticker.domTicks.clear()
+    dtFull = time.perf_counter() - t0
+
+    # keep the aggregate incrementally
+    ticker.domBids.clear()
+    ticker.domAsks.clear()
+    book = ticker.domAggregate = AggregatedBook()
+    t0 = time.perf_counter()
+    for u in updates:
+        wrapper.updateMktDepthL2(*u)
+        top = book.bids(topN)
+        ticker.domTicks.clear()
+    dtIncremental = time.perf_counter() - t0
+    assert top == sorted(totals.items(), reverse=True)[:topN]
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'updates': numUpdates,
+        'rows': numRows,
+        're-aggregated/s': numUpdates / dtFull,
+        'incremental/s': numUpdates / dtIncremental}
+
+
+async def benchBars(numTicks: int = 1000000) -> dict:
+    # a random walk of trades, ten per second
+    rnd = random.Random(1)
+    startTime = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+    price = 100.0
+    ticks = []
+    for i in range(numTicks):
+        price = max(1.0, price + rnd.choice((-0.01, 0, 0.01)))
+        ticks.append((
+            startTime + datetime.timedelta(seconds=i / 10), price,
+            rnd.randrange(1, 500)))
+
+    aggregators = {
+        'no aggregator': lambda source: source,
+        'tickbars': lambda source: source.tickbars(100, 1000),
+        'volumebars': lambda source: source.volumebars(25000, 1000),
+        'dollarbars': lambda source: source.dollarbars(2.5e6, 1000),
+        'imbalancebars': lambda source: source.imbalancebars(20, 1000),
+        'vwap': lambda source: source.vwap(60),
+        'twap': lambda source: source.twap(60),
+        'volatility': lambda source: source.volatility(60),
+        'ewma': lambda source: source.ewma(0.01)}
+    result: dict = {'ticks': numTicks}
+    for name, create in aggregators.items():
+        source = Tickfilter((4,))
+        agg = create(source)
+        emit = source.emit
+        t0 = time.perf_counter()
+        for t, p, s in ticks:
+            emit(t, p, s)
+        dt = time.perf_counter() - t0
+        assert len(getattr(agg, 'bars', ())) <= 1250
+        result[f'{name} (ticks/s)'] = numTicks / dt
+    memory = sessionMemory()
+    return memory or result
+
+
+class NoopWrapper:
+    """Wrapper whose methods do nothing, to time the decoder alone."""
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def legacyFraming(client: Client, chunks: list):
+    """The frame parser as it was, re-slicing bytes for every message."""
+    data = b''
+    for chunk in chunks:
+        data += chunk
+        while len(data) > 4:
+            msgEnd = 4 + struct.unpack('>I', data[:4])[0]
+            if len(data) < msgEnd:
+                break
+            msg = data[4:msgEnd].decode(errors='backslashreplace')
+            data = data[msgEnd:]
+            fields = msg.split('\0')
+            fields.pop()
+            client.decoder.interpret(fields)
+
+
+async def benchFraming(chunkSize: int = 262144) -> dict:
+    result: dict = {}
+    for numMsgs in (1000, 10000, 100000):
+        burst = b''.join(
+            encode(1, 6, 1 + i % 100, 1, 100 + i % 50 / 100, 100, 0)
+            for i in range(numMsgs))
+        chunks = [
+            burst[i:i + chunkSize] for i in range(0, len(burst), chunkSize)]
+        for name in ('baseline', 'cursor'):
+            client = Client(NoopWrapper())
+            client._serverVersion = Client.MaxClientVersion
+            client._apiReady = True
+            numDecoded = 0
+
+            def interpret(fields):
+                nonlocal numDecoded
+                numDecoded += 1
+
+            client.decoder.interpret = interpret
+            t0 = time.perf_counter()
+            if name == 'baseline':
+                legacyFraming(client, chunks)
+            else:
+                for chunk in chunks:
+                    client._onSocketHasData(chunk)
+            dt = time.perf_counter() - t0
+            assert numDecoded == numMsgs
+            result[f'{name} {numMsgs // 1000}k (msgs/s)'] = numMsgs / dt
+    return result
+
+
+class LegacyDecoder(Decoder):
+    """
+    The decoder as it was, with generic handlers that look up the
+    wrapper method and dispatch on the field types for every message.
+    """
+
+    def __init__(self, wrapper, serverVersion: int):
+        super().__init__(wrapper, serverVersion)
+        self.handlers.update({
+            2: self.wrap(
+                'tickSize', [int, int, float]),
+            3: self.wrap(
+                'orderStatus', [
+                    int, str, float, float, float, int, int,
+                    float, int, str, float], skip=1),
+            45: self.wrap(
+                'tickGeneric', [int, int, float]),
+            46: self.wrap(
+                'tickString', [int, int, str])})
+
+    def wrap(self, methodName, types, skip=2):
+
+        def handler(fields):
+            method = getattr(self.wrapper, methodName, None)
+            if method:
+                try:
+                    args = [
+                        field if typ is str else
+                        int(field or 0) if typ is int else
+                        float(field or 0) if typ is float else
+                        bool(int(field or 0))
+                        for (typ, field) in zip(types, fields[skip:])]
+                    method(*args)
+                except Exception:
+                    self.logger.exception(f'Error for {methodName}:')
+
+        return handler
+
+
+async def benchDecode(numMsgs: int = 200000) -> dict:
+    rnd = random.Random(1)
+    corpus = []
+    for i in range(numMsgs):
+        reqId = str(1 + i % 100)
+        kind = rnd.random()
+        if kind < 0.4:
+            price = f'{100 + i % 50 / 100}'
+            fields = ['1', '6', reqId, '1', price, '100', '0']
+        elif kind < 0.7:
+            fields = ['2', '6', reqId, '8', str(i)]
+        elif kind < 0.8:
+            fields = ['46', '6', reqId, '45', str(1700000000 + i)]
+        elif kind < 0.85:
+            fields = ['45', '6', reqId, '49', '0']
+        elif kind < 0.95:
+            fields = [
+                '3', reqId, 'Submitted', str(i % 100), '100', '10.5',
+                str(100000 + i % 100), '0', '10.5', '1', '', '0']
+        else:
+            fields = ['6', '2', 'NetLiquidation', str(i), 'USD', 'DU123456']
+        corpus.append(fields)
+    result: dict = {'messages': numMsgs}
+    for name, cls in (('baseline', LegacyDecoder), ('compiled', Decoder)):
+        decoder = cls(NoopWrapper(), Client.MaxClientVersion)
+        interpret = decoder.interpret
+        t0 = time.perf_counter()
+        for fields in corpus:
+            interpret(fields)
+        dt = time.perf_counter() - t0
+        result[f'{name} (msgs/s)'] = numMsgs / dt
+    return result
+
+
+async def benchCompact(numObjects: int = 3000) -> dict:
+    pairs = [
+        (Ticker, CompactTicker), (BarData, CompactBarData),
+        (RealTimeBar, CompactRealTimeBar), (Execution, CompactExecution),
+        (OrderStatus, CompactOrderStatus)]
+    result: dict = {}
+    wasTracing = tracemalloc.is_tracing()
+    for classes in pairs:
+        for cls in classes:
+            if not wasTracing:
+                tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            objs = [cls() for _ in range(numObjects)]
+            size = tracemalloc.get_traced_memory()[0] - before
+            if not wasTracing:
+                tracemalloc.stop()
+            result[f'{cls.__name__} (B)'] = size / len(objs)
+            del objs
+
+    for cls in (Ticker, CompactTicker):
+        ticker = cls()
+        n = 1000000
+        t0 = time.perf_counter()
+        for i in range(n):
+            ticker.last = ticker.bid + i
+        dt = time.perf_counter() - t0
+        result[f'{cls.__name__} get+set (ns)'] = dt / n * 1e9
+    return result
+
+
+async def benchColumns(numBars: int = 500000) -> dict:
+    mock = await MockTWS().startAsync()
+    rnd = random.Random(1)
+    startTime = 1704200000
+    bodies = {}
+    for daily in (False, True):
+        fields = []
+        for i in range(numBars):
+            if daily:
+                date = (datetime.date(1990, 1, 1) + datetime.timedelta(
+                    days=i)).strftime('%Y%m%d')
+            else:
+                date = str(startTime + 60 * i)
+            price = 100 + rnd.random()
+            fields += [
+                date, price, price + 0.5, price - 0.5, price + 0.1,
+                rnd.randrange(100, 10000), price, rnd.randrange(1, 100)]
+        bodies[daily] = ''.join(f'{f}\0' for f in fields).encode()
+    daily = False
+
+    def reqHistoricalData(session: MockSession, fields):
+        head = f'17\0{fields[1]}\0\0\0{numBars}\0'.encode()
+        body = bodies[daily]
+        session.write(
+            struct.pack('>I', len(head) + len(body)) + head + body)
+
+    mock.handlers[20] = reqHistoricalData
+    ib = await connect(mock)
+    contract = Stock('AAPL', 'SMART', 'USD', conId=265598)
+    result: dict = {'bars': numBars}
+    wasTracing = tracemalloc.is_tracing()
+    for daily in (False, True):
+        barSize = '1 day' if daily else '1 min'
+        for name in ('baseline', 'columns'):
+            label = f'{"daily" if daily else "intraday"} {name}'
+            t0 = time.perf_counter()
+            if name == 'baseline':
+                bars = await ib.reqHistoricalDataAsync(
+                    contract, '', '1 Y', barSize, 'TRADES', True, timeout=0)
+            else:
+                bars = await ib.reqHistoricalDataColumnsAsync(
+                    contract, '', '1 Y', barSize, 'TRADES', True, timeout=0)
+            df = util.df(bars) if name == 'baseline' else bars.to_pandas()
+            dt = time.perf_counter() - t0
+            assert len(df) == numBars
+            del bars, df
+            result[f'{label} (bars/s)'] = numBars / dt
+
+            # memory kept per bar by the received bars
+            if not wasTracing:
+                tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            if name == 'baseline':
+                bars = await ib.reqHistoricalDataAsync(
+                    contract, '', '1 Y', barSize, 'TRADES', True, timeout=0)
+            else:
+                bars = await ib.reqHistoricalDataColumnsAsync(
+                    contract, '', '1 Y', barSize, 'TRADES', True, timeout=0)
+            size = tracemalloc.get_traced_memory()[0] - before
+            if not wasTracing:
+                tracemalloc.stop()
+            del bars
+            result[f'{label} (B/bar)'] = size / numBars
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or result
+
+
+class LegacyStatusWrapper(Wrapper):
+    """
+    Wrapper with the former change detection of order status and
+    open order updates, that merged dicts of the status fields and
+    assigned the order fields unconditionally.
+    """
+
+    def openOrder(self, orderId, contract, order, orderState):
+        key = self.orderKey(order.clientId, order.orderId, order.permId)
+        trade = self.trades.get(key)
+        if order.whatIf or not trade:
+            super().openOrder(orderId, contract, order, orderState)
+            return
+        trade.order.permId = order.permId
+        trade.order.totalQuantity = order.totalQuantity
+        trade.order.lmtPrice = order.lmtPrice
+        trade.order.auxPrice = order.auxPrice
+        trade.order.orderType = order.orderType
+        trade.order.orderRef = order.orderRef
+        self.tradeIndex.update(key, trade)
+        self.permId2Trade.setdefault(order.permId, trade)
+        self.ib.openOrderEvent.emit(trade)
+        self.ib.client.updateReqId(orderId + 1)
+
+    def orderStatus(
+            self, orderId, status, filled, remaining, avgFillPrice, permId,
+            parentId, lastFillPrice, clientId, whyHeld, mktCapPrice=0.0):
+        key = self.orderKey(clientId, orderId, permId)
+        trade = self.trades.get(key)
+        if not trade:
+            return
+        oldStatus = trade.orderStatus.status
+        new = dict(
+            status=status, filled=filled,
+            remaining=remaining, avgFillPrice=avgFillPrice,
+            permId=permId, parentId=parentId,
+            lastFillPrice=lastFillPrice, clientId=clientId,
+            whyHeld=whyHeld, mktCapPrice=mktCapPrice)
+        curr = util.dataclassAsDict(trade.orderStatus)
+        if curr != {**curr, **new}:
+            util.dataclassUpdate(trade.orderStatus, **new)
+            self.tradeIndex.update(key, trade)
+            logEntry = TradeLogEntry(self.lastTime, status, '')
+            self._appendLog(trade, logEntry)
+            self._logger.info(f'orderStatus: {trade}')
+            self.ib.orderStatusEvent.emit(trade)
+            trade.statusEvent.emit(trade)
+            if status != oldStatus and status in OrderStatus.DoneStates:
+                self.pruneTrades()
+
+
+async def benchStatus(numOrders: int = 1000, numRounds: int = 50) -> dict:
+    result: dict = {}
+    numMsgs = numOrders * numRounds
+    contract = Stock('AAPL', 'SMART', 'USD', conId=265598)
+    orderState = OrderState(status='Submitted')
+    for name in ('baseline', 'fields'):
+        ib = IB()
+        wrapper = ib.wrapper
+        if name == 'baseline':
+            wrapper = LegacyStatusWrapper(ib)
+        wrapper.clientId = 1
+        orders = []
+        for orderId in range(1, numOrders + 1):
+            order = LimitOrder(
+                'BUY', 100, 10, orderId=orderId, clientId=1,
+                permId=100000 + orderId)
+            orderStatus = OrderStatus(orderId=orderId, status='Submitted')
+            trade = Trade(contract, order, orderStatus, [], [])
+            key = (1, orderId)
+            wrapper.trades[key] = trade
+            wrapper.permId2Trade[order.permId] = trade
+            wrapper.tradeIndex.update(key, trade)
+            orders.append(order)
+
+        # partial fills change the status on every message
+        t0 = time.perf_counter()
+        for r in range(1, numRounds + 1):
+            for order in orders:
+                wrapper.orderStatus(
+                    order.orderId, 'Submitted', r, 100 - r, 10,
+                    order.permId, 0, 10, 1, '')
+        dt = time.perf_counter() - t0
+        result[f'{name} changed (msgs/s)'] = numMsgs / dt
+
+        # the same status again
+        t0 = time.perf_counter()
+        for _ in range(numRounds):
+            for order in orders:
+                wrapper.orderStatus(
+                    order.orderId, 'Submitted', numRounds,
+                    100 - numRounds, 10, order.permId, 0, 10, 1, '')
+        dt = time.perf_counter() - t0
+        result[f'{name} duplicate (msgs/s)'] = numMsgs / dt
+
+        # openOrder of the existing trades
+        t0 = time.perf_counter()
+        for _ in range(numRounds):
+            for order in orders:
+                wrapper.openOrder(
+                    order.orderId, contract, copy.copy(order), orderState)
+        dt = time.perf_counter() - t0
+        result[f'{name} openOrder (msgs/s)'] = numMsgs / dt
+    return result
+
+
+class NoopConnection:
+    """Connection that discards the sent data, to time the client alone."""
+
+    numBytesSent = 0
+    numMsgSent = 0
+
+    def sendMsgs(self, msgs):
+        pass
+
+
+class LegacyClient(Client):
+    """Client with the former serialization, without a contract cache."""
+
+    def send(self, *fields, makeEmpty=True):
+        msg = io.StringIO()
+        empty = (None, util.UNSET_INTEGER, util.UNSET_DOUBLE) \
+            if makeEmpty else (None,)
+        for field in fields:
+            typ = type(field)
+            if field in empty:
+                s = ''
+            elif typ is str:
+                s = field
+            elif typ is float:
+                s = 'Infinite' if field == math.inf else str(field)
+            elif typ is bool:
+                s = '1' if field else '0'
+            elif typ is list:
+                # list of TagValue
+                s = ''.join(f'{v.tag}={v.value};' for v in field)
+            elif isinstance(field, Contract):
+                c = field
+                s = '\0'.join(str(f) for f in (
+                    c.conId, c.symbol, c.secType,
+                    c.lastTradeDateOrContractMonth, c.strike,
+                    c.right, c.multiplier, c.exchange,
+                    c.primaryExchange, c.currency,
+                    c.localSymbol, c.tradingClass))
+            else:
+                s = str(field)
+            msg.write(s)
+            msg.write('\0')
+        self.sendMsg(msg.getvalue())
+
+
+async def benchSerialize(
+        numContracts: int = 200, numRounds: int = 250) -> dict:
+    contracts = [
+        Stock(f'SYM{i}', 'SMART', 'USD', conId=1000 + i)
+        if i % 2 else
+        Option('SPY', '20240119', 400 + i, 'C', 'SMART', conId=1000 + i)
+        for i in range(numContracts)]
+    order = LimitOrder('BUY', 100, 10.5, account='DU123456')
+    numMsgs = numContracts * numRounds
+    result: dict = {}
+    for name, cls in (('baseline', LegacyClient), ('cached', Client)):
+        client = cls(NoopWrapper())
+        client.MaxRequests = 0
+        client.reset()
+        client.conn = NoopConnection()
+        client.connState = Client.CONNECTED
+        client._serverVersion = Client.MaxClientVersion
+        requests = {
+            'placeOrder': lambda i, c: client.placeOrder(i, c, order),
+            'reqMktData': lambda i, c: client.reqMktData(
+                i, c, '', False, False, []),
+            'cancelMktData': lambda i, c: client.cancelMktData(i)}
+        for reqName, request in requests.items():
+            t0 = time.perf_counter()
+            for _ in range(numRounds):
+                for i, contract in enumerate(contracts, 1):
+                    request(i, contract)
+            dt = time.perf_counter() - t0
+            result[f'{name} {reqName} (msgs/s)'] = numMsgs / dt
+    return result
+
+
+async def benchReplay(path: str, speed: float = 0) -> dict:
+    capture = SessionCapture.load(path)
+    numMsgs = 0
+    tickReqIds = set()
+    for fields in capture.messages():
+        numMsgs += 1
+        if fields[0] in ('1', '2', '45', '46'):
+            tickReqIds.add(int(fields[2]))
+
+    # have tickers for the market data in the capture, as if subscribed
+    ib = IB()
+    for reqId in tickReqIds:
+        ib.wrapper.startTicker(reqId, Contract(conId=reqId), 'mktData')
+
+    mock = await MockTWS(capture=capture, speed=speed).startAsync()
+    t0 = time.perf_counter()
+    await connect(mock, ib=ib)
+    await mock.sessions[0].replayTask
+    await ib.reqCurrentTimeAsync()
+    dt = time.perf_counter() - t0
+    memory = sessionMemory()
+    ib.disconnect()
+    mock.stop()
+    return memory or {
+        'messages': numMsgs,
+        'duration (s)': dt,
+        'msgs/s': numMsgs / dt}
+
+
+def run(name: str, coro, memory: bool):
+    if memory:
+        tracemalloc.start()
+    try:
+        result = util.run(coro)
+    finally:
+        if memory:
+            tracemalloc.stop()
+    print(f'{name:8}', '  '.join(
+        f'{k}: {v:,.1f}' if isinstance(v, float) else f'{k}: {v:,}'
+        for k, v in result.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        'scenarios', nargs='*',
+        default=[
+            'startup', 'ticks', 'orders', 'lines', 'depth',
+            'smartdepth', 'bars', 'framing', 'decode', 'compact',
+            'columns', 'status', 'serialize'])
+    parser.add_argument(
+        '--memory', action='store_true',
+        help='also measure memory with tracemalloc')
+    parser.add_argument(
+        '--speed', type=float, default=0,
+        help='replay speed, 0 for as fast as possible')
+    args = parser.parse_args()
+
+    benches = {
+        'startup': benchStartup,
+        'ticks': benchTicks,
+        'orders': benchOrders,
+        'lines': benchLines,
+        'depth': benchDepth,
+        'smartdepth': benchSmartDepth,
+        'bars': benchBars,
+        'framing': benchFraming,
+        'decode': benchDecode,
+        'compact': benchCompact,
+        'columns': benchColumns,
+        'status': benchStatus,
+        'serialize': benchSerialize}
+    if args.scenarios[0] == 'replay':
+        for path in args.scenarios[1:]:
+            run('replay', benchReplay(path, args.speed), False)
+            if args.memory:
+                run('replay', benchReplay(path, args.speed), True)
+        return
+    for name in args.scenarios:
+        run(name, benches[name](), False)
+        if args.memory:
+            run(name, benches[name](), True)
+
+
+if __name__ == '__main__':
+    main()
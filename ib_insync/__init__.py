@@ -12,11 +12,17 @@ from .contract import (
     ContractDescription, ContractDetails, Crypto, DeltaNeutralContract,
     Forex, Future, FuturesOption, Index, MutualFund, Option, ScanData, Stock,
     TagValue, Warrant)
+from .contractcache import ContractDetailsCache
+from .download import BarCache, HistoricalDownloader
 from .flexreport import FlexError, FlexReport
 from .ib import IB
 from .ibcontroller import IBC, Watchdog
+from .journal import OrderJournal, TradeArchive
+from .mktdatalines import LineCoverage, MktDataLines
+from .mocktws import MockTWS, SessionCapture
 from .objects import (
-    AccountValue, BarData, BarDataList, CommissionReport, ConnectionStats,
+    AccountValue, BarData, BarDataColumns, BarDataList, CommissionReport,
+    CompactBarData, CompactExecution, CompactRealTimeBar, ConnectionStats,
     DOMLevel, DepthMktDataDescription, Dividends, Execution, ExecutionFilter,
     FamilyCode, Fill, FundamentalRatios, HistogramData, HistoricalNews,
     HistoricalSchedule, HistoricalSession, HistoricalTick,
@@ -24,15 +30,19 @@ from .objects import (
     NewsBulletin, NewsProvider, NewsTick, OptionChain, OptionComputation,
     PnL, PnLSingle, PortfolioItem,
     Position, PriceIncrement, RealTimeBar, RealTimeBarList, ScanDataList,
-    ScannerSubscription, SmartComponent, SoftDollarTier, TickAttrib,
-    TickAttribBidAsk, TickAttribLast, TickByTickAllLast, TickByTickBidAsk,
-    TickByTickMidPoint, TickData, TradeLogEntry, WshEventData)
+    ScannerSubscription, SmartComponent, SoftDollarTier, ThrottleStats,
+    TickAttrib, TickAttribBidAsk, TickAttribLast, TickByTickAllLast,
+    TickByTickBidAsk, TickByTickMidPoint, TickData, TradeLogEntry,
+    WshEventData)
 from .order import (
-    BracketOrder, ExecutionCondition, LimitOrder, MarginCondition, MarketOrder,
-    Order, OrderComboLeg, OrderCondition, OrderState, OrderStatus,
+    BracketOrder, CompactOrderStatus, ExecutionCondition, LimitOrder,
+    MarginCondition, MarketOrder, Order, OrderComboLeg, OrderCondition,
+    OrderState, OrderStatus,
     PercentChangeCondition, PriceCondition, StopLimitOrder, StopOrder,
     TimeCondition, Trade, VolumeCondition)
-from .ticker import Ticker
+from .pool import IBPool
+from .ticker import (
+    AggregatedBook, CompactTicker, DepthBook, TickBuffer, Ticker)
 from .version import __version__, __version_info__
 from .wrapper import RequestError, Wrapper
 
@@ -41,9 +51,14 @@ __all__ = [
     'Bag', 'Bond', 'CFD', 'ComboLeg', 'Commodity', 'ContFuture', 'Contract',
     'ContractDescription', 'ContractDetails', 'Crypto', 'DeltaNeutralContract',
     'Forex', 'Future', 'FuturesOption', 'Index', 'MutualFund', 'Option',
-    'ScanData', 'Stock', 'TagValue', 'Warrant', 'FlexError', 'FlexReport',
-    'IB', 'IBC', 'Watchdog',
-    'AccountValue', 'BarData', 'BarDataList', 'CommissionReport',
+    'ScanData', 'Stock', 'TagValue', 'Warrant', 'ContractDetailsCache',
+    'BarCache',
+    'HistoricalDownloader', 'FlexError', 'FlexReport',
+    'IB', 'IBC', 'IBPool', 'Watchdog', 'OrderJournal', 'TradeArchive',
+    'LineCoverage', 'MktDataLines', 'MockTWS', 'SessionCapture',
+    'AccountValue', 'BarData', 'BarDataColumns', 'BarDataList',
+    'CommissionReport',
+    'CompactBarData', 'CompactExecution', 'CompactRealTimeBar',
     'ConnectionStats', 'DOMLevel', 'DepthMktDataDescription', 'Dividends',
     'Execution', 'ExecutionFilter', 'FamilyCode', 'Fill', 'FundamentalRatios',
     'HistogramData', 'HistoricalNews', 'HistoricalTick',
@@ -52,14 +67,18 @@ __all__ = [
     'NewsArticle', 'NewsBulletin', 'NewsProvider', 'NewsTick', 'OptionChain',
     'OptionComputation', 'PnL', 'PnLSingle', 'PortfolioItem', 'Position',
     'PriceIncrement', 'RealTimeBar', 'RealTimeBarList', 'ScanDataList',
-    'ScannerSubscription', 'SmartComponent', 'SoftDollarTier', 'TickAttrib',
+    'ScannerSubscription', 'SmartComponent', 'SoftDollarTier', 'ThrottleStats',
+    'TickAttrib',
     'TickAttribBidAsk', 'TickAttribLast', 'TickByTickAllLast', 'WshEventData',
     'TickByTickBidAsk', 'TickByTickMidPoint', 'TickData', 'TradeLogEntry',
-    'BracketOrder', 'ExecutionCondition', 'LimitOrder', 'MarginCondition',
-    'MarketOrder', 'Order', 'OrderComboLeg', 'OrderCondition', 'OrderState',
-    'OrderStatus', 'PercentChangeCondition', 'PriceCondition',
+    'BracketOrder', 'CompactOrderStatus', 'ExecutionCondition', 'LimitOrder',
+    'MarginCondition', 'MarketOrder', 'Order', 'OrderComboLeg',
+    'OrderCondition', 'OrderState', 'OrderStatus', 'PercentChangeCondition',
+    'PriceCondition',
     'StopLimitOrder', 'StopOrder', 'TimeCondition', 'Trade', 'VolumeCondition',
-    'Ticker', '__version__', '__version_info__', 'RequestError', 'Wrapper'
+    'AggregatedBook', 'CompactTicker', 'DepthBook', 'TickBuffer', 'Ticker',
+    '__version__', '__version_info__',
+    'RequestError', 'Wrapper'
 ]
 
 
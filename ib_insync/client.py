@@ -1,20 +1,21 @@
 """Socket client for communicating with Interactive Brokers."""
 
 import asyncio
-import io
+import bisect
 import logging
 import math
+import operator
 import struct
 import time
-from collections import deque
-from typing import Deque, List, Optional
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
 
 from eventkit import Event
 
 from .connection import Connection
 from .contract import Contract
 from .decoder import Decoder
-from .objects import ConnectionStats, WshEventData
+from .objects import ConnectionStats, ThrottleStats, WshEventData
 from .util import UNSET_DOUBLE, UNSET_INTEGER, dataclassAsTuple, getLoop, run
 
 
@@ -46,7 +47,7 @@ class Client:
       combines price and size instead of the two wrapper methods
       priceTick and sizeTick.
 
-    * Automatic request throttling.
+    * Automatic request throttling, with priority for orders and cancels.
 
     * Optional ``wrapper.tcpDataArrived()`` method;
       If the wrapper has this method it is invoked directly after
@@ -62,10 +63,36 @@ class Client:
 
     Parameters:
       MaxRequests (int):
-        Throttle the number of requests to ``MaxRequests`` per
-        ``RequestsInterval`` seconds. Set to 0 to disable throttling.
+        Throttle the rate of requests to ``MaxRequests`` per
+        ``RequestsInterval`` seconds, using a token bucket.
+        Set to 0 to disable throttling altogether, including the
+        ``ClassBudgets``.
       RequestsInterval (float):
         Time interval (in seconds) for request throttling.
+      RequestsBurst (int):
+        Number of requests that can be sent at once on top of the
+        steady rate, so that at most ``MaxRequests + RequestsBurst``
+        requests are sent in any ``RequestsInterval``.
+        Note that this differs from the former sliding window, which
+        allowed a burst of the full ``MaxRequests`` at once: a bucket
+        that large would allow up to ``2 * MaxRequests`` requests
+        within one interval, beyond the 50 messages per second
+        that TWS accepts. The default of 5 keeps any interval at 50.
+        Set to ``MaxRequests`` for the old burst size at the cost of
+        that guarantee.
+      ClassBudgets (tuple):
+        Maximum number of requests per ``RequestsInterval`` for each
+        priority class (``ORDERS``, ``CANCELS``, ``MARKETDATA``,
+        ``REFERENCEDATA``), within the overall ``MaxRequests`` limit.
+        Set to 0 to have only the overall limit for a class. Throttled
+        requests are sent in order of priority class first, then in
+        order of arrival. A cancel or order modification is kept behind
+        any queued message with the same request or order ID, and a
+        cancel of a queued request drops both. A cancelled order is
+        still sent, as it may be a modification of a live order.
+      DelayBuckets (tuple):
+        Upper bounds (in seconds) of the buckets of the histogram of
+        throttling delays in :meth:`.connectionStats`.
       MinClientVersion (int):
         Client protocol version.
       MaxClientVersion (int):
@@ -77,18 +104,27 @@ class Client:
       * ``apiError`` (errorMsg: str)
       * ``throttleStart`` ()
       * ``throttleEnd`` ()
+      * ``classThrottleStart`` (priorityClass: int)
+      * ``classThrottleEnd`` (priorityClass: int)
     """
 
-    events = ('apiStart', 'apiEnd', 'apiError', 'throttleStart', 'throttleEnd')
+    events = (
+        'apiStart', 'apiEnd', 'apiError', 'throttleStart', 'throttleEnd',
+        'classThrottleStart', 'classThrottleEnd')
 
     MaxRequests = 45
     RequestsInterval = 1
+    RequestsBurst = 5
+    ClassBudgets = (0, 0, 0, 40)
+    DelayBuckets = (0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
 
     MinClientVersion = 157
     MaxClientVersion = 178
 
     (DISCONNECTED, CONNECTING, CONNECTED) = range(3)
 
+    (ORDERS, CANCELS, MARKETDATA, REFERENCEDATA) = range(4)
+
     def __init__(self, wrapper):
         self.wrapper = wrapper
         self.decoder = Decoder(wrapper, 0)
@@ -97,6 +133,8 @@ class Client:
         self.apiError = Event('apiError')
         self.throttleStart = Event('throttleStart')
         self.throttleEnd = Event('throttleEnd')
+        self.classThrottleStart = Event('classThrottleStart')
+        self.classThrottleEnd = Event('classThrottleEnd')
         self._logger = logging.getLogger('ib_insync.client')
 
         self.conn = Connection()
@@ -112,6 +150,7 @@ class Client:
         self.port = -1
         self.clientId = -1
         self.optCapab = ''
+        self._contractCache: OrderedDict[tuple, bytes] = OrderedDict()
         self.connectOptions = b''
         self.reset()
 
@@ -119,7 +158,8 @@ class Client:
         self.connState = Client.DISCONNECTED
         self._apiReady = False
         self._serverVersion = 0
-        self._data = b''
+        self._data = bytearray()
+        self._dataPos = 0
         self._hasReqId = False
         self._reqIdSeq = 0
         self._accounts = []
@@ -127,8 +167,20 @@ class Client:
         self._numBytesRecv = 0
         self._numMsgRecv = 0
         self._isThrottling = False
-        self._msgQ: Deque[str] = deque()
-        self._timeQ: Deque[float] = deque()
+        self._throttleHandle: Optional[asyncio.TimerHandle] = None
+        numClasses = len(self.ClassBudgets)
+        self._msgQs: List[Deque[Tuple[bytes, float, Optional[tuple]]]] = [
+            deque() for _ in range(numClasses)]
+        self._pending: Dict[tuple, List[int]] = {}
+        self._tokens = math.inf
+        self._classTokens = [math.inf] * numClasses
+        self._tokenTime = 0.0
+        self._delayCounts = [0] * len(self.DelayBuckets)
+        self._classThrottling = [False] * numClasses
+        self._numSent = [0] * numClasses
+        self._numDelayed = [0] * numClasses
+        self._totalDelay = [0.0] * numClasses
+        self._maxDelay = [0.0] * numClasses
 
     def serverVersion(self) -> int:
         return self._serverVersion
@@ -152,7 +204,19 @@ class Client:
             self._startTime,
             time.time() - self._startTime,
             self._numBytesRecv, self.conn.numBytesSent,
-            self._numMsgRecv, self.conn.numMsgSent)
+            self._numMsgRecv, self.conn.numMsgSent,
+            dict(zip(self.DelayBuckets, self._delayCounts)))
+
+    def throttleStats(self) -> List[ThrottleStats]:
+        """Get the throttling statistics of every priority class."""
+        return [
+            ThrottleStats(
+                priorityClass, len(self._msgQs[priorityClass]),
+                self._numSent[priorityClass],
+                self._numDelayed[priorityClass],
+                self._totalDelay[priorityClass],
+                self._maxDelay[priorityClass])
+            for priorityClass in range(len(self._msgQs))]
 
     def getReqId(self) -> int:
         """Get new request ID."""
@@ -162,6 +226,14 @@ class Client:
         self._reqIdSeq += 1
         return newId
 
+    def getReqIds(self, count: int) -> range:
+        """Get a block of ``count`` new request IDs."""
+        if not self.isReady():
+            raise ConnectionError('Not connected')
+        start = self._reqIdSeq
+        self._reqIdSeq += count
+        return range(start, start + count)
+
     def updateReqId(self, minReqId):
         """Update the next reqId to be at least ``minReqId``."""
         self._reqIdSeq = max(self._reqIdSeq, minReqId)
@@ -236,66 +308,203 @@ class Client:
         """Serialize and send the given fields using the IB socket protocol."""
         if not self.isConnected():
             raise ConnectionError('Not connected')
+        self.sendMsg(self._serialize(fields, makeEmpty))
 
-        msg = io.StringIO()
+    def _serialize(self, fields, makeEmpty=True) -> bytes:
         empty = (None, UNSET_INTEGER, UNSET_DOUBLE) if makeEmpty else (None,)
+        chunks: List[bytes] = []
+        parts: List[str] = []
+        append = parts.append
         for field in fields:
             typ = type(field)
-            if field in empty:
-                s = ''
-            elif typ is str:
-                s = field
-            elif type is int:
-                s = str(field)
+            if typ is str:
+                append(field)
+            elif typ is int:
+                append('' if field in empty else str(field))
             elif typ is float:
-                s = 'Infinite' if field == math.inf else str(field)
+                append(
+                    '' if field in empty else
+                    'Infinite' if field == math.inf else str(field))
+            elif field is None:
+                append('')
             elif typ is bool:
-                s = '1' if field else '0'
+                append('1' if field else '0')
             elif typ is list:
                 # list of TagValue
-                s = ''.join(f'{v.tag}={v.value};' for v in field)
+                append(''.join(f'{v.tag}={v.value};' for v in field))
             elif isinstance(field, Contract):
-                c = field
-                s = '\0'.join(str(f) for f in (
-                    c.conId, c.symbol, c.secType,
-                    c.lastTradeDateOrContractMonth, c.strike,
-                    c.right, c.multiplier, c.exchange,
-                    c.primaryExchange, c.currency,
-                    c.localSymbol, c.tradingClass))
+                append('')
+                chunks.append('\0'.join(parts).encode())
+                parts.clear()
+                chunks.append(self._encodeContract(field))
             else:
-                s = str(field)
-            msg.write(s)
-            msg.write('\0')
-        self.sendMsg(msg.getvalue())
+                append('' if field in empty else str(field))
+        append('')
+        msg = '\0'.join(parts).encode()
+        if chunks:
+            chunks.append(msg)
+            msg = b''.join(chunks)
+        return msg
+
+    def _encodeContract(self, contract: Contract) -> bytes:
+        # the encoded contract fields are cached by their values and
+        # types (as 100 and 100.0 are encoded differently), so that a
+        # modified contract is encoded anew; the least recently used
+        # contracts are evicted from the cache
+        values = _contractFields(contract)
+        key = (*values, *map(type, values))
+        cache = self._contractCache
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= 10000:
+                cache.popitem(last=False)
+            data = cache[key] = ('\0'.join(map(str, values)) + '\0').encode()
+        else:
+            cache.move_to_end(key)
+        return data
+
+    def sendMsg(self, msg: Union[bytes, str]):
+        self.sendMsgs([msg] if msg else [])
 
-    def sendMsg(self, msg: str):
+    def sendMsgs(self, msgs: List[Union[bytes, str]]):
+        """
+        Queue the given serialized messages and send as many queued
+        messages as throttling allows, written to the socket in a
+        single buffer.
+        """
         loop = getLoop()
         t = loop.time()
-        times = self._timeQ
-        msgs = self._msgQ
-        while times and t - times[0] > self.RequestsInterval:
-            times.popleft()
-        if msg:
-            msgs.append(msg)
-        while msgs and (len(times) < self.MaxRequests or not self.MaxRequests):
-            msg = msgs.popleft()
-            self.conn.sendMsg(self._prefix(msg.encode()))
-            times.append(t)
-            if self._logger.isEnabledFor(logging.DEBUG):
-                self._logger.debug('>>> %s', msg[:-1].replace('\0', ','))
-        if msgs:
+        for msg in msgs:
+            data = msg.encode() if isinstance(msg, str) else msg
+            msgId = data[:data.find(b'\0')]
+            priorityClass = _msgClasses.get(msgId, Client.MARKETDATA)
+            key = None
+            index = _reqIdFields.get(msgId)
+            if index:
+                reqMsgId = _cancelRequests.get(msgId, msgId)
+                key = (reqMsgId, data.split(b'\0', index + 1)[index])
+                pending = self._pending.get(key)
+                if pending:
+                    if reqMsgId != msgId and reqMsgId != b'3' \
+                            and self._dropQueued(pending[0], key, reqMsgId):
+                        # the cancelled request was never sent
+                        continue
+                    # keep a cancel or order modification behind the
+                    # queued messages with the same request or order ID
+                    priorityClass = pending[0]
+                    pending[1] += 1
+                else:
+                    self._pending[key] = [priorityClass, 1]
+            self._msgQs[priorityClass].append((data, t, key))
+        self._refillTokens(t)
+        buf = []
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        wakeTime = math.inf
+        for priorityClass, msgQ in enumerate(self._msgQs):
+            if not msgQ:
+                continue
+            classTokens = self._classTokens[priorityClass]
+            # allow for rounding errors, so that a bucket that refilled
+            # to 0.99999... doesn't schedule a wake up for the same time
+            while msgQ and self._tokens > _fullToken \
+                    and classTokens > _fullToken:
+                data, queueTime, key = msgQ.popleft()
+                if key:
+                    pending = self._pending[key]
+                    pending[1] -= 1
+                    if not pending[1]:
+                        del self._pending[key]
+                buf.append(self._prefix(data))
+                self._tokens -= 1
+                classTokens -= 1
+                self._numSent[priorityClass] += 1
+                delay = t - queueTime
+                self._delayCounts[
+                    bisect.bisect_left(self.DelayBuckets, delay)] += 1
+                if delay:
+                    self._numDelayed[priorityClass] += 1
+                    self._totalDelay[priorityClass] += delay
+                    if delay > self._maxDelay[priorityClass]:
+                        self._maxDelay[priorityClass] = delay
+                if debug:
+                    self._logger.debug(
+                        '>>> %s', data[:-1].decode().replace('\0', ','))
+            self._classTokens[priorityClass] = classTokens
+            if msgQ:
+                # wait until both buckets have a token again
+                interval = self.RequestsInterval
+                wait = 0.0
+                if self._tokens < 1:
+                    wait = (1 - self._tokens) * interval / self.MaxRequests
+                budget = self.ClassBudgets[priorityClass]
+                if classTokens < 1:
+                    wait = max(wait, (1 - classTokens) * interval / budget)
+                wakeTime = min(wakeTime, t + wait)
+            self._setClassThrottling(priorityClass, bool(msgQ))
+        if buf:
+            self.conn.sendMsgs(buf)
+
+        if wakeTime < math.inf:
             if not self._isThrottling:
                 self._isThrottling = True
                 self.throttleStart.emit()
                 self._logger.debug('Started to throttle requests')
-            loop.call_at(
-                times[0] + self.RequestsInterval,
-                self.sendMsg, None)
-        else:
-            if self._isThrottling:
-                self._isThrottling = False
-                self.throttleEnd.emit()
-                self._logger.debug('Stopped to throttle requests')
+            if self._throttleHandle:
+                self._throttleHandle.cancel()
+            self._throttleHandle = loop.call_at(wakeTime, self.sendMsg, None)
+        elif self._isThrottling:
+            self._isThrottling = False
+            self._throttleHandle = None
+            self.throttleEnd.emit()
+            self._logger.debug('Stopped to throttle requests')
+
+    def _dropQueued(
+            self, priorityClass: int, key: tuple, reqMsgId: bytes) -> bool:
+        """
+        Remove the queued request with the given key from the queue,
+        return False if it is not queued.
+        """
+        msgQ = self._msgQs[priorityClass]
+        prefix = reqMsgId + b'\0'
+        for entry in msgQ:
+            if entry[2] == key and entry[0].startswith(prefix):
+                msgQ.remove(entry)
+                pending = self._pending[key]
+                pending[1] -= 1
+                if not pending[1]:
+                    del self._pending[key]
+                self._setClassThrottling(priorityClass, bool(msgQ))
+                return True
+        return False
+
+    def _refillTokens(self, t: float):
+        """Add the tokens that have accrued since the last refill."""
+        elapsed = t - self._tokenTime
+        self._tokenTime = t
+        interval = self.RequestsInterval
+        burst = max(1, self.RequestsBurst)
+        if not self.MaxRequests:
+            # throttling is disabled, including the class budgets
+            self._tokens = math.inf
+            self._classTokens = [math.inf] * len(self.ClassBudgets)
+            return
+        self._tokens = min(
+            burst, self._tokens + elapsed * self.MaxRequests / interval)
+        for priorityClass, budget in enumerate(self.ClassBudgets):
+            if budget:
+                self._classTokens[priorityClass] = min(
+                    burst, self._classTokens[priorityClass]
+                    + elapsed * budget / interval)
+            else:
+                self._classTokens[priorityClass] = math.inf
+
+    def _setClassThrottling(self, priorityClass: int, isThrottling: bool):
+        if isThrottling != self._classThrottling[priorityClass]:
+            self._classThrottling[priorityClass] = isThrottling
+            if isThrottling:
+                self.classThrottleStart.emit(priorityClass)
+            else:
+                self.classThrottleEnd.emit(priorityClass)
 
     def _prefix(self, msg):
         # prefix a message with its length
@@ -310,15 +519,19 @@ class Client:
         self._numBytesRecv += len(data)
 
         while True:
-            if len(self._data) <= 4:
+            # the buffer and read position are looked up for every message
+            # since a handler can reenter this method or reset the client
+            buf = self._data
+            pos = self._dataPos
+            if len(buf) - pos <= 4:
                 break
             # 4 byte prefix tells the message length
-            msgEnd = 4 + struct.unpack('>I', self._data[:4])[0]
-            if len(self._data) < msgEnd:
+            msgEnd = pos + 4 + struct.unpack_from('>I', buf, pos)[0]
+            if len(buf) < msgEnd:
                 # insufficient data for now
                 break
-            msg = self._data[4:msgEnd].decode(errors='backslashreplace')
-            self._data = self._data[msgEnd:]
+            msg = buf[pos + 4:msgEnd].decode(errors='backslashreplace')
+            self._dataPos = msgEnd
             fields = msg.split('\0')
             fields.pop()  # pop off last empty element
             self._numMsgRecv += 1
@@ -359,6 +572,11 @@ class Client:
                 # decode and handle the message
                 self.decoder.interpret(fields)
 
+        if self._dataPos:
+            # drop the consumed messages all at once
+            del self._data[:self._dataPos]
+            self._dataPos = 0
+
         if self._tcpDataProcessed:
             self._tcpDataProcessed()
 
@@ -408,6 +626,19 @@ class Client:
         self.send(2, 2, reqId)
 
     def placeOrder(self, orderId, contract, order):
+        self.send(*self._placeOrderFields(orderId, contract, order))
+
+    def placeOrders(self, orders):
+        """
+        Place the given ``(orderId, contract, order)`` tuples, serialized
+        in one pass and sent in a single buffer as far as throttling allows.
+        """
+        if not self.isConnected():
+            raise ConnectionError('Not connected')
+        self.sendMsgs([
+            self._serialize(self._placeOrderFields(*o)) for o in orders])
+
+    def _placeOrderFields(self, orderId, contract, order) -> list:
         version = self.serverVersion()
         fields = [
             3, orderId,
@@ -619,7 +850,7 @@ class Client:
             elif order.orderType in ('PEG MID', 'PEGMID'):
                 fields += [order.midOffsetAtWhole, order.midOffsetAtHalf]
 
-        self.send(*fields)
+        return fields
 
     def cancelOrder(self, orderId, manualCancelOrderTime=''):
         fields = [4, 1, orderId]
@@ -996,3 +1227,40 @@ class Client:
 
     def reqUserInfo(self, reqId):
         self.send(104, reqId)
+
+
+_contractFields = operator.attrgetter(
+    'conId', 'symbol', 'secType', 'lastTradeDateOrContractMonth', 'strike',
+    'right', 'multiplier', 'exchange', 'primaryExchange', 'currency',
+    'localSymbol', 'tradingClass')
+
+_fullToken = 1 - 1e-9
+
+_msgClasses = {
+    **{b'%d' % msgId: Client.ORDERS for msgId in (3, 21)},
+    **{b'%d' % msgId: Client.CANCELS for msgId in (
+        2, 4, 11, 13, 23, 25, 51, 53, 56, 57, 58, 63, 64, 70, 75, 77,
+        89, 90, 93, 95, 98, 101, 103)},
+    **{b'%d' % msgId: Client.REFERENCEDATA for msgId in (
+        9, 18, 19, 24, 52, 78, 79, 80, 81, 82, 83, 84, 85, 86, 87, 88,
+        91, 100, 102, 104)},
+}
+""" Outgoing message ID -> priority class (other IDs are MARKETDATA) """
+
+_reqIdFields = {
+    **{b'%d' % msgId: 1 for msgId in (
+        3, 20, 22, 87, 88, 89, 90, 92, 93, 94, 95, 97, 98, 100, 101, 102,
+        103)},
+    **{b'%d' % msgId: 2 for msgId in (
+        1, 2, 4, 10, 11, 23, 25, 50, 51, 52, 53, 54, 55, 56, 57, 62, 63,
+        74, 75, 76, 77)},
+}
+""" Outgoing message ID -> index of the request or order ID field,
+for the messages that can be cancelled and their cancels """
+
+_cancelRequests = {
+    b'%d' % cancelId: b'%d' % msgId for cancelId, msgId in (
+        (2, 1), (4, 3), (11, 10), (23, 22), (25, 20), (51, 50), (53, 52),
+        (56, 54), (57, 55), (63, 62), (75, 74), (77, 76), (89, 88),
+        (90, 87), (93, 92), (95, 94), (98, 97), (101, 100), (103, 102))}
+""" Outgoing cancel message ID -> message ID of the request it cancels """
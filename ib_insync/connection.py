@@ -53,6 +53,14 @@ class Connection(asyncio.Protocol):
             self.numBytesSent += len(msg)
             self.numMsgSent += 1
 
+    def sendMsgs(self, msgs):
+        """Write the given messages in a single buffer."""
+        if self.transport:
+            data = b''.join(msgs)
+            self.transport.write(data)
+            self.numBytesSent += len(data)
+            self.numMsgSent += len(msgs)
+
     def connection_lost(self, exc):
         self.transport = None
         msg = str(exc) if exc else ''
@@ -110,30 +110,25 @@ class Contract:
         or a general Contract if secType is not given.
         """
         secType = kwargs.get('secType', '')
-        cls = {
-            '': Contract,
-            'STK': Stock,
-            'OPT': Option,
-            'FUT': Future,
-            'CONTFUT': ContFuture,
-            'CASH': Forex,
-            'IND': Index,
-            'CFD': CFD,
-            'BOND': Bond,
-            'CMDTY': Commodity,
-            'FOP': FuturesOption,
-            'FUND': MutualFund,
-            'WAR': Warrant,
-            'IOPT': Warrant,
-            'BAG': Bag,
-            'CRYPTO': Crypto,
-            'NEWS': Contract,
-            'EVENT': Contract,
-        }.get(secType, Contract)
+        cls = _secTypeClasses.get(secType, Contract)
         if cls is not Contract:
             kwargs.pop('secType', '')
         return cls(**kwargs)
 
+    @staticmethod
+    def specialize(contract: 'Contract') -> 'Contract':
+        """
+        Turn a general contract in-place into the specialized contract
+        of its secType. This gives the same as
+        ``Contract.create(**util.dataclassAsDict(contract))``
+        without copying all fields.
+        """
+        cls = _secTypeClasses.get(contract.secType, Contract)
+        if cls is not Contract and type(contract) is not cls:
+            contract.__class__ = cls
+            contract.secType = _classSecTypes[cls]
+        return contract
+
     def isHashable(self) -> bool:
         """
         See if this contract can be hashed by conId.
@@ -440,6 +435,33 @@ class Crypto(Contract):
             exchange=exchange, currency=currency, **kwargs)
 
 
+_secTypeClasses = {
+    '': Contract,
+    'STK': Stock,
+    'OPT': Option,
+    'FUT': Future,
+    'CONTFUT': ContFuture,
+    'CASH': Forex,
+    'IND': Index,
+    'CFD': CFD,
+    'BOND': Bond,
+    'CMDTY': Commodity,
+    'FOP': FuturesOption,
+    'FUND': MutualFund,
+    'WAR': Warrant,
+    'IOPT': Warrant,
+    'BAG': Bag,
+    'CRYPTO': Crypto,
+    'NEWS': Contract,
+    'EVENT': Contract,
+}
+""" secType -> specialized contract class """
+
+_classSecTypes = {
+    cls: cls().secType for cls in set(_secTypeClasses.values())}
+""" Specialized contract class -> the secType it is created with """
+
+
 class TagValue(NamedTuple):
     tag: str
     value: str
@@ -0,0 +1,165 @@
+"""Cache of contract details."""
+
+import copy
+import logging
+import os
+import pickle
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ib_insync.contract import Contract, ContractDetails
+from ib_insync.util import dataclassNonDefaults, getLoop
+
+SpecKey = Tuple[Tuple[str, object], ...]
+""" Sorted (field name, value) pairs of the non-default contract fields """
+
+
+@dataclass
+class ContractDetailsCache:
+    """
+    Cache of contract details, by the contract that was asked for and
+    by conId.
+
+    A request is answered from the cache if the same contract
+    specification was asked for before, or if it has a conId of which
+    the details are cached and its other fields agree with them.
+    Entries expire after ``ttl`` seconds or after the last trading day
+    of the contract, whichever comes first.
+
+    If a path is given then the cache is persisted to this file: It is
+    loaded on creation and saved ``saveDelay`` seconds after it has
+    been changed, so that a burst of changes is written only once.
+    The file is pickled, so only use a file from a trusted source.
+
+    Args:
+        path (str): Optional file name to persist the cache in.
+        ttl (float): Time (in seconds) to keep an entry.
+        saveDelay (float): Delay (in seconds) of saving changes.
+    """
+
+    path: str = ''
+    ttl: float = 7 * 24 * 3600
+    saveDelay: float = 1
+    hits: int = field(init=False, default=0)
+    misses: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self._logger = logging.getLogger('ib_insync.contractcache')
+        self._byConId: Dict[int, Tuple[float, ContractDetails]] = {}
+        self._bySpec: Dict[SpecKey, Tuple[float, List[int]]] = {}
+        self._saveHandle = None
+        self._changed = False
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                self._byConId, self._bySpec = pickle.load(f)
+            self.purge()
+
+    def get(self, contract: Contract) -> Optional[List[ContractDetails]]:
+        """
+        Get copies of the cached details that match the contract,
+        or None if the contract is not cached.
+        """
+        now = time.time()
+        key = _specKey(contract)
+        entry = self._bySpec.get(key) if key is not None else None
+        if entry and entry[0] > now:
+            conIdEntries = [self._byConId.get(conId) for conId in entry[1]]
+            if all(e and e[0] > now for e in conIdEntries):
+                self.hits += 1
+                return [_copy(e[1]) for e in conIdEntries if e]
+        if contract.conId:
+            e = self._byConId.get(contract.conId)
+            if e and e[0] > now and e[1].contract and all(
+                    getattr(e[1].contract, k) == v
+                    for k, v in dataclassNonDefaults(contract).items()):
+                self.hits += 1
+                return [_copy(e[1])]
+        self.misses += 1
+        return None
+
+    def put(self, contract: Contract, detailsList: List[ContractDetails]):
+        """
+        Cache the details that were received for the given contract.
+        Empty results are not cached.
+        """
+        key = _specKey(contract)
+        if not detailsList or key is None:
+            return
+        now = time.time()
+        expiry = now + self.ttl
+        conIds = []
+        for details in detailsList:
+            if not details.contract:
+                return
+            detailsExpiry = min(now + self.ttl, _lastTradeTime(details))
+            expiry = min(expiry, detailsExpiry)
+            conId = details.contract.conId
+            self._byConId[conId] = (detailsExpiry, _copy(details))
+            conIds.append(conId)
+        self._bySpec[key] = (expiry, conIds)
+        self._changed = True
+        if self.path and not self._saveHandle:
+            self._saveHandle = getLoop().call_later(
+                self.saveDelay, self.save)
+
+    def purge(self):
+        """Remove the expired entries."""
+        now = time.time()
+        self._byConId = {
+            conId: e for conId, e in self._byConId.items() if e[0] > now}
+        self._bySpec = {
+            key: e for key, e in self._bySpec.items() if e[0] > now}
+
+    def clear(self):
+        """Remove all entries."""
+        self._byConId.clear()
+        self._bySpec.clear()
+        self._changed = False
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self):
+        """Save the cache to its file now, if it has changed."""
+        if self._saveHandle:
+            self._saveHandle.cancel()
+            self._saveHandle = None
+        if not self.path or not self._changed:
+            return
+        self._changed = False
+        self.purge()
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            pickle.dump(
+                (self._byConId, self._bySpec), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, self.path)
+        self._logger.debug(
+            f'Saved {len(self._byConId)} contract details to {self.path}')
+
+
+def _specKey(contract: Contract) -> Optional[SpecKey]:
+    # contracts with unhashable fields, like combo legs, are not cached
+    key = tuple(sorted(dataclassNonDefaults(contract).items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _copy(details: ContractDetails) -> ContractDetails:
+    # the caller may modify the contract, such as qualifyContracts does
+    details = copy.copy(details)
+    details.contract = copy.copy(details.contract)
+    return details
+
+
+def _lastTradeTime(details: ContractDetails) -> float:
+    # the end of the last trading day, or infinity if there is none
+    assert details.contract
+    s = details.contract.lastTradeDateOrContractMonth[:8]
+    if len(s) != 8 or not s.isdigit():
+        return float('inf')
+    day = datetime.strptime(s, '%Y%m%d').replace(tzinfo=timezone.utc)
+    return (day + timedelta(days=1)).timestamp()
@@ -3,7 +3,7 @@
 import dataclasses
 import logging
 from datetime import datetime, timezone
-from typing import Any, cast
+from typing import Any, Callable, Dict, Tuple, cast
 
 from .contract import (
     ComboLeg, Contract, ContractDescription, ContractDetails,
@@ -17,6 +17,16 @@ from .order import Order, OrderComboLeg, OrderCondition, OrderState
 from .util import UNSET_DOUBLE, ZoneInfo, parseIBDatetime
 from .wrapper import Wrapper
 
+_parsers: Dict[type, Tuple[Callable[[Any], Any], Any]] = {
+    str: (str, ''),
+    int: (int, 0),
+    float: (float, 0),
+    bool: (lambda field: bool(int(field)), 0)}
+""" Field type -> (parse function, default for empty field) """
+
+_parsePlans: Dict[type, Tuple[Tuple[str, Callable[[Any], Any], Any], ...]] = {}
+""" Dataclass -> (name, parse function, default) of its non-string fields """
+
 
 class Decoder:
     """Decode IB messages and invoke corresponding wrapper methods."""
@@ -27,12 +37,8 @@ class Decoder:
         self.logger = logging.getLogger('ib_insync.Decoder')
         self.handlers = {
             1: self.priceSizeTick,
-            2: self.wrap(
-                'tickSize', [int, int, float]),
-            3: self.wrap(
-                'orderStatus', [
-                    int, str, float, float, float, int, int,
-                    float, int, str, float], skip=1),
+            2: self.tickSize,
+            3: self.orderStatus,
             4: self.errorMsg,
             5: self.openOrder,
             6: self.wrap(
@@ -61,10 +67,8 @@ class Decoder:
                 'scannerParameters', [str]),
             20: self.scannerData,
             21: self.tickOptionComputation,
-            45: self.wrap(
-                'tickGeneric', [int, int, float]),
-            46: self.wrap(
-                'tickString', [int, int, str]),
+            45: self.tickGeneric,
+            46: self.tickString,
             47: self.wrap(
                 'tickEFP',
                 [int, int, float, str, float, int, str, float, float]),
@@ -172,24 +176,28 @@ class Decoder:
         Create a message handler that invokes a wrapper method
         with the in-order message fields as parameters, skipping over
         the first ``skip`` fields, and parsed according to the ``types`` list.
+
+        The wrapper method and the field parsers are looked up once
+        when the handler is created, not for every message.
         """
+        method = getattr(self.wrapper, methodName, None)
+        if not method:
+            return self._ignore
+        plan = tuple(_parsers[typ] for typ in types)
 
         def handler(fields):
-            method = getattr(self.wrapper, methodName, None)
-            if method:
-                try:
-                    args = [
-                        field if typ is str else
-                        int(field or 0) if typ is int else
-                        float(field or 0) if typ is float else
-                        bool(int(field or 0))
-                        for (typ, field) in zip(types, fields[skip:])]
-                    method(*args)
-                except Exception:
-                    self.logger.exception(f'Error for {methodName}:')
+            try:
+                method(*[
+                    parse(field or default)
+                    for (parse, default), field in zip(plan, fields[skip:])])
+            except Exception:
+                self.logger.exception(f'Error for {methodName}:')
 
         return handler
 
+    def _ignore(self, fields):
+        pass
+
     def interpret(self, fields):
         """Decode fields and invoke corresponding wrapper method."""
         try:
@@ -201,17 +209,16 @@ class Decoder:
 
     def parse(self, obj):
         """Parse the object's properties according to its default types."""
-        for field in dataclasses.fields(obj):
-            typ = type(field.default)
-            if typ is str:
-                continue
-            v = getattr(obj, field.name)
-            if typ is int:
-                setattr(obj, field.name, int(v) if v else field.default)
-            elif typ is float:
-                setattr(obj, field.name, float(v) if v else field.default)
-            elif typ is bool:
-                setattr(obj, field.name, bool(int(v)) if v else field.default)
+        plan = _parsePlans.get(type(obj))
+        if plan is None:
+            plan = _parsePlans[type(obj)] = tuple(
+                (field.name, _parsers[type(field.default)][0], field.default)
+                for field in dataclasses.fields(obj)
+                if type(field.default) in (int, float, bool))
+        values = obj.__dict__
+        for name, parse, default in plan:
+            v = values[name]
+            values[name] = parse(v) if v else default
 
     def priceSizeTick(self, fields):
         _, _, reqId, tickType, price, size, _ = fields
@@ -220,6 +227,31 @@ class Decoder:
             self.wrapper.priceSizeTick(
                 int(reqId), int(tickType), float(price), float(size or 0))
 
+    def tickSize(self, fields):
+        _, _, reqId, tickType, size = fields
+
+        self.wrapper.tickSize(int(reqId), int(tickType), float(size or 0))
+
+    def tickGeneric(self, fields):
+        _, _, reqId, tickType, value = fields
+
+        self.wrapper.tickGeneric(int(reqId), int(tickType), float(value or 0))
+
+    def tickString(self, fields):
+        _, _, reqId, tickType, value = fields
+
+        self.wrapper.tickString(int(reqId), int(tickType), value)
+
+    def orderStatus(self, fields):
+        _, orderId, status, filled, remaining, avgFillPrice, permId, \
+            parentId, lastFillPrice, clientId, whyHeld, mktCapPrice = fields
+
+        self.wrapper.orderStatus(
+            int(orderId or 0), status, float(filled or 0),
+            float(remaining or 0), float(avgFillPrice or 0),
+            int(permId or 0), int(parentId or 0), float(lastFillPrice or 0),
+            int(clientId or 0), whyHeld, float(mktCapPrice or 0))
+
     def errorMsg(self, fields):
         _, _, reqId, errorCode, errorString, *fields = fields
         advancedOrderRejectJson = ''
@@ -302,10 +334,10 @@ class Decoder:
 
         numSecIds = int(numSecIds)
         if numSecIds > 0:
-            cd.secIdList = []
-            for _ in range(numSecIds):
-                tag, value, *fields = fields
-                cd.secIdList += [TagValue(tag, value)]
+            cd.secIdList = [
+                TagValue(*fields[i:i + 2])
+                for i in range(0, 2 * numSecIds, 2)]
+            fields = fields[2 * numSecIds:]
         (
             cd.aggGroup,
             cd.underSymbol,
@@ -382,10 +414,10 @@ class Decoder:
 
         numSecIds = int(numSecIds)
         if numSecIds > 0:
-            cd.secIdList = []
-            for _ in range(numSecIds):
-                tag, value, *fields = fields
-                cd.secIdList += [TagValue(tag, value)]
+            cd.secIdList = [
+                TagValue(*fields[i:i + 2])
+                for i in range(0, 2 * numSecIds, 2)]
+            fields = fields[2 * numSecIds:]
 
         cd.aggGroup, cd.marketRuleIds, *fields = fields
         if self.serverVersion >= 164:
@@ -459,6 +491,11 @@ class Decoder:
 
     def historicalData(self, fields):
         _, reqId, startDateStr, endDateStr, numBars, *fields = fields
+        if self.wrapper.historicalDataFields(
+                int(reqId), fields[:int(numBars) * 8]):
+            self.wrapper.historicalDataEnd(
+                int(reqId), startDateStr, endDateStr)
+            return
         get = iter(fields).__next__
 
         for _ in range(int(numBars)):
@@ -916,7 +953,6 @@ class Decoder:
             *fields) = fields
 
         numLegs = int(fields.pop(0))
-        c.comboLegs = []
         for _ in range(numLegs):
             leg: Any = ComboLeg()
             (
@@ -933,7 +969,6 @@ class Decoder:
             c.comboLegs.append(leg)
 
         numOrderLegs = int(fields.pop(0))
-        o.orderComboLegs = []
         for _ in range(numOrderLegs):
             leg = OrderComboLeg()
             leg.price = fields.pop(0)
@@ -942,11 +977,10 @@ class Decoder:
 
         numParams = int(fields.pop(0))
         if numParams > 0:
-            o.smartComboRoutingParams = []
-            for _ in range(numParams):
-                tag, value, *fields = fields
-                o.smartComboRoutingParams.append(
-                    TagValue(tag, value))
+            o.smartComboRoutingParams = [
+                TagValue(*fields[i:i + 2])
+                for i in range(0, 2 * numParams, 2)]
+            fields = fields[2 * numParams:]
 
         (
             o.scaleInitLevelSize,
@@ -987,11 +1021,10 @@ class Decoder:
         if o.algoStrategy:
             numParams = int(fields.pop(0))
             if numParams > 0:
-                o.algoParams = []
-                for _ in range(numParams):
-                    tag, value, *fields = fields
-                    o.algoParams.append(
-                        TagValue(tag, value))
+                o.algoParams = [
+                    TagValue(*fields[i:i + 2])
+                    for i in range(0, 2 * numParams, 2)]
+                fields = fields[2 * numParams:]
 
         (
             o.solicited,
@@ -1160,7 +1193,6 @@ class Decoder:
             *fields) = fields
 
         numLegs = int(fields.pop(0))
-        c.comboLegs = []
         for _ in range(numLegs):
             leg: Any = ComboLeg()
             (
@@ -1177,7 +1209,6 @@ class Decoder:
             c.comboLegs.append(leg)
 
         numOrderLegs = int(fields.pop(0))
-        o.orderComboLegs = []
         for _ in range(numOrderLegs):
             leg = OrderComboLeg()
             leg.price = fields.pop(0)
@@ -1186,11 +1217,10 @@ class Decoder:
 
         numParams = int(fields.pop(0))
         if numParams > 0:
-            o.smartComboRoutingParams = []
-            for _ in range(numParams):
-                tag, value, *fields = fields
-                o.smartComboRoutingParams.append(
-                    TagValue(tag, value))
+            o.smartComboRoutingParams = [
+                TagValue(*fields[i:i + 2])
+                for i in range(0, 2 * numParams, 2)]
+            fields = fields[2 * numParams:]
         (
             o.scaleInitLevelSize,
             o.scaleSubsLevelSize,
@@ -1229,11 +1259,10 @@ class Decoder:
         if o.algoStrategy:
             numParams = int(fields.pop(0))
             if numParams > 0:
-                o.algoParams = []
-                for _ in range(numParams):
-                    tag, value, *fields = fields
-                    o.algoParams.append(
-                        TagValue(tag, value))
+                o.algoParams = [
+                    TagValue(*fields[i:i + 2])
+                    for i in range(0, 2 * numParams, 2)]
+                fields = fields[2 * numParams:]
         (
             o.solicited,
             st.status,
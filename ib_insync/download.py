@@ -0,0 +1,573 @@
+"""Download of long ranges of historical data."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date as date_, datetime, timedelta, timezone
+from typing import ClassVar, Deque, Dict, List, Optional, Set, Tuple, Union
+
+import ib_insync.util as util
+from ib_insync.contract import Contract
+from ib_insync.ib import IB
+from ib_insync.objects import BarData, BarDataList
+from ib_insync.wrapper import RequestError, isWarningCode
+
+DAY = 24 * 3600
+
+_chunkSpans = {
+    '1 secs': 1800,
+    '5 secs': 3600,
+    '10 secs': 4 * 3600,
+    '15 secs': 4 * 3600,
+    '30 secs': 8 * 3600,
+    '1 min': DAY,
+    '2 mins': 2 * DAY,
+    '3 mins': 7 * DAY,
+    '5 mins': 7 * DAY,
+    '10 mins': 30 * DAY,
+    '15 mins': 30 * DAY,
+    '20 mins': 30 * DAY,
+    '30 mins': 30 * DAY,
+    '1 hour': 30 * DAY,
+    '2 hours': 30 * DAY,
+    '3 hours': 30 * DAY,
+    '4 hours': 30 * DAY,
+    '8 hours': 30 * DAY,
+    '1 day': 365 * DAY,
+    '1 week': 365 * DAY,
+    '1 month': 365 * DAY,
+}
+""" Bar size -> span (in seconds) of one request for that bar size """
+
+_dailyBarSizes = {'1 day', '1 week', '1 month'}
+
+CacheKey = Tuple[int, str, str, bool]
+""" (conId, barSizeSetting, whatToShow, useRTH) """
+
+
+@dataclass
+class BarCache:
+    """
+    Persistent on-disk cache of historical bars.
+
+    The bars for every (conId, barSizeSetting, whatToShow, useRTH) key
+    are stored in NumPy ``.npy`` files, together with a JSON index of the
+    time ranges that are covered. A covered range has been downloaded
+    completely, so that missing bars in it (such as for weekends) are
+    known to not exist. Requires NumPy.
+
+    Storing bars appends them as a new segment file, without rewriting
+    the bars that are cached already. A key has at most ``maxSegments``
+    segments; Storing more bars then merges the segments, together with
+    the new bars, into the main file of the key.
+
+    Attach the cache to a :class:`.HistoricalDownloader` to serve the
+    covered ranges from disk and only request the gaps from TWS.
+
+    Args:
+        path (str): (required) Directory to store the cache files in.
+        maxBytes (int): Size limit of the cache files; When exceeded the
+            least recently used keys are evicted. Use 0 for no limit.
+        maxSegments (int): Maximum number of segments of a key.
+            Use 0 to always merge.
+
+    Statistics:
+        * ``hits``: Number of lookups that were fully covered.
+        * ``misses``: Number of lookups that had one or more gaps.
+        * ``evictions``: Number of evicted keys.
+    """
+
+    path: str
+    maxBytes: int = 0
+    maxSegments: int = 16
+
+    def __post_init__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def gaps(self, key: CacheKey, start: datetime, end: datetime) \
+            -> List[Tuple[datetime, datetime]]:
+        """
+        Get the ranges between ``start`` and ``end`` that are not covered.
+        """
+        t0 = _toUTC(start, key[1] in _dailyBarSizes).timestamp()
+        t1 = end.timestamp()
+        gaps = []
+        for s, e in self._coverage(key):
+            if e <= t0:
+                continue
+            if s >= t1:
+                break
+            if s > t0:
+                gaps.append((t0, s))
+            t0 = max(t0, e)
+        if t0 < t1:
+            gaps.append((t0, t1))
+        if gaps:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return [
+            (datetime.fromtimestamp(s, timezone.utc),
+                datetime.fromtimestamp(e, timezone.utc))
+            for s, e in gaps]
+
+    def get(self, key: CacheKey, start: datetime, end: datetime):
+        """
+        Get the cached bars between ``start`` and ``end`` as a NumPy
+        structured array, in the format of
+        :meth:`.BarDataColumns.to_numpy`.
+        """
+        import numpy as np
+        fileName = self._fileName(key)
+        start = _toUTC(start, key[1] in _dailyBarSizes)
+        dates = [
+            np.datetime64(int(start.timestamp()), 's'),
+            np.datetime64(int(end.timestamp()), 's')]
+        parts = []
+        for name in self._files(fileName):
+            arr = np.load(name, mmap_mode='r')
+            i, j = np.searchsorted(arr['date'], dates)
+            parts.append(np.array(arr[i:j]))
+            del arr
+        if not parts:
+            return np.empty(0, dtype=_barDtype())
+        os.utime(fileName + '.json')
+        return _merge(parts)
+
+    def put(
+            self, key: CacheKey, start: datetime, end: datetime,
+            bars: List[BarData]):
+        """
+        Store the bars that were downloaded for the range between
+        ``start`` and ``end`` and mark the range as covered.
+
+        The coverage stops short of the bar that is still forming now,
+        and of the bar before it, so that these are downloaded again
+        once they are final.
+        """
+        import numpy as np
+        fileName = self._fileName(key)
+        new = np.sort(np.array([
+            (_toUTC(bar.date).replace(tzinfo=None), bar.open, bar.high,
+                bar.low, bar.close, bar.volume, bar.average, bar.barCount)
+            for bar in bars], dtype=_barDtype()), order='date')
+        files = self._files(fileName)
+        segments = [name for name in files if name != fileName + '.npy']
+        if len(new):
+            if not files:
+                self._save(fileName + '.npy', new)
+            elif len(segments) < self.maxSegments:
+                self._save(f'{fileName}.{len(segments) + 1}.npy', new)
+            else:
+                # merge the main file, the segments and the new bars
+                self._save(fileName + '.npy', _merge(
+                    [np.load(name) for name in files] + [new]))
+                self._remove(segments)
+
+        t0 = _toUTC(start, key[1] in _dailyBarSizes).timestamp()
+        barSeconds = _barSeconds(key[1])
+        lastBarStart = time.time() // barSeconds * barSeconds - barSeconds
+        t1 = min(end.timestamp(), lastBarStart)
+        ranges = self._coverage(key)
+        if t0 < t1:
+            ranges.append([t0, t1])
+        coverage: List[List[float]] = []
+        for s, e in sorted(ranges):
+            if coverage and s <= coverage[-1][1]:
+                coverage[-1][1] = max(coverage[-1][1], e)
+            else:
+                coverage.append([s, e])
+        with open(fileName + '.tmp', 'w') as f:
+            json.dump(coverage, f)
+        os.replace(fileName + '.tmp', fileName + '.json')
+        self._evict(fileName)
+
+    def clear(self):
+        """Remove all cached bars."""
+        for name in os.listdir(self.path):
+            if name.endswith(('.npy', '.json')):
+                os.remove(os.path.join(self.path, name))
+
+    def _fileName(self, key: CacheKey) -> str:
+        conId, barSizeSetting, whatToShow, useRTH = key
+        name = f'{conId}_{barSizeSetting}_{whatToShow}_{int(useRTH)}'
+        return os.path.join(self.path, name.replace(' ', ''))
+
+    def _files(self, fileName: str) -> List[str]:
+        # the main file, if any, followed by the segments in order
+        files = []
+        if os.path.exists(fileName + '.npy'):
+            files.append(fileName + '.npy')
+        n = 1
+        while os.path.exists(f'{fileName}.{n}.npy'):
+            files.append(f'{fileName}.{n}.npy')
+            n += 1
+        return files
+
+    def _save(self, name: str, arr):
+        import numpy as np
+        with open(name + '.tmp', 'wb') as f:
+            np.save(f, arr)
+        os.replace(name + '.tmp', name)
+
+    def _remove(self, files: List[str]):
+        # the last segment first, so that the remaining segments
+        # are numbered consecutively if this is interrupted
+        for name in reversed(files):
+            os.remove(name)
+
+    def _coverage(self, key: CacheKey) -> List[List[float]]:
+        try:
+            with open(self._fileName(key) + '.json') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _evict(self, keepFileName: str):
+        if not self.maxBytes:
+            return
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if name.endswith('.json'):
+                fileName = os.path.join(self.path, name[:-5])
+                size = os.path.getsize(fileName + '.json') + sum(
+                    os.path.getsize(f) for f in self._files(fileName))
+                mtime = os.path.getmtime(fileName + '.json')
+                entries.append((mtime, size, fileName))
+                total += size
+        for _, size, fileName in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            if fileName == keepFileName:
+                continue
+            os.remove(fileName + '.json')
+            self._remove(self._files(fileName))
+            total -= size
+            self.evictions += 1
+
+
+@dataclass
+class HistoricalDownloader:
+    """
+    Download historical bars over an arbitrary date range.
+
+    The range is split into chunks that are valid for the bar size and
+    the chunks are requested concurrently, while staying within the
+    historical data pacing limits of IB: At most ``MaxRequests``
+    requests in ``RequestsInterval`` seconds, where 'BID_ASK' requests
+    count double, and no identical request within ``IdenticalInterval``
+    seconds. Requests that fail with a pacing violation (error 162)
+    or that time out are retried; A chunk that still fails after
+    ``maxRetries`` retries is left out and is not cached. Requests
+    that fail with any other error raise a :class:`.RequestError`.
+    The bars of all chunks are stitched together into one ordered
+    series without duplicates.
+
+    Use one downloader per IB connection, as the pacing limits apply to
+    the connection as a whole.
+
+    Args:
+        ib (IB): (required) IB instance to use.
+        maxConcurrent (int): Maximum number of requests in flight.
+        maxRetries (int): Maximum number of retries of a chunk
+            after a pacing violation or a timeout.
+        retryDelay (float): Time (in seconds) to wait before retrying
+            a chunk, multiplied by the retry count.
+        timeout (float): Timeout (in seconds) of a single request.
+        cache (BarCache): Optional cache to serve the bars from, for a
+            qualified contract. Only the ranges that are not in the
+            cache are downloaded and then added to it.
+
+    Example usage:
+
+    .. code-block:: python
+
+        downloader = HistoricalDownloader(ib)
+        bars = downloader.download(
+            Stock('AMD', 'SMART', 'USD'),
+            datetime.datetime(2020, 1, 1), datetime.datetime(2023, 1, 1),
+            '1 min', 'TRADES', useRTH=True)
+    """
+
+    MaxRequests: ClassVar[int] = 60
+    RequestsInterval: ClassVar[float] = 600
+    IdenticalInterval: ClassVar[float] = 15
+
+    ib: IB
+    maxConcurrent: int = 10
+    maxRetries: int = 5
+    retryDelay: float = 15
+    timeout: float = 60
+    cache: Optional[BarCache] = None
+
+    def __post_init__(self):
+        self._logger = logging.getLogger('ib_insync.download')
+        self._reqTimes: Deque[float] = deque()
+        self._lastReqTimes: Dict[tuple, float] = {}
+        self._pacingErrors: Set[int] = set()
+        self._requestErrors: Dict[int, Tuple[int, str]] = {}
+        self._semaphore = asyncio.Semaphore(self.maxConcurrent)
+        self._numDownloads = 0
+
+    def download(
+            self, contract: Contract,
+            start: Union[datetime, date_], end: Union[datetime, date_],
+            barSizeSetting: str, whatToShow: str, useRTH: bool) \
+            -> BarDataList:
+        """
+        Download the bars from ``start`` up to ``end``.
+
+        This method is blocking.
+
+        Args:
+            contract: Contract of interest.
+            start: Start of the range. A date or a datetime; A naive
+                datetime is taken to be in local time.
+            end: End of the range (exclusive), like ``start``.
+            barSizeSetting: Time period of one bar, as for
+                :meth:`.IB.reqHistoricalData`.
+            whatToShow: Source for constructing bars, as for
+                :meth:`.IB.reqHistoricalData`.
+            useRTH: If True then only show data from within Regular
+                Trading Hours, if False then show all data.
+        """
+        return util.run(self.downloadAsync(
+            contract, start, end, barSizeSetting, whatToShow, useRTH))
+
+    async def downloadAsync(
+            self, contract: Contract,
+            start: Union[datetime, date_], end: Union[datetime, date_],
+            barSizeSetting: str, whatToShow: str, useRTH: bool) \
+            -> BarDataList:
+        # listen to the errors of IB only while downloads are running
+        if not self._numDownloads:
+            self.ib.errorEvent += self._onError
+        self._numDownloads += 1
+        try:
+            return await self._download(
+                contract, start, end, barSizeSetting, whatToShow, useRTH)
+        finally:
+            self._numDownloads -= 1
+            if not self._numDownloads:
+                self.ib.errorEvent -= self._onError
+                self._pacingErrors.clear()
+                self._requestErrors.clear()
+
+    async def _download(
+            self, contract: Contract,
+            start: Union[datetime, date_], end: Union[datetime, date_],
+            barSizeSetting: str, whatToShow: str, useRTH: bool) \
+            -> BarDataList:
+        startDt = _toUTC(start, barSizeSetting in _dailyBarSizes)
+        endDt = _toUTC(end)
+        bars = BarDataList()
+        bars.reqId = 0
+        bars.contract = contract
+        bars.endDateTime = end
+        bars.durationStr = ''
+        bars.barSizeSetting = barSizeSetting
+        bars.whatToShow = whatToShow
+        bars.useRTH = useRTH
+        bars.formatDate = 2
+        bars.keepUpToDate = False
+        bars.chartOptions = []
+        if self.cache and contract.conId:
+            key = (contract.conId, barSizeSetting, whatToShow, useRTH)
+            gaps = self.cache.gaps(key, startDt, endDt)
+            downloads = await asyncio.gather(*(
+                self._downloadRange(
+                    contract, gapStart, gapEnd, barSizeSetting,
+                    whatToShow, useRTH)
+                for gapStart, gapEnd in gaps))
+            for (gapStart, gapEnd), (gapBars, complete) in zip(
+                    gaps, downloads):
+                if complete:
+                    self.cache.put(key, gapStart, gapEnd, gapBars)
+            arr = self.cache.get(key, startDt, endDt)
+            isDaily = barSizeSetting in _dailyBarSizes
+            for row in arr.tolist():
+                dt = row[0].replace(tzinfo=timezone.utc)
+                bars.append(BarData(dt.date() if isDaily else dt, *row[1:]))
+            if not all(complete for _, complete in downloads):
+                # merge bars of incomplete downloads
+                barsByDate = {_toUTC(bar.date): bar for bar in bars}
+                for gapBars, _ in downloads:
+                    barsByDate.update(
+                        (_toUTC(bar.date), bar) for bar in gapBars)
+                bars[:] = [barsByDate[dt] for dt in sorted(barsByDate)]
+        else:
+            bars += (await self._downloadRange(
+                contract, startDt, endDt, barSizeSetting,
+                whatToShow, useRTH))[0]
+        return bars
+
+    async def _downloadRange(
+            self, contract: Contract, start: datetime, end: datetime,
+            barSizeSetting: str, whatToShow: str, useRTH: bool) \
+            -> Tuple[List[BarData], bool]:
+        """
+        Download the ordered bars in the range, together with a flag
+        that tells if all chunks were downloaded successfully.
+        """
+        span = timedelta(seconds=_chunkSpans[barSizeSetting])
+        chunkEnds = []
+        chunkEnd = end
+        while chunkEnd > start:
+            chunkEnds.append(chunkEnd)
+            chunkEnd -= span
+        durationStr = _durationStr(span)
+        chunks = await asyncio.gather(*(
+            self._downloadChunk(
+                contract, chunkEnd, durationStr, barSizeSetting,
+                whatToShow, useRTH)
+            for chunkEnd in chunkEnds))
+        barsByDate: Dict[datetime, BarData] = {}
+        for chunk in chunks:
+            for bar in chunk or []:
+                barDt = _toUTC(bar.date)
+                if start <= barDt < end:
+                    barsByDate[barDt] = bar
+        bars = [barsByDate[dt] for dt in sorted(barsByDate)]
+        return bars, all(chunk is not None for chunk in chunks)
+
+    async def _downloadChunk(
+            self, contract: Contract, end: datetime, durationStr: str,
+            barSizeSetting: str, whatToShow: str, useRTH: bool) \
+            -> Optional[List[BarData]]:
+        """Download one chunk, or return None if that failed."""
+        key = (
+            contract.conId or id(contract), end, durationStr,
+            barSizeSetting, whatToShow, useRTH)
+        weight = 2 if whatToShow == 'BID_ASK' else 1
+        async with self._semaphore:
+            reason = ''
+            for attempt in range(self.maxRetries + 1):
+                if attempt:
+                    self._logger.info(
+                        f'{reason}, retry {attempt} for '
+                        f'{contract} ending {end}')
+                    await asyncio.sleep(self.retryDelay * attempt)
+                await self._pace(key, weight)
+                try:
+                    t0 = time.time()
+                    bars = await self.ib.reqHistoricalDataAsync(
+                        contract, end, durationStr, barSizeSetting,
+                        whatToShow, useRTH, formatDate=2,
+                        timeout=self.timeout)
+                    error = self._requestErrors.pop(bars.reqId, None)
+                    if bars.reqId in self._pacingErrors:
+                        self._pacingErrors.discard(bars.reqId)
+                        reason = 'Pacing violation'
+                    elif error and not _isNoDataError(*error):
+                        raise RequestError(bars.reqId, *error)
+                    elif not bars and not error and \
+                            time.time() - t0 >= self.timeout:
+                        # an empty result after the timeout has expired
+                        reason = 'Timeout'
+                    else:
+                        return bars
+                except RequestError as e:
+                    if _isNoDataError(e.code, e.message):
+                        return []
+                    if not _isPacingError(e.code, e.message):
+                        raise
+                    reason = 'Pacing violation'
+            self._logger.error(
+                f'Giving up on {contract} ending {end} '
+                f'after {self.maxRetries} retries')
+            return None
+
+    async def _pace(self, key: Tuple, weight: int):
+        """Wait until a request can be made within the pacing limits."""
+        times = self._reqTimes
+        while True:
+            now = time.time()
+            while times and times[0] <= now - self.RequestsInterval:
+                times.popleft()
+            delay = 0.0
+            if len(times) + weight > self.MaxRequests:
+                delay = times[len(times) + weight - self.MaxRequests - 1] \
+                    + self.RequestsInterval - now
+            lastTime = self._lastReqTimes.get(key)
+            if lastTime is not None:
+                delay = max(delay, lastTime + self.IdenticalInterval - now)
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        times.extend([now] * weight)
+        self._lastReqTimes = {
+            k: t for k, t in self._lastReqTimes.items()
+            if t > now - self.IdenticalInterval}
+        self._lastReqTimes[key] = now
+
+    def _onError(self, reqId, errorCode, errorString, contract):
+        if _isPacingError(errorCode, errorString):
+            self._pacingErrors.add(reqId)
+        elif reqId > 0 and not isWarningCode(errorCode):
+            errors = self._requestErrors
+            errors[reqId] = (errorCode, errorString)
+            if len(errors) > 1000:
+                # drop the oldest, which are not for this downloader
+                del errors[next(iter(errors))]
+
+
+def _isPacingError(errorCode: int, errorString: str) -> bool:
+    return errorCode == 162 and 'pacing' in errorString.lower()
+
+
+def _isNoDataError(errorCode: int, errorString: str) -> bool:
+    # an empty but valid result, such as for a range without trading
+    return errorCode == 162 and 'returned no data' in errorString.lower()
+
+
+def _merge(parts):
+    # merge the sorted bar arrays, where later bars replace earlier bars
+    # with the same date
+    import numpy as np
+    if len(parts) == 1:
+        return parts[0]
+    arr = np.concatenate(parts)[::-1]
+    _, index = np.unique(arr['date'], return_index=True)
+    return arr[index]
+
+
+def _barDtype():
+    return [
+        ('date', 'datetime64[s]'), ('open', 'f8'), ('high', 'f8'),
+        ('low', 'f8'), ('close', 'f8'), ('volume', 'f8'),
+        ('average', 'f8'), ('barCount', 'i8')]
+
+
+def _toUTC(dt: Union[datetime, date_], daily: bool = False) -> datetime:
+    # daily bars are stored at midnight UTC of their date, so with
+    # daily bars a datetime is taken as the date that it falls on
+    if not isinstance(dt, datetime) or daily:
+        return datetime(dt.year, dt.month, dt.day, tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _barSeconds(barSizeSetting: str) -> int:
+    # a month is taken as 31 days, to be on the safe side
+    count, unit = barSizeSetting.split()
+    seconds = {
+        'sec': 1, 'min': 60, 'hou': 3600, 'day': DAY, 'wee': 7 * DAY,
+        'mon': 31 * DAY}[unit[:3]]
+    return int(count) * seconds
+
+
+def _durationStr(span: timedelta) -> str:
+    seconds = int(span.total_seconds())
+    if seconds < DAY:
+        return f'{seconds} S'
+    elif seconds < 365 * DAY:
+        return f'{seconds // DAY} D'
+    else:
+        return f'{seconds // (365 * DAY)} Y'
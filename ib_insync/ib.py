@@ -5,23 +5,27 @@ import copy
 import datetime
 import logging
 import time
-from typing import Awaitable, Dict, Iterator, List, Optional, Union
+from typing import (
+    Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple, Union)
 
 from eventkit import Event
 
 import ib_insync.util as util
 from ib_insync.client import Client
 from ib_insync.contract import Contract, ContractDescription, ContractDetails
+from ib_insync.contractcache import ContractDetailsCache
 from ib_insync.objects import (
-    AccountValue, BarDataList, DepthMktDataDescription, Execution,
-    ExecutionFilter, Fill, HistogramData, HistoricalNews, HistoricalSchedule,
-    NewsArticle, NewsBulletin, NewsProvider, NewsTick, OptionChain,
-    OptionComputation, PnL, PnLSingle, PortfolioItem, Position, PriceIncrement,
+    AccountValue, BarDataColumns, BarDataList, DepthMktDataDescription,
+    Execution, ExecutionFilter, Fill, HistogramData, HistoricalNews,
+    HistoricalSchedule, NewsArticle, NewsBulletin, NewsProvider, NewsTick,
+    OptionChain, OptionComputation, PnL, PnLSingle, PortfolioItem, Position,
+    PriceIncrement,
     RealTimeBarList, ScanDataList, ScannerSubscription, SmartComponent,
     TagValue, TradeLogEntry, WshEventData)
+from ib_insync.journal import TradeArchive
 from ib_insync.order import (
     BracketOrder, LimitOrder, Order, OrderState, OrderStatus, StopOrder, Trade)
-from ib_insync.ticker import Ticker
+from ib_insync.ticker import AggregatedBook, DepthBook, TickBuffer, Ticker
 from ib_insync.wrapper import Wrapper
 
 
@@ -95,6 +99,60 @@ class IB:
           if the number of sub-accounts exceeds this number (50 by default).
         TimezoneTWS (str): Specifies what timezone TWS (or gateway)
           is using. The default is to assume local system timezone.
+        CoalesceTicks (bool): Collect the price, size, string and generic
+          ticks of a network packet and apply only the last tick of every
+          tick type to its ticker once the whole packet has been handled.
+          This saves work when subscribed to many tickers. The ticks that
+          are superseded within a packet are dropped, so that
+          ``Ticker.ticks``, :class:`.TickBuffer` and the
+          :class:`.Tickfilter` operators get at most one tick per tick
+          type per update. Trade ticks (tick types 4, 5, 48, 68, 71 and
+          77) are never coalesced and are applied as they arrive, ahead
+          of the coalesced ticks of the packet. The ``prevBid``,
+          ``prevBidSize``, ``prevAsk`` and ``prevAskSize`` of a ticker
+          are the same as without coalescing.
+        TickBufferSize (int): If non-zero, attach a
+          :class:`.TickBuffer` of this capacity to every new ticker to
+          retain a columnar history of its level-1 ticks. Requires NumPy.
+        DepthBookArrays (bool): Keep the order book of new market
+          depth subscriptions in a :class:`.DepthBook` of NumPy arrays
+          in ``ticker.domBook``, instead of in lists of levels and ticks.
+          Requires NumPy.
+        AggregateSmartDepth (bool): With SMART depth subscriptions, also
+          keep an :class:`.AggregatedBook` in ``ticker.domAggregate``
+          that consolidates the levels of all market makers by price.
+        CompactTickers (bool): Create new tickers as
+          :class:`.CompactTicker`, which uses ``__slots__`` to save memory
+          when holding many tickers.
+        MaxDoneTrades (int): Keep at most this many completed trades,
+          with their fills, in memory. The oldest completed trades are
+          evicted first. Set to 0 for no limit.
+        MaxDoneTradeAge (float): Evict the completed trades that were
+          completed more than this many seconds ago. This is checked
+          whenever a trade completes. Set to 0 for no limit.
+        TradeArchivePath (str): File to archive the evicted trades in,
+          with their fills and logs, see :meth:`.archivedTrades`.
+          If empty then evicted trades are discarded.
+        MaxTradeLog (int): Keep at most this many of the latest entries
+          in the log of a trade. Set to 0 for no limit.
+        OrderJournalPath (str): If set, write every order placement,
+          modification, status change and fill to an
+          :class:`.OrderJournal` in this file. On connecting, the trades
+          and fills are restored from the journal (see
+          :meth:`.restoreTrades`), reconciled with the open and
+          completed orders of TWS and the journal is compacted.
+        OrderJournalSync (str): When to flush the order journal to disk:
+          ``'always'``, once per network packet (``'batch'``, the
+          default) or never (``'none'``, leave it to the operating
+          system). The journal survives a crash of the process with
+          any policy.
+        ContractCacheTTL (float): If non-zero, cache the contract details
+          that are received for this many seconds (or until the last
+          trading day of the contract), so that
+          :meth:`.reqContractDetails` and :meth:`.qualifyContracts`
+          request only the contracts that are not cached yet.
+        ContractCachePath (str): File to persist the contract details
+          cache in, so that it is kept across sessions.
 
     Events:
         * ``connectedEvent`` ():
@@ -203,11 +261,25 @@ class IB:
     RaiseRequestErrors: bool = False
     MaxSyncedSubAccounts: int = 50
     TimezoneTWS: str = ''
+    CoalesceTicks: bool = False
+    TickBufferSize: int = 0
+    DepthBookArrays: bool = False
+    AggregateSmartDepth: bool = False
+    CompactTickers: bool = False
+    MaxDoneTrades: int = 0
+    MaxDoneTradeAge: float = 0
+    TradeArchivePath: str = ''
+    MaxTradeLog: int = 0
+    OrderJournalPath: str = ''
+    OrderJournalSync: str = 'batch'
+    ContractCacheTTL: float = 0
+    ContractCachePath: str = ''
 
     def __init__(self):
         self._createEvents()
         self.wrapper = Wrapper(self)
         self.client = Client(self.wrapper)
+        self._contractCache: Optional[ContractDetailsCache] = None
         self.errorEvent += self._onError
         self.client.apiEnd += self.disconnectedEvent
         self._logger = logging.getLogger('ib_insync.ib')
@@ -289,6 +361,8 @@ class IB:
         Disconnect from a TWS or IB gateway application.
         This will clear all session state.
         """
+        if self._contractCache:
+            self._contractCache.save()
         if not self.client.isConnected():
             return
         stats = self.client.connectionStats()
@@ -479,27 +553,111 @@ class IB:
                 and (not modelCode or v.modelCode == modelCode)
                 and (not conId or v.conId == conId)]
 
-    def trades(self) -> List[Trade]:
-        """List of all order trades from this session."""
-        return list(self.wrapper.trades.values())
+    def trades(
+            self, contract: Optional[Contract] = None, account: str = '',
+            orderRef: str = '', parentId: int = 0) -> List[Trade]:
+        """
+        List of all order trades from this session.
+
+        The trades can be selected by any combination of the optional
+        arguments, in time proportional to the number of selected trades.
+
+        Args:
+            contract: Select only trades for this contract (by conId).
+            account: Select only trades for this account.
+            orderRef: Select only trades with this order reference.
+            parentId: Select only child trades of this parent order id.
+        """
+        criteria = self._tradeCriteria(contract, account, orderRef, parentId)
+        if not criteria:
+            return list(self.wrapper.trades.values())
+        return self.wrapper.tradeIndex.select(**criteria)
 
-    def openTrades(self) -> List[Trade]:
-        """List of all open order trades."""
-        return [v for v in self.wrapper.trades.values()
-                if v.orderStatus.status not in OrderStatus.DoneStates]
+    def openTrades(
+            self, contract: Optional[Contract] = None, account: str = '',
+            orderRef: str = '', parentId: int = 0) -> List[Trade]:
+        """
+        List of all open order trades.
 
-    def orders(self) -> List[Order]:
-        """List of all orders from this session."""
-        return list(
-            trade.order for trade in self.wrapper.trades.values())
+        The arguments are as for :meth:`.trades`.
+        """
+        criteria = self._tradeCriteria(contract, account, orderRef, parentId)
+        return self.wrapper.tradeIndex.select(openOnly=True, **criteria)
 
-    def openOrders(self) -> List[Order]:
-        """List of all open orders."""
-        return [trade.order for trade in self.wrapper.trades.values()
-                if trade.orderStatus.status not in OrderStatus.DoneStates]
+    def orders(
+            self, contract: Optional[Contract] = None, account: str = '',
+            orderRef: str = '', parentId: int = 0) -> List[Order]:
+        """
+        List of all orders from this session.
+
+        The arguments are as for :meth:`.trades`.
+        """
+        return [
+            trade.order for trade in self.trades(
+                contract, account, orderRef, parentId)]
+
+    def openOrders(
+            self, contract: Optional[Contract] = None, account: str = '',
+            orderRef: str = '', parentId: int = 0) -> List[Order]:
+        """
+        List of all open orders.
+
+        The arguments are as for :meth:`.trades`.
+        """
+        return [
+            trade.order for trade in self.openTrades(
+                contract, account, orderRef, parentId)]
+
+    @staticmethod
+    def _tradeCriteria(
+            contract: Optional[Contract], account: str,
+            orderRef: str, parentId: int) -> dict:
+        criteria: Dict[str, Union[int, str]] = {}
+        if contract is not None:
+            criteria['conId'] = contract.conId
+        if account:
+            criteria['account'] = account
+        if orderRef:
+            criteria['orderRef'] = orderRef
+        if parentId:
+            criteria['parentId'] = parentId
+        return criteria
+
+    def archivedTrades(
+            self, permIds: Optional[Iterable[int]] = None,
+            start: Optional[datetime.datetime] = None,
+            end: Optional[datetime.datetime] = None) -> List[Trade]:
+        """
+        Restore completed trades that were evicted from memory into
+        the archive at ``TradeArchivePath``.
+
+        Args:
+            permIds: If given, restore only the trades with these permIds.
+            start: If given, restore only the trades completed at or
+                after this time.
+            end: If given, restore only the trades completed before
+                this time.
+        """
+        if not self.TradeArchivePath:
+            return []
+        return TradeArchive(self.TradeArchivePath).load(permIds, start, end)
+
+    def restoreTrades(self) -> List[Trade]:
+        """
+        Restore the trades and fills from the order journal
+        (see ``OrderJournalPath``) and return the restored trades.
+        Trades and fills that are already known are left alone.
+
+        This is done automatically when connecting, but can also be
+        used to inspect the journal while not connected.
+        """
+        return self.wrapper.restoreTrades()
 
     def fills(self) -> List[Fill]:
-        """List of all fills from this session."""
+        """
+        List of all fills from this session, except those of the trades
+        that were evicted (see ``MaxDoneTrades``).
+        """
         return list(self.wrapper.fills.values())
 
     def executions(self) -> List[Execution]:
@@ -550,6 +708,9 @@ class IB:
         Request and return a list of snapshot tickers.
         The list is returned when all tickers are ready.
 
+        All snapshots are requested at once; For a large number of
+        contracts use :meth:`.MktDataLines.snapshots` instead.
+
         This method is blocking.
 
         Args:
@@ -657,19 +818,87 @@ class IB:
             order: The order to be placed.
         """
         orderId = order.orderId or self.client.getReqId()
-        self.client.placeOrder(orderId, contract, order)
         now = datetime.datetime.now(datetime.timezone.utc)
+        trade, isNew = self._addOrder(orderId, contract, order, now)
+        try:
+            self.client.placeOrder(orderId, contract, order)
+        except BaseException:
+            self._discardOrder(trade, isNew)
+            raise
+        if isNew:
+            self._logger.info(f'placeOrder: New order {trade}')
+        else:
+            self._logger.info(f'placeOrder: Modify order {trade}')
+        self._emitOrderPlaced(trade, isNew)
+        return trade
+
+    def placeOrders(
+            self, pairs: Iterable[Tuple[Contract, Order]],
+            timeout: float = 60) \
+            -> Tuple[List[Trade], 'asyncio.Future[List[Trade]]']:
+        """
+        Place new orders or modify existing orders in bulk.
+
+        The order IDs of the new orders are allocated in one block and
+        the orders are serialized in one pass and sent in a single
+        buffer, as far as throttling allows.
+
+        Returns the list of trades, in the same order as the given pairs,
+        together with a future that is resolved with this list once TWS
+        has acknowledged all of the new and modified orders (see
+        the ``ackEvent`` of :class:`.Trade`). The future fails with
+        ``asyncio.TimeoutError`` if not all orders are acknowledged
+        in time, or with ``ConnectionError`` on a disconnect.
+
+        Args:
+            pairs: The ``(contract, order)`` pairs to place.
+            timeout: Timeout in seconds to wait for the acknowledgements.
+                Use 0 to wait indefinitely.
+        """
+        pairs = list(pairs)
+        numNew = sum(1 for _, order in pairs if not order.orderId)
+        newIds = iter(self.client.getReqIds(numNew))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        orders = []
+        placed = []
+        for contract, order in pairs:
+            orderId = order.orderId or next(newIds)
+            placed.append(self._addOrder(orderId, contract, order, now))
+            orders.append((orderId, contract, order))
+        try:
+            self.client.placeOrders(orders)
+        except BaseException:
+            # none of the orders are sent
+            for trade, isNew in reversed(placed):
+                self._discardOrder(trade, isNew)
+            raise
+        self._logger.info(
+            f'placeOrders: {numNew} new orders, '
+            f'{len(pairs) - numNew} modified orders')
+        trades = []
+        for trade, isNew in placed:
+            self._emitOrderPlaced(trade, isNew)
+            trades.append(trade)
+        return trades, self._orderAcks(trades, timeout)
+
+    def _addOrder(
+            self, orderId: int, contract: Contract, order: Order,
+            now: datetime.datetime) -> Tuple[Trade, bool]:
+        # create or update the trade of an order that is about to be sent
+        # and return it, with True if it is a new trade
         key = self.wrapper.orderKey(
             self.wrapper.clientId, orderId, order.permId)
         trade = self.wrapper.trades.get(key)
+        journal = self.wrapper.orderJournal()
         if trade:
             # this is a modification of an existing order
             assert trade.orderStatus.status not in OrderStatus.DoneStates
             logEntry = TradeLogEntry(now, trade.orderStatus.status, 'Modify')
-            trade.log.append(logEntry)
-            self._logger.info(f'placeOrder: Modify order {trade}')
-            trade.modifyEvent.emit(trade)
-            self.orderModifyEvent.emit(trade)
+            if journal:
+                journal.modifyOrder(key, order, logEntry)
+            self.wrapper._appendLog(trade, logEntry)
+            self.wrapper.tradeIndex.update(key, trade)
+            return trade, False
         else:
             # this is a new order
             order.clientId = self.wrapper.clientId
@@ -678,10 +907,77 @@ class IB:
                 orderId=orderId, status=OrderStatus.PendingSubmit)
             logEntry = TradeLogEntry(now, orderStatus.status)
             trade = Trade(contract, order, orderStatus, [], [logEntry])
+            if journal:
+                journal.newTrade(key, trade)
             self.wrapper.trades[key] = trade
-            self._logger.info(f'placeOrder: New order {trade}')
+            self.wrapper.tradeIndex.update(key, trade)
+            return trade, True
+
+    def _discardOrder(self, trade: Trade, isNew: bool):
+        # undo _addOrder for an order that could not be sent
+        order = trade.order
+        key = self.wrapper.orderKey(
+            self.wrapper.clientId, order.orderId, order.permId)
+        journal = self.wrapper.orderJournal()
+        if isNew:
+            self.wrapper.trades.pop(key, None)
+            self.wrapper.tradeIndex.remove(key)
+            if journal:
+                journal.evictTrade(key)
+        else:
+            trade.log.pop()
+            if journal:
+                journal.newTrade(key, trade)
+
+    def _emitOrderPlaced(self, trade: Trade, isNew: bool):
+        if isNew:
             self.newOrderEvent.emit(trade)
-        return trade
+        else:
+            trade.modifyEvent.emit(trade)
+            self.orderModifyEvent.emit(trade)
+
+    def _orderAcks(self, trades: List[Trade], timeout: float) \
+            -> 'asyncio.Future[List[Trade]]':
+        # future that is resolved once TWS has acknowledged every trade,
+        # or failed on a timeout or disconnect
+        loop = util.getLoop()
+        future = loop.create_future()
+        pending = {id(trade) for trade in trades}
+
+        def onAck(trade):
+            trade.ackEvent -= onAck
+            pending.discard(id(trade))
+            if not pending:
+                done(None)
+
+        def onDisconnected():
+            done(ConnectionError('Disconnected before all orders were acked'))
+
+        def onTimeout():
+            done(asyncio.TimeoutError(
+                f'{len(pending)} of {len(trades)} orders not acked '
+                f'after {timeout}s'))
+
+        def done(error):
+            for trade in trades:
+                trade.ackEvent -= onAck
+            self.disconnectedEvent -= onDisconnected
+            if handle:
+                handle.cancel()
+            if future.done():
+                return
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(trades)
+
+        handle = loop.call_later(timeout, onTimeout) if timeout else None
+        self.disconnectedEvent += onDisconnected
+        for trade in trades:
+            trade.ackEvent += onAck
+        if not trades:
+            done(None)
+        return future
 
     def cancelOrder(self, order: Order, manualCancelOrderTime: str = '') \
             -> Optional[Trade]:
@@ -706,8 +1002,12 @@ class IB:
                 else:
                     newStatus = OrderStatus.PendingCancel
                 logEntry = TradeLogEntry(now, newStatus)
-                trade.log.append(logEntry)
+                self.wrapper._appendLog(trade, logEntry)
                 trade.orderStatus.status = newStatus
+                self.wrapper.tradeIndex.update(key, trade)
+                journal = self.wrapper.orderJournal()
+                if journal:
+                    journal.orderStatus(key, trade.orderStatus, logEntry)
                 self._logger.info(f'cancelOrder: {trade}')
                 trade.cancelEvent.emit(trade)
                 trade.statusEvent.emit(trade)
@@ -715,6 +1015,7 @@ class IB:
                 self.orderStatusEvent.emit(trade)
                 if newStatus == OrderStatus.Cancelled:
                     trade.cancelledEvent.emit(trade)
+                    self.wrapper.pruneTrades()
         else:
             self._logger.error(f'cancelOrder: Unknown orderId {order.orderId}')
         return trade
@@ -1076,6 +1377,28 @@ class IB:
                 contract, endDateTime, durationStr, barSizeSetting, whatToShow,
                 useRTH, formatDate, keepUpToDate, chartOptions, timeout))
 
+    def reqHistoricalDataColumns(
+            self, contract: Contract,
+            endDateTime: Union[datetime.datetime, datetime.date, str, None],
+            durationStr: str, barSizeSetting: str, whatToShow: str,
+            useRTH: bool, chartOptions: List[TagValue] = [],
+            timeout: float = 60) -> BarDataColumns:
+        """
+        Request historical bar data as columns, for large requests where
+        creating a :class:`.BarData` for every bar is too costly.
+        Use :meth:`.BarDataColumns.to_numpy` or
+        :meth:`.BarDataColumns.to_pandas` to get the bars.
+
+        This method is blocking.
+
+        The arguments are as for :meth:`.reqHistoricalData`; Intraday
+        dates are always requested as UTC.
+        """
+        return self._run(
+            self.reqHistoricalDataColumnsAsync(
+                contract, endDateTime, durationStr, barSizeSetting,
+                whatToShow, useRTH, chartOptions, timeout))
+
     def cancelHistoricalData(self, bars: BarDataList):
         """
         Cancel the update subscription for the historical bars.
@@ -1237,6 +1560,12 @@ class IB:
         """
         reqId = self.client.getReqId()
         ticker = self.wrapper.startTicker(reqId, contract, 'mktData')
+        if ticker.tickBuffer is not None:
+            ticks = genericTickList.replace(' ', '').split(',')
+            for tick, tickTypes in TickBuffer.RTVolumeTickTypes.items():
+                if tick in ticks:
+                    ticker.tickBuffer.tradeTickTypes = tickTypes
+                    break
         self.client.reqMktData(
             reqId, contract, genericTickList, snapshot,
             regulatorySnapshot, mktDataOptions)
@@ -1329,12 +1658,23 @@ class IB:
         Returns:
             The Ticker that holds the market depth in ``ticker.domBids``
             and ``ticker.domAsks`` and the list of MktDepthData in
-            ``ticker.domTicks``.
+            ``ticker.domTicks``, or in ``ticker.domBook`` if
+            :attr:`DepthBookArrays` is set, and the consolidated book
+            in ``ticker.domAggregate`` if :attr:`AggregateSmartDepth`
+            is set.
         """
         reqId = self.client.getReqId()
         ticker = self.wrapper.startTicker(reqId, contract, 'mktDepth')
         ticker.domBids.clear()
         ticker.domAsks.clear()
+        if self.DepthBookArrays:
+            ticker.domBook = DepthBook(numRows)
+        else:
+            ticker.domBook = None
+        if isSmartDepth and self.AggregateSmartDepth:
+            ticker.domAggregate = AggregatedBook()
+        else:
+            ticker.domAggregate = None
         self.client.reqMktDepth(
             reqId, contract, numRows, isSmartDepth, mktDepthOptions)
         return ticker
@@ -1785,6 +2125,16 @@ class IB:
             # establish API connection
             await self.client.connectAsync(host, port, clientId, timeout)
 
+            # restore trades from the order journal
+            restored = []
+            if self.OrderJournalPath and not readonly:
+                restored = self.restoreTrades()
+                orderIds = [
+                    t.order.orderId for t in restored
+                    if t.order.clientId == clientId]
+                if orderIds:
+                    self.client.updateReqId(max(orderIds) + 1)
+
             # autobind manual orders
             if clientId == 0:
                 self.reqAutoOpenOrders(True)
@@ -1813,7 +2163,8 @@ class IB:
                 for req in reqs.values()]
             errors = []
             resps = await asyncio.gather(*tasks, return_exceptions=True)
-            for name, resp in zip(reqs, resps):
+            results = dict(zip(reqs, resps))
+            for name, resp in results.items():
                 if isinstance(resp, asyncio.TimeoutError):
                     msg = f'{name} request timed out'
                     errors.append(msg)
@@ -1830,6 +2181,14 @@ class IB:
             if raiseSyncErrors and len(errors) > 0:
                 raise ConnectionError(errors)
 
+            journal = self.wrapper.orderJournal()
+            if journal and not readonly:
+                if restored:
+                    self._reconcileTrades(
+                        restored, results.get('open orders'),
+                        results.get('completed orders'))
+                journal.checkpoint(self.wrapper.trades, self.wrapper.fills)
+
             # final check if socket is still ready
             if not self.client.isReady():
                 raise ConnectionError(
@@ -1842,6 +2201,45 @@ class IB:
             raise
         return self
 
+    def _reconcileTrades(
+            self, restored: List[Trade], openTrades, completedTrades):
+        # restored trades that are neither open nor completed in TWS
+        # anymore have to be brought up to date
+        if not isinstance(openTrades, list):
+            return
+        openIds = {id(trade) for trade in openTrades}
+        completed = {
+            trade.order.permId: trade for trade in completedTrades
+        } if isinstance(completedTrades, list) else {}
+        clientId = self.wrapper.clientId
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for trade in restored:
+            order = trade.order
+            if trade.isDone() or id(trade) in openIds:
+                continue
+            if order.permId in completed:
+                status = completed[order.permId].orderStatus.status
+            elif not order.permId and order.clientId == clientId:
+                # never acknowledged and not open, so it didn't reach TWS
+                status = OrderStatus.Cancelled
+            else:
+                self._logger.warning(
+                    f'Restored trade is not known by TWS: {trade}')
+                continue
+            trade.orderStatus.status = status
+            logEntry = TradeLogEntry(now, status, 'Reconciled')
+            self.wrapper._appendLog(trade, logEntry)
+            key = self.wrapper.orderKey(
+                order.clientId, order.orderId, order.permId)
+            self.wrapper.tradeIndex.update(key, trade)
+            journal = self.wrapper.orderJournal()
+            if journal:
+                journal.orderStatus(key, trade.orderStatus, logEntry)
+            self._logger.info(f'Reconciled restored trade: {trade}')
+            self.orderStatusEvent.emit(trade)
+            trade.statusEvent.emit(trade)
+        self.wrapper.pruneTrades()
+
     async def qualifyContractsAsync(self, *contracts: Contract) \
             -> List[Contract]:
         detailsLists = await asyncio.gather(
@@ -1971,11 +2369,43 @@ class IB:
 
     def reqContractDetailsAsync(self, contract: Contract) \
             -> Awaitable[List[ContractDetails]]:
+        cache = self.contractDetailsCache()
+        if cache:
+            detailsList = cache.get(contract)
+            if detailsList is not None:
+                future = util.getLoop().create_future()
+                future.set_result(detailsList)
+                return future
         reqId = self.client.getReqId()
         future = self.wrapper.startReq(reqId, contract)
         self.client.reqContractDetails(reqId, contract)
+        if cache:
+            spec = copy.copy(contract)
+
+            def onDetails(f):
+                if not f.cancelled() and not f.exception():
+                    cache.put(spec, f.result())
+
+            future.add_done_callback(onDetails)
         return future
 
+    def contractDetailsCache(self) -> Optional[ContractDetailsCache]:
+        """
+        Get the contract details cache as configured by
+        ``ContractCacheTTL`` and ``ContractCachePath``,
+        or None if there is no cache.
+        """
+        ttl = self.ContractCacheTTL
+        path = self.ContractCachePath
+        cache = self._contractCache
+        if not ttl:
+            return None
+        if not cache or cache.ttl != ttl or cache.path != path:
+            if cache:
+                cache.save()
+            cache = self._contractCache = ContractDetailsCache(path, ttl)
+        return cache
+
     async def reqMatchingSymbolsAsync(self, pattern: str) \
             -> Optional[List[ContractDescription]]:
         reqId = self.client.getReqId()
@@ -2035,6 +2465,38 @@ class IB:
             bars.clear()
         return bars
 
+    async def reqHistoricalDataColumnsAsync(
+            self, contract: Contract,
+            endDateTime: Union[datetime.datetime, datetime.date, str, None],
+            durationStr: str, barSizeSetting: str,
+            whatToShow: str, useRTH: bool,
+            chartOptions: List[TagValue] = [], timeout: float = 60) \
+            -> BarDataColumns:
+        reqId = self.client.getReqId()
+        bars = BarDataColumns()
+        bars.reqId = reqId
+        bars.contract = contract
+        bars.endDateTime = endDateTime
+        bars.durationStr = durationStr
+        bars.barSizeSetting = barSizeSetting
+        bars.whatToShow = whatToShow
+        bars.useRTH = useRTH
+        bars.chartOptions = chartOptions or []
+        future = self.wrapper.startReq(reqId, contract, container=bars)
+        end = util.formatIBDatetime(endDateTime)
+        self.client.reqHistoricalData(
+            reqId, contract, end, durationStr, barSizeSetting,
+            whatToShow, useRTH, 2, False, chartOptions)
+        task = asyncio.wait_for(future, timeout) if timeout else future
+        try:
+            await task
+        except asyncio.TimeoutError:
+            self.client.cancelHistoricalData(reqId)
+            self._logger.warning(
+                f'reqHistoricalDataColumns: Timeout for {contract}')
+            bars.clear()
+        return bars
+
     def reqHistoricalScheduleAsync(
             self, contract: Contract, numDays: int,
             endDateTime: Union[
@@ -0,0 +1,369 @@
+"""On-disk journals of orders and trades."""
+
+import dataclasses
+import gc
+import logging
+import operator
+import os
+import pickle
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ib_insync.contract import Contract
+from ib_insync.objects import CommissionReport, Execution, Fill
+from ib_insync.order import Order, OrderStatus, Trade, TradeLogEntry
+from ib_insync.util import dataclassUpdate
+
+
+class TradeArchive:
+    """
+    Append-only on-disk archive of completed trades, together with
+    their fills and logs.
+
+    Every record holds the completion time and permId of the trade, so
+    that the archive can be searched without restoring every trade.
+    The records are pickled, so only open archives from a trusted source.
+
+    Args:
+        path: File name of the archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, trades: Iterable[Tuple[float, Trade]]):
+        """
+        Append the given ``(completion timestamp, trade)`` pairs.
+        """
+        with open(self.path, 'ab') as f:
+            for doneTime, trade in trades:
+                data = pickle.dumps((
+                    trade.contract, trade.order, trade.orderStatus,
+                    trade.fills, trade.log, trade.advancedError))
+                pickle.dump((doneTime, trade.order.permId, data), f)
+
+    def __iter__(self) -> Iterator[Trade]:
+        return iter(self.load())
+
+    def load(
+            self, permIds: Optional[Iterable[int]] = None,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None) -> List[Trade]:
+        """
+        Restore archived trades, in the order that they were archived.
+
+        Args:
+            permIds: If given, restore only the trades with these permIds.
+            start: If given, restore only the trades completed at or
+                after this time.
+            end: If given, restore only the trades completed before
+                this time.
+        """
+        if not os.path.exists(self.path):
+            return []
+        permIdSet = set(permIds) if permIds is not None else None
+        t0 = _timestamp(start) if start else -1.0
+        t1 = _timestamp(end) if end else float('inf')
+        trades = []
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    doneTime, permId, data = pickle.load(f)
+                except EOFError:
+                    break
+                if permIdSet is not None and permId not in permIdSet:
+                    continue
+                if not t0 <= doneTime < t1:
+                    continue
+                trades.append(Trade(*pickle.loads(data)))
+        return trades
+
+
+class OrderJournal:
+    """
+    Write-ahead journal of order placements, modifications, status
+    changes and fills, from which the trades and fills of a session
+    can be restored after a crash.
+
+    Every record is written to the operating system before the
+    order is sent or the update is handed to the user, so that the
+    journal survives a crash of the process. The ``sync`` policy
+    determines when the journal is also flushed to disk to survive
+    a crash of the machine:
+
+    * ``'always'``: After every record;
+    * ``'batch'``: Once per processed network packet
+      (see :meth:`.sync`);
+    * ``'none'``: Leave it to the operating system.
+
+    A record that is only partly written when the process dies is
+    detected by its checksum and discarded on replay. Contracts and
+    orders are recorded by their non-default fields only, which keeps
+    the records small and fast to replay.
+    The records are pickled, so only open journals from a trusted source.
+
+    Args:
+        path: File name of the journal.
+        sync: Disk synchronization policy.
+    """
+
+    SyncPolicies = ('always', 'batch', 'none')
+
+    _New, _Modify, _Status, _Fill, _Commission, _Evict = range(6)
+
+    _header = struct.Struct('<II')
+
+    def __init__(self, path: str, sync: str = 'batch'):
+        if sync not in self.SyncPolicies:
+            raise ValueError(f'Unknown sync policy: {sync}')
+        self.path = path
+        self.syncPolicy = sync
+        self._fd: Optional[int] = None
+        self._dirty = False
+        self._logger = logging.getLogger('ib_insync.journal')
+
+    def close(self):
+        """
+        Sync and close the journal file.
+        """
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def sync(self):
+        """
+        Flush records that are written since the last sync to disk.
+        """
+        if self._dirty and self._fd is not None:
+            os.fsync(self._fd)
+            self._dirty = False
+
+    def newTrade(self, key, trade: Trade):
+        """
+        Record a new trade, or the full state of an existing trade.
+        """
+        self._write((
+            self._New, key, _nonDefaults(trade.contract),
+            _nonDefaults(trade.order), _values(trade.orderStatus),
+            [_values(entry) for entry in trade.log]))
+
+    def modifyOrder(
+            self, key, order: Order,
+            logEntry: Optional[TradeLogEntry] = None):
+        """
+        Record a modification of the order of a trade.
+        """
+        self._write((
+            self._Modify, key, _nonDefaults(order),
+            _values(logEntry) if logEntry else None))
+
+    def orderStatus(
+            self, key, orderStatus: OrderStatus,
+            logEntry: Optional[TradeLogEntry] = None):
+        """
+        Record a change of the order status of a trade.
+        """
+        self._write((
+            self._Status, key, _values(orderStatus),
+            _values(logEntry) if logEntry else None))
+
+    def fill(
+            self, key, fill: Fill,
+            logEntry: Optional[TradeLogEntry] = None):
+        """
+        Record a fill, with key None if it does not belong to a
+        known trade.
+        """
+        self._write((
+            self._Fill, key, _nonDefaults(fill.contract),
+            _nonDefaults(fill.execution), _values(fill.commissionReport),
+            fill.time, _values(logEntry) if logEntry else None))
+
+    def commissionReport(self, report: CommissionReport):
+        """
+        Record the commission report of a fill.
+        """
+        self._write((self._Commission, report))
+
+    def evictTrade(self, key):
+        """
+        Record that a trade, and its fills, are no longer kept.
+        """
+        self._write((self._Evict, key))
+
+    def _write(self, record: tuple):
+        data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        if self._fd is None:
+            self._fd = os.open(
+                self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(
+            self._fd,
+            self._header.pack(len(data), zlib.crc32(data)) + data)
+        self._dirty = True
+        if self.syncPolicy == 'always':
+            self.sync()
+
+    def records(self) -> Iterator[tuple]:
+        """
+        Iterate over the intact records of the journal. A damaged
+        tail, left by a crash in the middle of a write, is truncated.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            buf = f.read()
+        size = self._header.size
+        pos = 0
+        end = len(buf)
+        while pos + size <= end:
+            length, crc = self._header.unpack_from(buf, pos)
+            data = buf[pos + size:pos + size + length]
+            if len(data) < length or zlib.crc32(data) != crc:
+                break
+            yield pickle.loads(data)
+            pos += size + length
+        if pos < end:
+            self._logger.warning(
+                f'Discarding {end - pos} bytes of damaged journal tail')
+            self.close()
+            os.truncate(self.path, pos)
+
+    def replay(self) -> Tuple[Dict, Dict[str, Fill]]:
+        """
+        Replay the journal and return the restored trades
+        (by order key) and fills (by execId).
+        """
+        trades: Dict = {}
+        permId2Trade: Dict[int, Trade] = {}
+        fills: Dict[str, Fill] = {}
+        # the replay creates many objects and none of them are garbage,
+        # so spare the garbage collector from scanning them repeatedly
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._replay(trades, permId2Trade, fills)
+        finally:
+            if gcEnabled:
+                gc.enable()
+        return trades, fills
+
+    def _replay(self, trades, permId2Trade, fills):
+        for record in self.records():
+            kind = record[0]
+            if kind == self._Status:
+                _, key, values, logEntry = record
+                trade = trades.get(key)
+                if trade:
+                    trade.orderStatus = OrderStatus(*values)
+                    if logEntry:
+                        trade.log.append(TradeLogEntry(*logEntry))
+            elif kind == self._Fill:
+                _, key, contractFields, executionFields, reportValues, \
+                    time, logEntry = record
+                fill = Fill(
+                    Contract.create(**contractFields),
+                    Execution(**executionFields),
+                    CommissionReport(*reportValues), time)
+                fills[fill.execution.execId] = fill
+                trade = permId2Trade.get(fill.execution.permId) \
+                    or trades.get(key)
+                if trade:
+                    trade.fills.append(fill)
+                    if logEntry:
+                        trade.log.append(TradeLogEntry(*logEntry))
+            elif kind == self._Commission:
+                report = record[1]
+                fill = fills.get(report.execId)
+                if fill:
+                    dataclassUpdate(fill.commissionReport, report)
+            elif kind == self._New:
+                _, key, contractFields, orderFields, values, log = record
+                order = Order(**orderFields)
+                old = trades.get(key)
+                trade = trades[key] = Trade(
+                    Contract.create(**contractFields), order,
+                    OrderStatus(*values), old.fills if old else [],
+                    [TradeLogEntry(*entry) for entry in log])
+                if order.permId:
+                    permId2Trade[order.permId] = trade
+            elif kind == self._Modify:
+                _, key, orderFields, logEntry = record
+                trade = trades.get(key)
+                if trade:
+                    order = trade.order = Order(**orderFields)
+                    if order.permId:
+                        permId2Trade[order.permId] = trade
+                    if logEntry:
+                        trade.log.append(TradeLogEntry(*logEntry))
+            elif kind == self._Evict:
+                trade = trades.pop(record[1], None)
+                if trade:
+                    permId2Trade.pop(trade.order.permId, None)
+                    for fill in trade.fills:
+                        fills.pop(fill.execution.execId, None)
+
+    def checkpoint(self, trades: Dict, fills: Dict[str, Fill]):
+        """
+        Replace the journal with a compact snapshot of the given
+        trades (by order key) and fills (by execId).
+        """
+        self.close()
+        path = self.path
+        self.path = path + '.tmp'
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        try:
+            tradeFills = set()
+            for key, trade in trades.items():
+                self.newTrade(key, trade)
+                for fill in trade.fills:
+                    self.fill(key, fill)
+                    tradeFills.add(fill.execution.execId)
+            for execId, fill in fills.items():
+                if execId not in tradeFills:
+                    self.fill(None, fill)
+            if self._fd is None:
+                self._fd = os.open(
+                    self.path, os.O_WRONLY | os.O_CREAT, 0o644)
+            self._dirty = True
+            self.close()
+            os.replace(self.path, path)
+        finally:
+            self.path = path
+
+
+_fieldGetters: Dict[type, tuple] = {}
+
+
+def _fieldGetter(cls: type) -> tuple:
+    # the field names, field value getter and default values of a dataclass
+    getter = _fieldGetters.get(cls)
+    if getter is None:
+        fields = dataclasses.fields(cls)
+        names = tuple(f.name for f in fields)
+        defaults = tuple(
+            f.default_factory() if f.default_factory is not dataclasses.MISSING
+            else f.default for f in fields)
+        getter = _fieldGetters[cls] = (
+            names, operator.attrgetter(*names), defaults)
+    return getter
+
+
+def _values(obj) -> tuple:
+    return _fieldGetter(type(obj))[1](obj)
+
+
+def _nonDefaults(obj) -> dict:
+    names, get, defaults = _fieldGetter(type(obj))
+    return {
+        name: value for name, value, default in zip(names, get(obj), defaults)
+        if value != default}
+
+
+def _timestamp(dt: datetime) -> float:
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
@@ -0,0 +1,276 @@
+"""Budgeted use and rotation of market data lines."""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, List, Optional
+
+from eventkit import Event
+
+import ib_insync.util as util
+from ib_insync.contract import Contract, TagValue
+from ib_insync.ib import IB
+from ib_insync.ticker import Ticker
+from ib_insync.wrapper import RequestError
+
+
+@dataclass
+class LineCoverage:
+    """
+    How a contract was covered by a rotation of market data lines.
+
+    Args:
+        contract: The covered contract.
+        ticker: Ticker with the market data of the contract.
+        waitTime: Time (in seconds) from the start of the rotation,
+            when all contracts are queued, until a line was free for
+            the contract. With :meth:`MktDataLines.snapshots` this
+            includes the time that the caller took to consume the
+            earlier tickers.
+        latency: Time (in seconds) from requesting the market data to
+            receiving the first of it, or nan if none was received.
+        lineTime: Time (in seconds) that the line was in use.
+        timedOut: True if a snapshot did not finish in time.
+        error: The request error of a failed snapshot, if request
+            errors are raised.
+    """
+
+    contract: Contract
+    ticker: Optional[Ticker] = None
+    waitTime: float = 0.0
+    latency: float = math.nan
+    lineTime: float = 0.0
+    timedOut: bool = False
+    error: Optional[RequestError] = None
+
+
+@dataclass
+class MktDataLines:
+    """
+    Manager of the market data lines of a connection.
+
+    TWS limits the number of concurrent market data lines, to 100 or more
+    depending on the account. Lines are counted from the streaming
+    subscriptions and snapshots in flight of the connection, including
+    the ones not made with this manager, and the manager keeps its own
+    subscriptions within ``budget`` lines.
+
+    A large universe of contracts can be covered with :meth:`rotate`,
+    which keeps all free lines busy with snapshots, or with short-lived
+    streaming subscriptions, until every contract has had its turn.
+    Its throughput is then bound by the number of lines and by the
+    request throttle of the client. With :meth:`snapshots` the tickers
+    are yielded one by one as their snapshots end.
+
+    Args:
+        ib: The connection to use.
+        budget: Maximum number of lines in use.
+
+    Events:
+        * ``coveredEvent`` (coverage: :class:`.LineCoverage`):
+          Emits when a contract of a rotation is covered.
+
+    Example usage:
+
+    .. code-block:: python
+
+        lines = MktDataLines(ib, budget=90)
+        coverages = lines.rotate(contracts)
+        tickers = [c.ticker for c in coverages]
+    """
+
+    ib: IB
+    budget: int = 100
+
+    def __post_init__(self):
+        self.coveredEvent = Event('coveredEvent')
+        self._logger = logging.getLogger('ib_insync.mktdatalines')
+
+    def inUse(self) -> int:
+        """Number of market data lines in use by the connection."""
+        ticker2ReqId = self.ib.wrapper.ticker2ReqId
+        return len(ticker2ReqId['mktData']) + len(ticker2ReqId['snapshot'])
+
+    def available(self) -> int:
+        """Number of lines that can still be used within the budget."""
+        return max(0, self.budget - self.inUse())
+
+    def reqMktData(
+            self, contract: Contract, genericTickList: str = '',
+            mktDataOptions: List[TagValue] = []) -> Ticker:
+        """
+        Subscribe to streaming tick data, see :meth:`.IB.reqMktData`,
+        if a line is available. Raises ``RuntimeError`` if not.
+        """
+        if not self.available():
+            raise RuntimeError(
+                f'All {self.budget} market data lines are in use')
+        return self.ib.reqMktData(
+            contract, genericTickList, mktDataOptions=mktDataOptions)
+
+    def cancelMktData(self, contract: Contract):
+        """
+        Unsubscribe from streaming tick data and free its line,
+        see :meth:`.IB.cancelMktData`.
+        """
+        self.ib.cancelMktData(contract)
+
+    def rotate(
+            self, contracts: Iterable[Contract], duration: float = 0,
+            genericTickList: str = '', timeout: float = 12) \
+            -> List[LineCoverage]:
+        """
+        Cover the contracts by rotating them over the available lines.
+
+        This method is blocking.
+
+        Args:
+            contracts: Contracts to cover.
+            duration: Time (in seconds) to subscribe to each contract
+                for, or 0 to take a snapshot of each contract.
+            genericTickList: Generic ticks for streaming subscriptions;
+                Snapshots can't have generic ticks.
+            timeout: Time (in seconds) to wait for a snapshot.
+
+        Returns:
+            The coverage of each contract, in order of the contracts.
+        """
+        return util.run(self.rotateAsync(
+            contracts, duration, genericTickList, timeout))
+
+    async def rotateAsync(
+            self, contracts: Iterable[Contract], duration: float = 0,
+            genericTickList: str = '', timeout: float = 12) \
+            -> List[LineCoverage]:
+        coverages = [LineCoverage(contract) for contract in contracts]
+        async for _ in self._rotate(
+                coverages, duration, genericTickList, timeout, False):
+            pass
+        return coverages
+
+    async def snapshots(
+            self, contracts: Iterable[Contract], timeout: float = 12,
+            regulatorySnapshot: bool = False) -> AsyncIterator[Ticker]:
+        """
+        Take snapshots of the contracts over the available lines and
+        yield every ticker as soon as its snapshot has ended, so that
+        the first tickers of a large universe can be used right away.
+
+        Unlike :meth:`.IB.reqTickers`, no more snapshots are in flight
+        than there are lines available and one slow snapshot does not
+        hold up the others. The contracts are taken lazily from the
+        iterable, which can thus be a generator. A snapshot that does
+        not end within the timeout is cancelled and its ticker is
+        yielded with the data received so far. Stopping the iteration
+        early cancels the snapshots that are in flight.
+
+        Args:
+            contracts: Contracts to take snapshots of.
+            timeout: Time (in seconds) to wait for each snapshot.
+            regulatorySnapshot: Request NBBO snapshots (may incur a fee).
+
+        Example usage:
+
+        .. code-block:: python
+
+            async for ticker in lines.snapshots(contracts):
+                price(ticker)
+        """
+        coverages = (LineCoverage(contract) for contract in contracts)
+        async for coverage in self._rotate(
+                coverages, 0, '', timeout, regulatorySnapshot):
+            assert coverage.ticker
+            yield coverage.ticker
+
+    async def _rotate(
+            self, coverages: Iterable[LineCoverage], duration: float,
+            genericTickList: str, timeout: float,
+            regulatorySnapshot: bool) -> AsyncIterator[LineCoverage]:
+        # yield the coverages in order of completion
+        it = iter(coverages)
+        coverage = next(it, None)
+        active: set = set()
+        startTime = time.time()
+        try:
+            while coverage or active:
+                while coverage and self.available():
+                    coverage.waitTime = time.time() - startTime
+                    active.add(self._cover(
+                        coverage, duration, genericTickList, timeout,
+                        regulatorySnapshot))
+                    coverage = next(it, None)
+                if active:
+                    done, active = await asyncio.wait(
+                        active, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                else:
+                    # lines are held by others, wait for one to be freed
+                    await asyncio.sleep(0.1)
+        finally:
+            for task in active:
+                task.cancel()
+
+    def _cover(
+            self, coverage: LineCoverage, duration: float,
+            genericTickList: str, timeout: float,
+            regulatorySnapshot: bool) -> asyncio.Future:
+        # the line is taken right away, so that it counts as in use,
+        # and is freed by the returned task
+        ib = self.ib
+        contract = coverage.contract
+        t0 = time.time()
+
+        def onUpdate(ticker):
+            coverage.latency = time.time() - t0
+            ticker.updateEvent -= onUpdate
+
+        if duration:
+            ticker = ib.reqMktData(contract, genericTickList)
+            ticker.updateEvent += onUpdate
+            done = asyncio.ensure_future(asyncio.sleep(duration))
+        else:
+            reqId = ib.client.getReqId()
+            done = ib.wrapper.startReq(reqId, contract)
+            ticker = ib.wrapper.startTicker(reqId, contract, 'snapshot')
+            ticker.updateEvent += onUpdate
+            ib.client.reqMktData(
+                reqId, contract, '', True, regulatorySnapshot, [])
+
+        def cancelSnapshot():
+            ib.client.cancelMktData(reqId)
+            ib.wrapper.cancelReq(reqId)
+
+        async def free() -> LineCoverage:
+            try:
+                if duration:
+                    await done
+                else:
+                    try:
+                        await asyncio.wait_for(done, timeout)
+                    except asyncio.TimeoutError:
+                        coverage.timedOut = True
+                        cancelSnapshot()
+                        self._logger.warning(
+                            f'Snapshot timeout for {contract}')
+                    except RequestError as e:
+                        coverage.error = e
+            except asyncio.CancelledError:
+                if not duration:
+                    cancelSnapshot()
+                raise
+            finally:
+                if duration:
+                    ib.cancelMktData(contract)
+                else:
+                    ib.wrapper.endTicker(ticker, 'snapshot')
+                if math.isnan(coverage.latency):
+                    ticker.updateEvent -= onUpdate
+            coverage.ticker = ticker
+            coverage.lineTime = time.time() - t0
+            self.coveredEvent.emit(coverage)
+            return coverage
+
+        return asyncio.ensure_future(free())
@@ -0,0 +1,357 @@
+"""Local stand-in for TWS to run the API without a live connection."""
+
+import asyncio
+import itertools
+import logging
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from eventkit import Event
+
+import ib_insync.util as util
+from ib_insync.client import Client
+from ib_insync.util import getLoop
+
+RequestHandler = Callable[['MockSession', List[str]], None]
+""" Handler of a request: handler(session, fields) """
+
+_chunkHeader = struct.Struct('<dI')
+""" Header of a captured chunk: time (in seconds), data length """
+
+
+@dataclass
+class SessionCapture:
+    """
+    Raw socket data that the client received from TWS, as a list of
+    ``(time, data)`` chunks, with time in seconds since the first chunk.
+
+    A capture is recorded by attaching it to a client before connecting,
+    and can be saved, loaded and replayed by :class:`.MockTWS`.
+    Only use a capture file from a trusted source.
+
+    Args:
+        chunks: The captured chunks.
+
+    Example usage:
+
+    .. code-block:: python
+
+        capture = SessionCapture()
+        capture.attach(ib.client)
+        ib.connect()
+        ...
+        ib.disconnect()
+        capture.save('session.cap')
+    """
+
+    chunks: List[Tuple[float, bytes]] = field(default_factory=list)
+
+    def attach(self, client: Client):
+        """Record the data that the client receives from now on."""
+        client.conn.hasData += self._onData
+
+    def detach(self, client: Client):
+        """Stop recording the client."""
+        client.conn.hasData -= self._onData
+
+    def _onData(self, data: bytes):
+        now = time.time()
+        if not self.chunks:
+            self._startTime = now
+        self.chunks.append((now - self._startTime, bytes(data)))
+
+    def save(self, path: str):
+        """Save the capture to the given file."""
+        with open(path, 'wb') as f:
+            for t, data in self.chunks:
+                f.write(_chunkHeader.pack(t, len(data)))
+                f.write(data)
+
+    @classmethod
+    def load(cls, path: str) -> 'SessionCapture':
+        """Load a capture from the given file."""
+        with open(path, 'rb') as f:
+            buf = f.read()
+        chunks = []
+        pos = 0
+        while pos < len(buf):
+            t, size = _chunkHeader.unpack_from(buf, pos)
+            pos += _chunkHeader.size
+            chunks.append((t, buf[pos:pos + size]))
+            pos += size
+        return cls(chunks)
+
+    def messages(self) -> Iterator[List[str]]:
+        """
+        Iterate over the captured messages as lists of fields,
+        starting with the handshake response of TWS.
+        """
+        buf = b''.join(data for _, data in self.chunks)
+        pos = 0
+        while pos + 4 <= len(buf):
+            end = pos + 4 + struct.unpack_from('>I', buf, pos)[0]
+            msg = buf[pos + 4:end].decode(errors='backslashreplace')
+            yield msg.split('\0')[:-1]
+            pos = end
+
+
+def encode(*fields) -> bytes:
+    """Encode the fields as one length-prefixed message."""
+    msg = ''.join(f'{field}\0' for field in fields).encode()
+    return struct.pack('>I', len(msg)) + msg
+
+
+class MockSession(asyncio.Protocol):
+    """
+    Connection of one client to :class:`.MockTWS`.
+
+    Attributes:
+        clientId: Client ID as given when the API was started.
+        serverVersion: Server version agreed upon in the handshake.
+        numRequests: Number of requests received.
+    """
+
+    def __init__(self, server: 'MockTWS'):
+        self.server = server
+        self.clientId = -1
+        self.serverVersion = 0
+        self.numRequests = 0
+        self.replayTask: Optional[asyncio.Task] = None
+        self._transport: Optional[asyncio.Transport] = None
+        self._data = bytearray()
+        self._permIds: Dict[int, int] = {}
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self.server.sessions.append(self)
+
+    def connection_lost(self, exc):
+        self._transport = None
+        if self.replayTask:
+            self.replayTask.cancel()
+        self.server.sessions.remove(self)
+
+    def isConnected(self) -> bool:
+        return self._transport is not None
+
+    def send(self, *fields):
+        """Send the fields as one message to the client."""
+        self.write(encode(*fields))
+
+    def write(self, data: bytes):
+        """Write raw (already encoded) data to the client."""
+        if self._transport:
+            self._transport.write(data)
+
+    def close(self):
+        """Close the connection to the client."""
+        if self._transport:
+            self._transport.close()
+
+    def data_received(self, data):
+        self._data += data
+        pos = 0
+        if not self.serverVersion:
+            # client sends 'API\0' followed by its range of versions
+            if len(self._data) < 8:
+                return
+            end = 8 + struct.unpack_from('>I', self._data, 4)[0]
+            if len(self._data) < end:
+                return
+            self._handshake(self._data[8:end].decode())
+            if not self.serverVersion:
+                return
+            pos = end
+        while len(self._data) - pos >= 4:
+            end = pos + 4 + struct.unpack_from('>I', self._data, pos)[0]
+            if len(self._data) < end:
+                break
+            fields = self._data[pos + 4:end].decode().split('\0')[:-1]
+            pos = end
+            self.numRequests += 1
+            self.server.requestEvent.emit(self, fields)
+            handler = self.server.handlers.get(int(fields[0]))
+            if handler:
+                handler(self, fields)
+        del self._data[:pos]
+
+    def _handshake(self, versions: str):
+        minVersion, maxVersion = (
+            int(v) for v in versions[1:].split(' ')[0].split('..'))
+        capture = self.server.capture
+        if capture:
+            version = int(next(capture.messages())[0])
+        else:
+            version = min(self.server.serverVersion, maxVersion)
+        if not minVersion <= version <= maxVersion:
+            self.server._logger.error(
+                f'Client versions {versions} do not include '
+                f'server version {version}')
+            self.close()
+            return
+        self.serverVersion = version
+        if capture:
+            # the capture starts with its own handshake response
+            self.replayTask = asyncio.ensure_future(self._replay(capture))
+        else:
+            connTime = time.strftime('%Y%m%d %H:%M:%S UTC', time.gmtime())
+            self.send(self.serverVersion, connTime)
+
+    async def _replay(self, capture: SessionCapture):
+        speed = self.server.speed
+        startTime = time.time()
+        for t, data in capture.chunks:
+            if speed:
+                delay = startTime + t / speed - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.write(data)
+            if not speed:
+                # give the client a chance to read along
+                await asyncio.sleep(0)
+
+    def permId(self, orderId: int) -> int:
+        """Get the permanent ID that is given to the order ID."""
+        permId = self._permIds.get(orderId)
+        if not permId:
+            permId = self._permIds[orderId] = next(self.server._permIds)
+        return permId
+
+
+@dataclass
+class MockTWS:
+    """
+    Local asyncio server that speaks the socket protocol of TWS, to
+    run and benchmark the client, decoder and wrapper without a live
+    TWS or gateway.
+
+    It does the handshake of :meth:`.Client.connectAsync` and answers
+    requests with scripted handlers, by the message ID of the request.
+    There are default handlers that give empty responses to the requests
+    that :meth:`.IB.connect` makes, that answer the current time and
+    acknowledge placed and cancelled orders as 'Submitted' and
+    'Cancelled'. Handlers can be added or replaced in :attr:`handlers`,
+    and can send any messages with :meth:`.MockSession.send`.
+
+    If a capture is given, its data is replayed to every client that
+    connects, starting with the handshake response that it contains,
+    at ``speed`` times the original pace or as fast as possible if
+    ``speed`` is 0. Requests are still answered by the handlers,
+    except for starting the API, which the capture answers.
+
+    Args:
+        host: Host name or IP address to listen on.
+        port: Port number to listen on, or 0 to pick a free port.
+        serverVersion: Highest server version to agree upon.
+        accounts: Managed accounts.
+        nextValidId: First valid order ID.
+        capture: Optional capture to replay.
+        speed: Replay speed relative to the original capture.
+
+    Events:
+        * ``requestEvent`` (session: :class:`.MockSession`,
+          fields: list): Emits every received request, before it is
+          handled.
+
+    Example usage:
+
+    .. code-block:: python
+
+        mock = MockTWS()
+        mock.start()
+        ib = IB()
+        ib.connect(port=mock.port)
+    """
+
+    host: str = '127.0.0.1'
+    port: int = 0
+    serverVersion: int = Client.MaxClientVersion
+    accounts: List[str] = field(default_factory=lambda: ['DU123456'])
+    nextValidId: int = 1
+    capture: Optional[SessionCapture] = None
+    speed: float = 1
+    sessions: List[MockSession] = field(init=False, default_factory=list)
+    handlers: Dict[int, RequestHandler] = field(
+        init=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.requestEvent = Event('requestEvent')
+        self.handlers.update({
+            71: self._startApi,
+            8: self._reqIds,
+            49: lambda s, f: s.send(49, 1, int(time.time())),
+            17: lambda s, f: s.send(15, 1, ','.join(self.accounts)),
+            61: lambda s, f: s.send(62, 1),
+            5: lambda s, f: s.send(53, 1),
+            16: lambda s, f: s.send(53, 1),
+            99: lambda s, f: s.send(102),
+            6: self._reqAccountUpdates,
+            76: lambda s, f: s.send(74, 1, f[2]),
+            7: lambda s, f: s.send(55, 1, f[2]),
+            3: self._placeOrder,
+            4: self._cancelOrder})
+        self._logger = logging.getLogger('ib_insync.mocktws')
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._permIds = itertools.count(1000)
+
+    def start(self) -> 'MockTWS':
+        """
+        Start listening.
+
+        This method is blocking.
+        """
+        return util.run(self.startAsync())
+
+    async def startAsync(self) -> 'MockTWS':
+        loop = getLoop()
+        server = await loop.create_server(
+            lambda: MockSession(self), self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._server = server
+        self._logger.info(f'Listening on {self.host}:{self.port}')
+        return self
+
+    def stop(self):
+        """Close all sessions and stop listening."""
+        for session in list(self.sessions):
+            session.close()
+        if self._server:
+            self._server.close()
+            self._server = None
+
+    def broadcast(self, *fields):
+        """Send the fields as one message to all connected clients."""
+        data = encode(*fields)
+        for session in self.sessions:
+            session.write(data)
+
+    def _startApi(self, session: MockSession, fields: List[str]):
+        session.clientId = int(fields[2])
+        if not self.capture:
+            session.send(9, 1, self.nextValidId)
+            session.send(15, 1, ','.join(self.accounts))
+
+    def _reqIds(self, session: MockSession, fields: List[str]):
+        session.send(9, 1, self.nextValidId)
+
+    def _reqAccountUpdates(self, session: MockSession, fields: List[str]):
+        _, _, subscribe, account = fields
+        if subscribe == '1':
+            session.send(54, 1, account)
+
+    def _placeOrder(self, session: MockSession, fields: List[str]):
+        # fields are msgId, orderId, 12 contract fields, secIdType, secId,
+        # action, totalQuantity
+        orderId = int(fields[1])
+        self.nextValidId = max(self.nextValidId, orderId + 1)
+        session.send(
+            3, orderId, 'Submitted', 0, fields[17], 0,
+            session.permId(orderId), 0, 0, session.clientId, '', 0)
+
+    def _cancelOrder(self, session: MockSession, fields: List[str]):
+        orderId = int(fields[2])
+        session.send(
+            3, orderId, 'Cancelled', 0, 0, 0,
+            session.permId(orderId), 0, 0, session.clientId, '', 0)
@@ -2,12 +2,12 @@
 
 from dataclasses import dataclass, field
 from datetime import date as date_, datetime
-from typing import List, NamedTuple, Optional, Union
+from typing import ClassVar, Dict, List, NamedTuple, Optional, Union
 
 from eventkit import Event
 
 from .contract import Contract, ScanData, TagValue
-from .util import EPOCH, UNSET_DOUBLE, UNSET_INTEGER
+from .util import EPOCH, UNSET_DOUBLE, UNSET_INTEGER, dataclassSlotted
 
 nan = float('nan')
 
@@ -70,6 +70,10 @@ class Execution:
     pendingPriceRevision: bool = False
 
 
+CompactExecution = dataclassSlotted(Execution, 'CompactExecution')
+""" Variant of :class:`.Execution` that uses ``__slots__``. """
+
+
 @dataclass
 class CommissionReport:
     execId: str = ''
@@ -103,6 +107,10 @@ class BarData:
     barCount: int = 0
 
 
+CompactBarData = dataclassSlotted(BarData, 'CompactBarData')
+""" Variant of :class:`.BarData` that uses ``__slots__``. """
+
+
 @dataclass
 class RealTimeBar:
     time: datetime = EPOCH
@@ -116,6 +124,10 @@ class RealTimeBar:
     count: int = 0
 
 
+CompactRealTimeBar = dataclassSlotted(RealTimeBar, 'CompactRealTimeBar')
+""" Variant of :class:`.RealTimeBar` that uses ``__slots__``. """
+
+
 @dataclass
 class TickAttrib:
     canAutoExecute: bool = False
@@ -394,6 +406,17 @@ class ConnectionStats(NamedTuple):
     numBytesSent: int
     numMsgRecv: int
     numMsgSent: int
+    throttleDelays: Dict[float, int] = {}
+    """ Upper bound of delay (in seconds) -> number of sent messages """
+
+
+class ThrottleStats(NamedTuple):
+    priorityClass: int
+    queued: int
+    sent: int
+    delayed: int
+    totalDelay: float
+    maxDelay: float
 
 
 class BarDataList(List[BarData]):
@@ -428,6 +451,92 @@ class BarDataList(List[BarData]):
         return id(self)
 
 
+class BarDataColumns:
+    """
+    Columnar alternative to :class:`.BarDataList` that stores all request
+    parameters and keeps the bars in NumPy arrays, without creating an
+    object per bar. The fields of every received message are parsed in
+    one pass into an array of floats; :meth:`to_numpy` and
+    :meth:`to_pandas` concatenate these into typed columns.
+    Requires NumPy.
+
+    Dates are given as ``datetime64``, in UTC for intraday bars.
+    """
+
+    Names: ClassVar = (
+        'date', 'open', 'high', 'low', 'close', 'volume', 'average',
+        'barCount')
+
+    reqId: int
+    contract: Contract
+    endDateTime: Union[datetime, date_, str, None]
+    durationStr: str
+    barSizeSetting: str
+    whatToShow: str
+    useRTH: bool
+    chartOptions: List[TagValue]
+
+    def __init__(self):
+        self._chunks: list = []
+        self._daily = False
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def __repr__(self):
+        return f'BarDataColumns(len={len(self)})'
+
+    def addFields(self, fields: List[str]):
+        """Add the flat list of fields of whole bars."""
+        import numpy as np
+        if not fields:
+            return
+        if not self._chunks:
+            # yyyyMMdd for daily bars and longer,
+            # epoch seconds for intraday bars
+            self._daily = len(fields[0]) == 8
+        n = len(self.Names)
+        # the dates, volumes and bar counts are exact as float64
+        chunk = np.fromiter(map(float, fields), 'f8', len(fields))
+        self._chunks.append(chunk.reshape(-1, n))
+
+    def clear(self):
+        self._chunks.clear()
+
+    def to_numpy(self):
+        """
+        Get the bars as a NumPy structured array with a column for
+        every name in ``Names``.
+        """
+        import numpy as np
+        arr = np.empty(len(self), dtype=[
+            ('date', 'datetime64[s]'), ('open', 'f8'), ('high', 'f8'),
+            ('low', 'f8'), ('close', 'f8'), ('volume', 'f8'),
+            ('average', 'f8'), ('barCount', 'i8')])
+        if self._chunks:
+            values = np.concatenate(self._chunks) \
+                if len(self._chunks) > 1 else self._chunks[0]
+            dates = values[:, 0].astype(np.int64)
+            if self._daily:
+                arr['date'] = (
+                    (dates // 10000 - 1970).astype('datetime64[Y]')
+                    + (dates // 100 % 100 - 1).astype('timedelta64[M]')
+                    + (dates % 100 - 1).astype('timedelta64[D]'))
+            else:
+                arr['date'] = dates.astype('datetime64[s]')
+            for i, name in enumerate(self.Names[1:], 1):
+                arr[name] = values[:, i]
+        return arr
+
+    def to_pandas(self):
+        """Get the bars as a pandas DataFrame."""
+        import pandas as pd
+        df = pd.DataFrame(self.to_numpy())
+        if self._chunks and not self._daily:
+            df['date'] = df['date'].dt.tz_localize('UTC')
+        return df
+
+
 class RealTimeBarList(List[RealTimeBar]):
     """
     List of :class:`.RealTimeBar` that also stores all request parameters.
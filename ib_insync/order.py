@@ -7,7 +7,8 @@ from eventkit import Event
 
 from .contract import Contract, TagValue
 from .objects import Fill, SoftDollarTier, TradeLogEntry
-from .util import UNSET_DOUBLE, UNSET_INTEGER, dataclassNonDefaults
+from .util import (
+    UNSET_DOUBLE, UNSET_INTEGER, dataclassNonDefaults, dataclassSlotted)
 
 
 @dataclass
@@ -244,6 +245,10 @@ class OrderStatus:
         ['PendingSubmit', 'ApiPending', 'PreSubmitted', 'Submitted'])
 
 
+CompactOrderStatus = dataclassSlotted(OrderStatus, 'CompactOrderStatus')
+""" Variant of :class:`.OrderStatus` that uses ``__slots__``. """
+
+
 @dataclass
 class OrderState:
     status: str = ''
@@ -284,6 +289,9 @@ class Trade:
         * ``filledEvent`` (trade: :class:`.Trade`)
         * ``cancelEvent`` (trade: :class:`.Trade`)
         * ``cancelledEvent`` (trade: :class:`.Trade`)
+        * ``ackEvent`` (trade: :class:`.Trade`):
+          TWS sent an order status, open order or order error
+          for the order.
     """
 
     contract: Contract = field(default_factory=Contract)
@@ -296,7 +304,7 @@ class Trade:
     events: ClassVar = (
         'statusEvent', 'modifyEvent', 'fillEvent',
         'commissionReportEvent', 'filledEvent',
-        'cancelEvent', 'cancelledEvent')
+        'cancelEvent', 'cancelledEvent', 'ackEvent')
 
     def __post_init__(self):
         self.statusEvent = Event('statusEvent')
@@ -306,6 +314,7 @@ class Trade:
         self.filledEvent = Event('filledEvent')
         self.cancelEvent = Event('cancelEvent')
         self.cancelledEvent = Event('cancelledEvent')
+        self.ackEvent = Event('ackEvent')
 
     def isActive(self) -> bool:
         """True if eligible for execution, false otherwise."""
@@ -0,0 +1,226 @@
+"""Pool of connections for spreading requests."""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import ib_insync.util as util
+from ib_insync.contract import Contract, ContractDetails, TagValue
+from ib_insync.ib import IB
+from ib_insync.objects import BarDataList
+from ib_insync.order import Order, Trade
+from ib_insync.ticker import Ticker
+
+
+@dataclass
+class IBPool:
+    """
+    Pool of connections to the same TWS or gateway, with consecutive
+    client IDs, to spread data requests over.
+
+    Every connection has its own request throttle and is paced
+    separately by TWS, so fanning out many requests, such as
+    qualifying a large universe of contracts, over several connections
+    finishes correspondingly faster. Each request goes to the
+    connection with the least requests in flight or waiting in its
+    throttle. Requests for multiple contracts are split into one
+    request per contract, and the results are merged in the order of
+    the contracts. Data connections that are down are passed over,
+    as long as one of them is still up.
+
+    The first connection is the order connection: Orders are only
+    placed with it, and with more than one connection in the pool it
+    is not used for data requests, so that orders never wait behind
+    them. The other connections are read-only.
+
+    Args:
+        size (int): Number of connections.
+        host (str): Host name or IP address.
+        port (int): Port number.
+        clientId (int): Client ID of the order connection; The other
+            connections use the IDs that follow it.
+        timeout (float): Timeout of establishing a connection.
+        readonly (bool): Connect the order connection in read-only mode.
+        account (str): Main account to receive updates for on the
+            order connection.
+
+    Example usage:
+
+    .. code-block:: python
+
+        pool = IBPool(size=4)
+        pool.connect()
+        contracts = pool.qualifyContracts(*contracts)
+        trade = pool.placeOrder(contracts[0], MarketOrder('BUY', 100))
+    """
+
+    size: int = 4
+    host: str = '127.0.0.1'
+    port: int = 7497
+    clientId: int = 1
+    timeout: float = 4
+    readonly: bool = False
+    account: str = ''
+    ibs: List[IB] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        if self.size < 1:
+            raise ValueError('Pool size must be at least 1')
+        self._logger = logging.getLogger('ib_insync.pool')
+        self._inFlight: List[int] = []
+
+    @property
+    def ib(self) -> IB:
+        """The order connection."""
+        return self.ibs[0]
+
+    def connect(self) -> 'IBPool':
+        """
+        Connect all connections of the pool.
+
+        This method is blocking.
+        """
+        return util.run(self.connectAsync())
+
+    async def connectAsync(self) -> 'IBPool':
+        self.disconnect()
+        self.ibs = [IB() for _ in range(self.size)]
+        self._inFlight = [0] * self.size
+        try:
+            await asyncio.gather(*(
+                ib.connectAsync(
+                    self.host, self.port, self.clientId + i, self.timeout,
+                    readonly=self.readonly if i == 0 else True,
+                    account=self.account if i == 0 else '')
+                for i, ib in enumerate(self.ibs)))
+        except BaseException:
+            self.disconnect()
+            raise
+        self._logger.info(f'Connected pool of {self.size} connections')
+        return self
+
+    def disconnect(self):
+        """Disconnect all connections of the pool."""
+        for ib in self.ibs:
+            ib.disconnect()
+
+    def isConnected(self) -> bool:
+        """Are all connections of the pool up and running?"""
+        return bool(self.ibs) and all(ib.isConnected() for ib in self.ibs)
+
+    def load(self, index: int) -> int:
+        """
+        The number of requests that are in flight or waiting in the
+        throttle of the connection with the given index.
+        """
+        queued = sum(
+            stats.queued for stats in self.ibs[index].client.throttleStats())
+        return self._inFlight[index] + queued
+
+    def placeOrder(self, contract: Contract, order: Order) -> Trade:
+        """
+        Place an order with the order connection,
+        see :meth:`.IB.placeOrder`.
+        """
+        return self.ib.placeOrder(contract, order)
+
+    def cancelOrder(self, order: Order) -> Optional[Trade]:
+        """
+        Cancel an order with the order connection,
+        see :meth:`.IB.cancelOrder`.
+        """
+        return self.ib.cancelOrder(order)
+
+    def qualifyContracts(self, *contracts: Contract) -> List[Contract]:
+        """
+        Fully qualify the given contracts in-place, see
+        :meth:`.IB.qualifyContracts`.
+
+        This method is blocking.
+        """
+        return util.run(self.qualifyContractsAsync(*contracts))
+
+    def reqContractDetails(self, contract: Contract) \
+            -> List[ContractDetails]:
+        """
+        Get the contract details, see :meth:`.IB.reqContractDetails`.
+
+        This method is blocking.
+        """
+        return util.run(self.reqContractDetailsAsync(contract))
+
+    def reqTickers(
+            self, *contracts: Contract,
+            regulatorySnapshot: bool = False) -> List[Ticker]:
+        """
+        Get snapshot tickers of the given contracts,
+        see :meth:`.IB.reqTickers`.
+
+        This method is blocking.
+        """
+        return util.run(self.reqTickersAsync(
+            *contracts, regulatorySnapshot=regulatorySnapshot))
+
+    def reqHistoricalData(self, *args, **kwargs) -> BarDataList:
+        """
+        Get historical bars, with the same arguments as
+        :meth:`.IB.reqHistoricalData`.
+
+        This method is blocking.
+        """
+        return util.run(self.reqHistoricalDataAsync(*args, **kwargs))
+
+    def reqFundamentalData(
+            self, contract: Contract, reportType: str,
+            fundamentalDataOptions: List[TagValue] = []) -> str:
+        """
+        Get fundamental data, see :meth:`.IB.reqFundamentalData`.
+
+        This method is blocking.
+        """
+        return util.run(self.reqFundamentalDataAsync(
+            contract, reportType, fundamentalDataOptions))
+
+    async def qualifyContractsAsync(self, *contracts: Contract) \
+            -> List[Contract]:
+        results = await asyncio.gather(*(
+            self._route('qualifyContractsAsync', c) for c in contracts))
+        return [c for result in results for c in result]
+
+    async def reqContractDetailsAsync(self, contract: Contract) \
+            -> List[ContractDetails]:
+        return await self._route('reqContractDetailsAsync', contract)
+
+    async def reqTickersAsync(
+            self, *contracts: Contract,
+            regulatorySnapshot: bool = False) -> List[Ticker]:
+        results = await asyncio.gather(*(
+            self._route(
+                'reqTickersAsync', c, regulatorySnapshot=regulatorySnapshot)
+            for c in contracts))
+        return [ticker for result in results for ticker in result]
+
+    async def reqHistoricalDataAsync(self, *args, **kwargs) -> BarDataList:
+        return await self._route('reqHistoricalDataAsync', *args, **kwargs)
+
+    async def reqFundamentalDataAsync(
+            self, contract: Contract, reportType: str,
+            fundamentalDataOptions: List[TagValue] = []) -> str:
+        return await self._route(
+            'reqFundamentalDataAsync', contract, reportType,
+            fundamentalDataOptions)
+
+    async def _route(self, method: str, *args, **kwargs):
+        # run the request on the least loaded data connection that is up
+        indexes = [
+            i for i in range(1 if self.size > 1 else 0, len(self.ibs))
+            if self.ibs[i].isConnected()]
+        if not indexes:
+            raise ConnectionError('Not connected')
+        index = min(indexes, key=self.load)
+        self._inFlight[index] += 1
+        try:
+            return await getattr(self.ibs[index], method)(*args, **kwargs)
+        finally:
+            self._inFlight[index] -= 1
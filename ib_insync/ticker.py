@@ -1,8 +1,11 @@
 """Access to realtime market information."""
 
+import math
+from bisect import bisect_left, insort
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import ClassVar, List, Optional, Union
+from typing import ClassVar, Deque, Dict, List, Optional, Tuple, Union
 
 from eventkit import Event, Op
 
@@ -11,7 +14,7 @@ from ib_insync.objects import (
     DOMLevel, Dividends, FundamentalRatios, MktDepthData,
     OptionComputation, TickByTickAllLast, TickByTickBidAsk, TickByTickMidPoint,
     TickData)
-from ib_insync.util import dataclassRepr, isNan
+from ib_insync.util import dataclassRepr, dataclassSlotted, isNan
 
 nan = float('nan')
 
@@ -30,6 +33,17 @@ class Ticker:
 
     Streaming tick-by-tick ticks are stored in ``tickByTicks``.
 
+    The level-1 ticks are only kept until the next update. To retain
+    a history of them, attach a :class:`.TickBuffer` to ``tickBuffer``
+    (or set :attr:`.IB.TickBufferSize` to do this for every new ticker).
+
+    With :attr:`.IB.DepthBookArrays` set, the order book of a market
+    depth subscription is kept in a :class:`.DepthBook` in ``domBook``
+    instead, and ``domBids``, ``domAsks`` and ``domTicks`` stay empty.
+    With :attr:`.IB.AggregateSmartDepth` set, a SMART depth subscription
+    also keeps a book consolidated by price across market makers in
+    ``domAggregate``, see :class:`.AggregatedBook`.
+
     For options the :class:`.OptionComputation` values for the bid, ask, resp.
     last price are stored in the ``bidGreeks``, ``askGreeks`` resp.
     ``lastGreeks`` attributes. There is also ``modelGreeks`` that conveys
@@ -114,6 +128,9 @@ class Ticker:
     regulatoryImbalance: float = nan
     bboExchange: str = ''
     snapshotPermissions: int = 0
+    tickBuffer: Optional['TickBuffer'] = None
+    domBook: Optional['DepthBook'] = None
+    domAggregate: Optional['AggregatedBook'] = None
 
     def __post_init__(self):
         self.updateEvent = TickerUpdateEvent('updateEvent')
@@ -157,6 +174,485 @@ class Ticker:
         return price
 
 
+CompactTicker = dataclassSlotted(Ticker, 'CompactTicker', 'updateEvent')
+"""
+Variant of :class:`.Ticker` that uses ``__slots__``, for when holding
+many tickers. Set :attr:`.IB.CompactTickers` to use it for new tickers.
+"""
+
+
+class TickBuffer:
+    """
+    Fixed-capacity ring buffer that retains the last ``capacity``
+    level-1 ticks of a ticker in columnar NumPy arrays, without
+    creating an object per tick. Requires NumPy.
+
+    The columns are available as the ``time`` (POSIX timestamp in seconds),
+    ``tickType``, ``price`` and ``size`` arrays, ordered from oldest to
+    newest tick.
+
+    The trades are taken from one source only, given by
+    ``tradeTickTypes``, as TWS sends the same trade as both a last
+    tick and an RT volume tick when RT volume is subscribed to.
+    :meth:`.IB.reqMktData` sets the source to match the generic ticks
+    that are requested.
+
+    Args:
+        capacity: Maximum number of ticks to retain.
+    """
+
+    __slots__ = (
+        'capacity', 'count', 'tradeTickTypes',
+        '_time', '_tickType', '_price', '_size')
+
+    LastTickTypes: ClassVar = (4, 68)
+    """
+    Tick types of the (delayed) last price. The last size ticks
+    (5 and 71) repeat the size of the preceding last price tick
+    and are left out, so that every trade is counted once.
+    """
+
+    RTVolumeTickTypes: ClassVar = {'233': (48,), '375': (77,)}
+    """
+    Trade tick types for the generic ticks of RT volume (233) and
+    RT trade volume (375).
+    """
+
+    capacity: int
+    count: int
+    tradeTickTypes: tuple
+
+    def __init__(self, capacity: int = 10000):
+        import numpy as np
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.count = 0
+        self.tradeTickTypes = self.LastTickTypes
+        self._time = np.zeros(capacity, np.float64)
+        self._tickType = np.zeros(capacity, np.int16)
+        self._price = np.zeros(capacity, np.float64)
+        self._size = np.zeros(capacity, np.float64)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __repr__(self):
+        return f'TickBuffer(capacity={self.capacity}, count={self.count})'
+
+    def append(
+            self, time: datetime, tickType: int, price: float, size: float):
+        """Add a tick, overwriting the oldest tick when full."""
+        i = self.count % self.capacity
+        self._time[i] = time.timestamp()
+        self._tickType[i] = tickType
+        self._price[i] = price
+        self._size[i] = size
+        self.count += 1
+
+    def clear(self):
+        """Remove all ticks."""
+        self.count = 0
+
+    def _ordered(self, column):
+        import numpy as np
+        if self.count <= self.capacity:
+            return column[:self.count].copy()
+        i = self.count % self.capacity
+        return np.concatenate((column[i:], column[:i]))
+
+    @property
+    def time(self):
+        return self._ordered(self._time)
+
+    @property
+    def tickType(self):
+        return self._ordered(self._tickType)
+
+    @property
+    def price(self):
+        return self._ordered(self._price)
+
+    @property
+    def size(self):
+        return self._ordered(self._size)
+
+    def trades(self, n: int = 0, window: float = 0):
+        """
+        Get the trade ticks as a tuple of ``(time, price, size)`` arrays.
+
+        Args:
+            n: If non-zero, return only the last ``n`` trades.
+            window: If non-zero, return only the trades within this many
+                seconds of the most recent tick.
+        """
+        import numpy as np
+        time = self.time
+        price = self.price
+        size = self.size
+        mask = np.isin(self.tickType, self.tradeTickTypes) & (price > 0)
+        if window and len(time):
+            mask &= time >= time[-1] - window
+        time, price, size = time[mask], price[mask], size[mask]
+        if n:
+            time, price, size = time[-n:], price[-n:], size[-n:]
+        return time, price, size
+
+    def vwap(self, n: int = 0, window: float = 0) -> float:
+        """
+        Volume-weighted average price of the trade ticks, or NaN if
+        there is no traded volume.
+
+        Args:
+            n: If non-zero, use only the last ``n`` trades.
+            window: If non-zero, use only the trades within this many
+                seconds of the most recent tick.
+        """
+        _, price, size = self.trades(n, window)
+        volume = size.sum()
+        return float((price * size).sum() / volume) if volume > 0 else nan
+
+
+class DepthBook:
+    """
+    Order book (DOM) of a ticker in preallocated NumPy arrays that are
+    updated in place, without creating objects per update, and that
+    can be queried in vectorized form. Requires NumPy.
+
+    The levels of each side are ordered from best to worst price, with
+    columns ``price``, ``size`` and ``marketMaker``. Sides are indexed
+    as in the depth updates of TWS, 0 for the asks and 1 for the bids.
+    The arrays grow when more levels arrive than there is room for.
+
+    Args:
+        capacity: Initial number of levels per side.
+    """
+
+    __slots__ = ('numLevels', '_price', '_size', '_marketMaker')
+
+    numLevels: List[int]
+
+    def __init__(self, capacity: int = 10):
+        import numpy as np
+        capacity = max(capacity, 1)
+        self.numLevels = [0, 0]
+        # per side, indexed by side
+        self._price = [np.zeros(capacity, np.float64) for _ in range(2)]
+        self._size = [np.zeros(capacity, np.float64) for _ in range(2)]
+        self._marketMaker = [np.full(capacity, '', object) for _ in range(2)]
+
+    def __repr__(self):
+        return f'DepthBook(bids={self.numLevels[1]}, asks={self.numLevels[0]})'
+
+    def update(
+            self, position: int, marketMaker: str, operation: int,
+            side: int, price: float, size: float):
+        """
+        Apply a depth update of TWS.
+
+        Args:
+            position: Row of the level.
+            marketMaker: Market maker or exchange of the level.
+            operation: 0 = insert, 1 = update, 2 = delete.
+            side: 0 = ask, 1 = bid.
+            price: Price of the level.
+            size: Size of the level.
+        """
+        n = self.numLevels[side]
+        if operation == 1 and position < n:
+            self._price[side][position] = price
+            self._size[side][position] = size
+            self._marketMaker[side][position] = marketMaker
+        elif operation == 2:
+            if position < n:
+                for column in (
+                        self._price[side], self._size[side],
+                        self._marketMaker[side]):
+                    column[position:n - 1] = column[position + 1:n]
+                self.numLevels[side] = n - 1
+        else:
+            # insert, or an update of a level that is not there yet
+            if n == len(self._price[side]):
+                self._grow(side)
+            position = min(position, n)
+            prices = self._price[side]
+            sizes = self._size[side]
+            makers = self._marketMaker[side]
+            if position < n:
+                for column in (prices, sizes, makers):
+                    column[position + 1:n + 1] = column[position:n]
+            prices[position] = price
+            sizes[position] = size
+            makers[position] = marketMaker
+            self.numLevels[side] = n + 1
+
+    def _grow(self, side: int):
+        import numpy as np
+        capacity = len(self._price[side])
+        self._price[side] = np.concatenate(
+            (self._price[side], np.zeros(capacity, np.float64)))
+        self._size[side] = np.concatenate(
+            (self._size[side], np.zeros(capacity, np.float64)))
+        self._marketMaker[side] = np.concatenate(
+            (self._marketMaker[side], np.full(capacity, '', object)))
+
+    def clear(self):
+        """Remove all levels."""
+        self.numLevels = [0, 0]
+
+    def levels(self, side: int, n: int = 0):
+        """
+        Get the levels of a side as a tuple of ``(price, size,
+        marketMaker)`` arrays, best price first.
+
+        Args:
+            side: 0 = ask, 1 = bid.
+            n: If non-zero, return only the best ``n`` levels.
+        """
+        num = self.numLevels[side]
+        if n:
+            num = min(n, num)
+        return (
+            self._price[side][:num].copy(), self._size[side][:num].copy(),
+            self._marketMaker[side][:num].copy())
+
+    def bids(self, n: int = 0):
+        """Get the bid levels, see :meth:`levels`."""
+        return self.levels(1, n)
+
+    def asks(self, n: int = 0):
+        """Get the ask levels, see :meth:`levels`."""
+        return self.levels(0, n)
+
+    def domLevels(self, side: int) -> List[DOMLevel]:
+        """Get the levels of a side as a list of :class:`.DOMLevel`."""
+        num = self.numLevels[side]
+        return [
+            DOMLevel(p, s, m) for p, s, m in zip(
+                self._price[side][:num].tolist(),
+                self._size[side][:num].tolist(),
+                self._marketMaker[side][:num].tolist())]
+
+    def depth(self, side: int, n: int = 0) -> float:
+        """
+        Total size of a side.
+
+        Args:
+            side: 0 = ask, 1 = bid.
+            n: If non-zero, use only the best ``n`` levels.
+        """
+        num = self.numLevels[side]
+        if n:
+            num = min(n, num)
+        return float(self._size[side][:num].sum())
+
+    def sizeTo(self, side: int, price: float) -> float:
+        """
+        Cumulative size of a side at prices that are as good as or
+        better than the given price, which is the size that can be
+        traded against that side up to the price.
+
+        Args:
+            side: 0 = ask, 1 = bid.
+            price: Limit price.
+        """
+        num = self.numLevels[side]
+        prices = self._price[side][:num]
+        mask = prices <= price if side == 0 else prices >= price
+        return float(self._size[side][:num][mask].sum())
+
+    def weightedMid(self, n: int = 0) -> float:
+        """
+        Depth-weighted midpoint: The size-weighted average prices of
+        the bids and of the asks, each weighted by the depth of the
+        other side, so that the midpoint leans towards the thinner
+        side. NaN if a side is empty.
+
+        Args:
+            n: If non-zero, use only the best ``n`` levels of each side.
+        """
+        numAsks, numBids = self.numLevels
+        if n:
+            numAsks, numBids = min(n, numAsks), min(n, numBids)
+        bidSize = self._size[1][:numBids]
+        askSize = self._size[0][:numAsks]
+        bidDepth = bidSize.sum()
+        askDepth = askSize.sum()
+        if bidDepth <= 0 or askDepth <= 0:
+            return nan
+        bidAvg = self._price[1][:numBids].dot(bidSize) / bidDepth
+        askAvg = self._price[0][:numAsks].dot(askSize) / askDepth
+        return float(
+            (bidAvg * askDepth + askAvg * bidDepth) / (bidDepth + askDepth))
+
+    def imbalance(self, n: int = 0) -> float:
+        """
+        Order book imbalance ``(bidDepth - askDepth) / (bidDepth +
+        askDepth)``, from -1 (only asks) to 1 (only bids), or NaN if
+        the book is empty.
+
+        Args:
+            n: If non-zero, use only the best ``n`` levels of each side.
+        """
+        bidDepth = self.depth(1, n)
+        askDepth = self.depth(0, n)
+        total = bidDepth + askDepth
+        return (bidDepth - askDepth) / total if total > 0 else nan
+
+
+class AggregatedBook:
+    """
+    Consolidated order book that aggregates the levels of all market
+    makers (or exchanges) by price, as received with SMART depth.
+
+    The positional rows of the depth updates are kept per side, and
+    every update moves the contribution of its row from the old to
+    the new price. Each price holds the sizes per market maker and
+    the prices of each side are kept sorted, so an update needs a
+    binary search instead of a re-aggregation of the whole book.
+
+    The prices are kept in a plain sorted list. Adding or removing a
+    price is then O(n) in the number of prices, as are the inserts and
+    deletes of the positional rows themselves. With the few hundred
+    levels of a SMART book this is a memory move that is cheaper than
+    the O(log n) alternatives in pure Python, and the sorted list can
+    be sliced for :meth:`levels` directly.
+
+    A price whose total size comes within ``1e-9`` of zero, as can
+    happen by floating point drift when sizes are added and removed,
+    is left out of the levels.
+
+    Sides are indexed as in the depth updates of TWS, 0 for the asks
+    and 1 for the bids.
+    """
+
+    __slots__ = ('_rows', '_prices', '_venues', '_totals')
+
+    def __init__(self):
+        self._rows: List[List[Tuple[float, float, str]]] = [[], []]
+        self._prices: List[List[float]] = [[], []]
+        self._venues: List[Dict[float, Dict[str, List[float]]]] = [{}, {}]
+        self._totals: List[Dict[float, float]] = [{}, {}]
+
+    def __repr__(self):
+        return (
+            f'AggregatedBook(bids={len(self._prices[1])}, '
+            f'asks={len(self._prices[0])})')
+
+    def update(
+            self, position: int, marketMaker: str, operation: int,
+            side: int, price: float, size: float):
+        """
+        Apply a depth update of TWS.
+
+        Args:
+            position: Row of the level.
+            marketMaker: Market maker or exchange of the level.
+            operation: 0 = insert, 1 = update, 2 = delete.
+            side: 0 = ask, 1 = bid.
+            price: Price of the level.
+            size: Size of the level.
+        """
+        rows = self._rows[side]
+        if operation == 1 and position < len(rows):
+            self._remove(side, *rows[position])
+            rows[position] = (price, size, marketMaker)
+            self._add(side, price, size, marketMaker)
+        elif operation == 2:
+            if position < len(rows):
+                self._remove(side, *rows.pop(position))
+        else:
+            rows.insert(position, (price, size, marketMaker))
+            self._add(side, price, size, marketMaker)
+
+    def _add(self, side: int, price: float, size: float, marketMaker: str):
+        venues = self._venues[side].get(price)
+        if venues is None:
+            venues = self._venues[side][price] = {}
+        # per market maker the size and the number of rows
+        venue = venues.get(marketMaker)
+        if venue is None:
+            venues[marketMaker] = [size, 1]
+        else:
+            venue[0] += size
+            venue[1] += 1
+        self._setTotal(side, price, venues)
+
+    def _remove(
+            self, side: int, price: float, size: float, marketMaker: str):
+        venues = self._venues[side][price]
+        venue = venues[marketMaker]
+        venue[1] -= 1
+        if venue[1]:
+            venue[0] -= size
+            if abs(venue[0]) < 1e-9:
+                venue[0] = 0.0
+        else:
+            del venues[marketMaker]
+        if not venues:
+            del self._venues[side][price]
+        self._setTotal(side, price, venues)
+
+    def _setTotal(
+            self, side: int, price: float, venues: Dict[str, List[float]]):
+        # only the prices with a size are levels
+        total = sum(v[0] for v in venues.values())
+        totals = self._totals[side]
+        prices = self._prices[side]
+        if abs(total) < 1e-9:
+            if price in totals:
+                del totals[price]
+                del prices[bisect_left(prices, price)]
+        else:
+            if price not in totals:
+                insort(prices, price)
+            totals[price] = total
+
+    def clear(self):
+        """Remove all levels."""
+        for side in range(2):
+            self._rows[side].clear()
+            self._prices[side].clear()
+            self._venues[side].clear()
+            self._totals[side].clear()
+
+    def levels(self, side: int, n: int = 0) -> List[Tuple[float, float]]:
+        """
+        Get the consolidated levels of a side as ``(price, size)``
+        tuples, best price first.
+
+        Args:
+            side: 0 = ask, 1 = bid.
+            n: If non-zero, return only the best ``n`` levels.
+        """
+        prices = self._prices[side]
+        if side:
+            prices = prices[:-n - 1:-1] if n else prices[::-1]
+        elif n:
+            prices = prices[:n]
+        totals = self._totals[side]
+        return [(price, totals[price]) for price in prices]
+
+    def bids(self, n: int = 0) -> List[Tuple[float, float]]:
+        """Get the consolidated bid levels, see :meth:`levels`."""
+        return self.levels(1, n)
+
+    def asks(self, n: int = 0) -> List[Tuple[float, float]]:
+        """Get the consolidated ask levels, see :meth:`levels`."""
+        return self.levels(0, n)
+
+    def venues(self, side: int, price: float) -> Dict[str, float]:
+        """
+        Get the size per market maker at a price.
+
+        Args:
+            side: 0 = ask, 1 = bid.
+            price: Price of the level.
+        """
+        venues = self._venues[side].get(price, {})
+        return {mm: v[0] for mm, v in venues.items()}
+
+
 class TickerUpdateEvent(Event):
     __slots__ = ()
 
@@ -195,7 +691,7 @@ class Tickfilter(Op):
             if t.tickType in self._tickTypes:
                 self.emit(t.time, t.price, t.size)
 
-    def timebars(self, timer: Event) -> "TimeBars":
+    def timebars(self, timer: Event, maxLength: int = 0) -> "TimeBars":
         """
         Aggregate ticks into time bars, where the timing of new bars
         is derived from a timer event.
@@ -206,10 +702,12 @@ class Tickfilter(Op):
 
         Args:
             timer: Event for timing when a new bar starts.
+            maxLength: If non-zero, keep only about this many of the
+                latest bars, see :class:`.BarList`.
         """
-        return TimeBars(timer, self)
+        return TimeBars(timer, self, maxLength)
 
-    def tickbars(self, count: int) -> "TickBars":
+    def tickbars(self, count: int, maxLength: int = 0) -> "TickBars":
         """
         Aggregate ticks into bars that have the same number of ticks.
         Emits a completed :class:`Bar`.
@@ -219,10 +717,12 @@ class Tickfilter(Op):
 
         Args:
             count: Number of ticks to use to form one bar.
+            maxLength: If non-zero, keep only about this many of the
+                latest bars, see :class:`.BarList`.
         """
-        return TickBars(count, self)
+        return TickBars(count, self, maxLength)
 
-    def volumebars(self, volume: int) -> "VolumeBars":
+    def volumebars(self, volume: int, maxLength: int = 0) -> "VolumeBars":
         """
         Aggregate ticks into bars that have the same volume.
         Emits a completed :class:`Bar`.
@@ -231,9 +731,93 @@ class Tickfilter(Op):
         ``bars`` property.
 
         Args:
-            count: Number of ticks to use to form one bar.
+            volume: Volume to use to form one bar.
+            maxLength: If non-zero, keep only about this many of the
+                latest bars, see :class:`.BarList`.
+        """
+        return VolumeBars(volume, self, maxLength)
+
+    def dollarbars(self, dollars: float, maxLength: int = 0) -> "DollarBars":
+        """
+        Aggregate ticks into bars that have the same traded value
+        (price times size).
+        Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            dollars: Traded value to use to form one bar.
+            maxLength: If non-zero, keep only about this many of the
+                latest bars, see :class:`.BarList`.
+        """
+        return DollarBars(dollars, self, maxLength)
+
+    def imbalancebars(
+            self, threshold: int, maxLength: int = 0) -> "ImbalanceBars":
+        """
+        Aggregate ticks into tick-imbalance bars. Every tick is signed
+        by the tick rule, +1 for an uptick and -1 for a downtick, or
+        the sign of the previous tick if the price is unchanged, and a
+        bar is completed once the sum of the signs of its ticks reaches
+        plus or minus the threshold.
+        Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            threshold: Absolute tick imbalance that completes a bar.
+            maxLength: If non-zero, keep only about this many of the
+                latest bars, see :class:`.BarList`.
+        """
+        return ImbalanceBars(threshold, self, maxLength)
+
+    def vwap(self, window: float) -> "RollingVWAP":
+        """
+        Rolling volume-weighted average price of the ticks within the
+        last ``window`` seconds.
+        Emits ``(time, vwap)`` for every tick.
+
+        Args:
+            window: Length of the window in seconds.
+        """
+        return RollingVWAP(window, self)
+
+    def twap(self, window: float) -> "RollingTWAP":
         """
-        return VolumeBars(volume, self)
+        Rolling time-weighted average price over the last ``window``
+        seconds, where every price is weighted by the time until the
+        next tick.
+        Emits ``(time, twap)`` for every tick.
+
+        Args:
+            window: Length of the window in seconds.
+        """
+        return RollingTWAP(window, self)
+
+    def volatility(self, window: float) -> "RollingVolatility":
+        """
+        Rolling realized volatility: The square root of the sum of the
+        squared log returns from tick to tick within the last
+        ``window`` seconds. It is not annualized.
+        Emits ``(time, volatility)`` for every tick.
+
+        Args:
+            window: Length of the window in seconds.
+        """
+        return RollingVolatility(window, self)
+
+    def ewma(self, alpha: float) -> "EWMA":
+        """
+        Exponentially weighted moving average of the price, with
+        every tick given a weight of ``alpha``.
+        Emits ``(time, ewma)`` for every tick.
+
+        Args:
+            alpha: Weight of the newest tick, between 0 and 1.
+        """
+        return EWMA(alpha, self)
 
 
 class Midpoints(Tickfilter):
@@ -256,11 +840,24 @@ class Bar:
 
 
 class BarList(List[Bar]):
+    """
+    List of bars. If ``maxLength`` is non-zero then the oldest bars
+    beyond this length are removed, in chunks to keep appending
+    O(1) amortized: Once the list grows a quarter beyond ``maxLength``
+    it is trimmed back to the latest ``maxLength`` bars.
+    """
 
-    def __init__(self, *args):
+    def __init__(self, *args, maxLength: int = 0):
         super().__init__(*args)
+        self.maxLength = maxLength
         self.updateEvent = Event('updateEvent')
 
+    def append(self, bar: Bar):
+        super().append(bar)
+        maxLength = self.maxLength
+        if maxLength and len(self) > maxLength + max(1, maxLength // 4):
+            del self[:len(self) - maxLength]
+
     def __eq__(self, other):
         return self is other
 
@@ -274,11 +871,11 @@ class TimeBars(Op):
 
     bars: BarList
 
-    def __init__(self, timer, source=None):
+    def __init__(self, timer, source=None, maxLength=0):
         Op.__init__(self, source)
         self._timer = timer
         self._timer.connect(self._on_timer, None, self._on_timer_done)
-        self.bars = BarList()
+        self.bars = BarList(maxLength=maxLength)
 
     def on_source(self, time, price, size):
         if not self.bars:
@@ -314,10 +911,10 @@ class TickBars(Op):
 
     bars: BarList
 
-    def __init__(self, count, source=None):
+    def __init__(self, count, source=None, maxLength=0):
         Op.__init__(self, source)
         self._count = count
-        self.bars = BarList()
+        self.bars = BarList(maxLength=maxLength)
 
     def on_source(self, time, price, size):
         if not self.bars or self.bars[-1].count == self._count:
@@ -341,10 +938,10 @@ class VolumeBars(Op):
 
     bars: BarList
 
-    def __init__(self, volume, source=None):
+    def __init__(self, volume, source=None, maxLength=0):
         Op.__init__(self, source)
         self._volume = volume
-        self.bars = BarList()
+        self.bars = BarList(maxLength=maxLength)
 
     def on_source(self, time, price, size):
         if not self.bars or self.bars[-1].volume >= self._volume:
@@ -360,3 +957,204 @@ class VolumeBars(Op):
         if bar.volume >= self._volume:
             self.bars.updateEvent.emit(self.bars, True)
             self.emit(self.bars)
+
+
+class DollarBars(Op):
+    __slots__ = ('_dollars', '_turnover', 'bars')
+    __doc__ = Tickfilter.dollarbars.__doc__
+
+    bars: BarList
+
+    def __init__(self, dollars, source=None, maxLength=0):
+        Op.__init__(self, source)
+        self._dollars = dollars
+        self._turnover = 0.0
+        self.bars = BarList(maxLength=maxLength)
+
+    def on_source(self, time, price, size):
+        if not self.bars or self._turnover >= self._dollars:
+            bar = Bar(time, price, price, price, price, size, 1)
+            self.bars.append(bar)
+            self._turnover = price * size
+        else:
+            bar = self.bars[-1]
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+            bar.volume += size
+            bar.count += 1
+            self._turnover += price * size
+        if self._turnover >= self._dollars:
+            self.bars.updateEvent.emit(self.bars, True)
+            self.emit(self.bars)
+
+
+class ImbalanceBars(Op):
+    __slots__ = ('_threshold', '_imbalance', '_sign', '_prevPrice', 'bars')
+    __doc__ = Tickfilter.imbalancebars.__doc__
+
+    bars: BarList
+
+    def __init__(self, threshold, source=None, maxLength=0):
+        Op.__init__(self, source)
+        self._threshold = threshold
+        self._imbalance = 0
+        self._sign = 0
+        self._prevPrice = nan
+        self.bars = BarList(maxLength=maxLength)
+
+    def on_source(self, time, price, size):
+        if price > self._prevPrice:
+            self._sign = 1
+        elif price < self._prevPrice:
+            self._sign = -1
+        self._prevPrice = price
+        if not self.bars or abs(self._imbalance) >= self._threshold:
+            bar = Bar(time, price, price, price, price, size, 1)
+            self.bars.append(bar)
+            self._imbalance = self._sign
+        else:
+            bar = self.bars[-1]
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+            bar.volume += size
+            bar.count += 1
+            self._imbalance += self._sign
+        if abs(self._imbalance) >= self._threshold:
+            self.bars.updateEvent.emit(self.bars, True)
+            self.emit(self.bars)
+
+
+class RollingVWAP(Op):
+    __slots__ = ('_window', '_ticks', '_turnover', '_volume', 'value')
+    __doc__ = Tickfilter.vwap.__doc__
+
+    value: float
+
+    def __init__(self, window, source=None):
+        Op.__init__(self, source)
+        self._window = window
+        self._ticks: Deque[Tuple[float, float, float]] = deque()
+        self._turnover = 0.0
+        self._volume = 0.0
+        self.value = nan
+
+    def on_source(self, time, price, size):
+        t = time.timestamp()
+        ticks = self._ticks
+        ticks.append((t, price * size, size))
+        self._turnover += price * size
+        self._volume += size
+        cutoff = t - self._window
+        if ticks[0][0] <= cutoff:
+            while ticks[0][0] <= cutoff and len(ticks) > 1:
+                _, turnover, volume = ticks.popleft()
+                self._turnover -= turnover
+                self._volume -= volume
+            if len(ticks) == 1:
+                # start afresh to not accumulate rounding errors
+                self._turnover = price * size
+                self._volume = size
+        self.value = (
+            self._turnover / self._volume if self._volume > 0 else nan)
+        self.emit(time, self.value)
+
+
+class RollingTWAP(Op):
+    __slots__ = (
+        '_window', '_segments', '_area', '_duration', '_prevTime',
+        '_prevPrice', 'value')
+    __doc__ = Tickfilter.twap.__doc__
+
+    value: float
+
+    def __init__(self, window, source=None):
+        Op.__init__(self, source)
+        self._window = window
+        # (start, end, price) of the time spans between ticks
+        self._segments: Deque[Tuple[float, float, float]] = deque()
+        self._area = 0.0
+        self._duration = 0.0
+        self._prevTime = 0.0
+        self._prevPrice = nan
+        self.value = nan
+
+    def on_source(self, time, price, size):
+        t = time.timestamp()
+        segments = self._segments
+        prevTime = self._prevTime
+        if prevTime and t > prevTime:
+            segments.append((prevTime, t, self._prevPrice))
+            self._area += self._prevPrice * (t - prevTime)
+            self._duration += t - prevTime
+        self._prevTime = t
+        self._prevPrice = price
+        cutoff = t - self._window
+        while segments and segments[0][1] <= cutoff:
+            start, end, p = segments.popleft()
+            self._area -= p * (end - start)
+            self._duration -= end - start
+        if not segments:
+            self._area = self._duration = 0.0
+        area = self._area
+        duration = self._duration
+        if segments and segments[0][0] < cutoff:
+            # the oldest span sticks out of the window
+            start, _, p = segments[0]
+            area -= p * (cutoff - start)
+            duration -= cutoff - start
+        self.value = area / duration if duration > 0 else price
+        self.emit(time, self.value)
+
+
+class RollingVolatility(Op):
+    __slots__ = ('_window', '_returns', '_sumSq', '_prevPrice', 'value')
+    __doc__ = Tickfilter.volatility.__doc__
+
+    value: float
+
+    def __init__(self, window, source=None):
+        Op.__init__(self, source)
+        self._window = window
+        self._returns: Deque[Tuple[float, float]] = deque()
+        self._sumSq = 0.0
+        self._prevPrice = nan
+        self.value = nan
+
+    def on_source(self, time, price, size):
+        if price <= 0:
+            return
+        t = time.timestamp()
+        returns = self._returns
+        if self._prevPrice > 0:
+            sq = math.log(price / self._prevPrice) ** 2
+            returns.append((t, sq))
+            self._sumSq += sq
+        self._prevPrice = price
+        cutoff = t - self._window
+        while returns and returns[0][0] <= cutoff:
+            self._sumSq -= returns.popleft()[1]
+        if not returns:
+            self._sumSq = 0.0
+        self.value = math.sqrt(max(self._sumSq, 0.0))
+        self.emit(time, self.value)
+
+
+class EWMA(Op):
+    __slots__ = ('_alpha', 'value')
+    __doc__ = Tickfilter.ewma.__doc__
+
+    value: float
+
+    def __init__(self, alpha, source=None):
+        Op.__init__(self, source)
+        self._alpha = alpha
+        self.value = nan
+
+    def on_source(self, time, price, size):
+        if isNan(self.value):
+            self.value = price
+        else:
+            self.value += self._alpha * (price - self.value)
+        self.emit(time, self.value)
@@ -106,8 +106,10 @@ def dataclassUpdate(obj, *srcObjs, **kwargs) -> object:
     if not is_dataclass(obj):
         raise TypeError(f'Object {obj} is not a dataclass')
     for srcObj in srcObjs:
-        obj.__dict__.update(dataclassAsDict(srcObj))
-    obj.__dict__.update(**kwargs)
+        for k, v in dataclassAsDict(srcObj).items():
+            setattr(obj, k, v)
+    for k, v in kwargs.items():
+        setattr(obj, k, v)
     return obj
 
 
@@ -122,6 +124,26 @@ def dataclassRepr(obj) -> str:
     return f'{clsName}({kwargs})'
 
 
+def dataclassSlotted(cls: type, name: str, *extraSlots: str) -> type:
+    """
+    Create a compact variant of the given ``dataclass`` that stores its
+    fields in ``__slots__`` instead of a per-instance ``__dict__``.
+
+    The variant has the same fields, methods and class attributes.
+    Instance attributes that are not fields (such as events created in
+    ``__post_init__``) must be listed in ``extraSlots``.
+    """
+    if not is_dataclass(cls):
+        raise TypeError(f'Class {cls} is not a dataclass')
+    names = tuple(field.name for field in fields(cls))
+    ns = {
+        k: v for k, v in cls.__dict__.items()
+        if k not in names and k not in ('__dict__', '__weakref__')}
+    ns['__slots__'] = names + extraSlots
+    ns['__qualname__'] = name
+    return type(name, cls.__bases__, ns)
+
+
 def isnamedtupleinstance(x):
     """From https://stackoverflow.com/a/2166841/6067848"""
     t = type(x)
@@ -1,19 +1,21 @@
 """Wrapper to handle incoming messages."""
 
 import asyncio
+import dataclasses
 import logging
+import time
 from collections import defaultdict
 from contextlib import suppress
 from datetime import datetime, timezone
-from typing import (Any, Dict, List, Optional, Set, TYPE_CHECKING, Tuple,
-                    Union, cast)
+from typing import (Any, ClassVar, Dict, List, Optional, Set, TYPE_CHECKING,
+                    Tuple, Union, cast)
 
 from ib_insync.contract import (
     Contract, ContractDescription, ContractDetails, DeltaNeutralContract,
     ScanData)
 from ib_insync.objects import (
-    AccountValue, BarData, BarDataList, CommissionReport, DOMLevel,
-    DepthMktDataDescription, Dividends, Execution, FamilyCode, Fill,
+    AccountValue, BarData, BarDataColumns, BarDataList, CommissionReport,
+    DOMLevel, DepthMktDataDescription, Dividends, Execution, FamilyCode, Fill,
     FundamentalRatios, HistogramData, HistoricalNews, HistoricalSchedule,
     HistoricalSession, HistoricalTick, HistoricalTickBidAsk,
     HistoricalTickLast, MktDepthData, NewsArticle, NewsBulletin, NewsProvider,
@@ -21,8 +23,9 @@ from ib_insync.objects import (
     Position, PriceIncrement, RealTimeBar, RealTimeBarList, SoftDollarTier,
     TickAttribBidAsk, TickAttribLast, TickByTickAllLast, TickByTickBidAsk,
     TickByTickMidPoint, TickData, TradeLogEntry)
+from ib_insync.journal import OrderJournal, TradeArchive
 from ib_insync.order import Order, OrderState, OrderStatus, Trade
-from ib_insync.ticker import Ticker
+from ib_insync.ticker import CompactTicker, TickBuffer, Ticker
 from ib_insync.util import (
     UNSET_DOUBLE, UNSET_INTEGER, dataclassAsDict, dataclassUpdate,
     getLoop, globalErrorEvent, isNan, parseIBDatetime)
@@ -33,6 +36,33 @@ if TYPE_CHECKING:
 
 OrderKeyType = Union[int, Tuple[int, int]]
 
+_orderStrDefaults = {
+    field.name: field.default for field in dataclasses.fields(Order)
+    if type(field.default) is str}
+""" Name -> default of the string fields of an order """
+
+_warningCodes = frozenset((110, 165, 202, 399, 404, 434, 492, 10167))
+""" Error codes of messages that are warnings, besides 2100-2199 """
+
+_maxEvictedExecIds = 10000
+""" Number of execIds of evicted fills to remember """
+
+
+def isWarningCode(errorCode: int) -> bool:
+    """See if the error code of an error message is that of a warning."""
+    return errorCode in _warningCodes or 2100 <= errorCode < 2200
+
+
+_tradeTickTypes = frozenset((4, 5, 48, 68, 71, 77))
+""" Tick types of trades, which are never coalesced """
+
+_prevTickAttrs = {
+    1: ('bid', 'bidSize'), 66: ('bid', 'bidSize'),
+    2: ('ask', 'askSize'), 67: ('ask', 'askSize'),
+    0: ('bidSize',), 69: ('bidSize',),
+    3: ('askSize',), 70: ('askSize',)}
+""" Tick type -> ticker attributes of its values that have a prev* """
+
 
 class RequestError(Exception):
     """
@@ -53,6 +83,90 @@ class RequestError(Exception):
         self.message = message
 
 
+class TradeIndex:
+    """
+    Secondary indexes of the trades, to select the open trades or the
+    trades by conId, account, orderRef or parentId in time proportional
+    to the size of the result.
+
+    The index of a trade must be updated whenever it is added or its
+    status, contract or order changes. It also keeps the time that
+    trades are completed, in order of completion.
+    """
+
+    Attrs: ClassVar = ('conId', 'account', 'orderRef', 'parentId')
+
+    def __init__(self):
+        self.openTrades: Dict[OrderKeyType, Trade] = {}
+        self._indexes: Dict[str, Dict[Any, Dict[OrderKeyType, Trade]]] = {
+            attr: {} for attr in self.Attrs}
+        self._values: Dict[OrderKeyType, tuple] = {}
+        self.doneTrades: Dict[OrderKeyType, float] = {}
+
+    def update(self, key: OrderKeyType, trade: Trade):
+        """Add or update the index of the trade with the given key."""
+        values = (
+            trade.contract.conId, trade.order.account,
+            trade.order.orderRef, trade.order.parentId)
+        oldValues = self._values.get(key)
+        if values != oldValues:
+            for attr, value, oldValue in zip(
+                    self.Attrs, values, oldValues or (None,) * 4):
+                if value == oldValue:
+                    continue
+                index = self._indexes[attr]
+                if oldValues is not None:
+                    keys = index[oldValue]
+                    del keys[key]
+                    if not keys:
+                        del index[oldValue]
+                index.setdefault(value, {})[key] = trade
+            self._values[key] = values
+        if trade.orderStatus.status in OrderStatus.DoneStates:
+            self.openTrades.pop(key, None)
+            if key not in self.doneTrades:
+                self.doneTrades[key] = time.time()
+        else:
+            self.openTrades[key] = trade
+
+    def remove(self, key: OrderKeyType):
+        """Remove the trade with the given key from the index."""
+        values = self._values.pop(key, None)
+        if values is not None:
+            for attr, value in zip(self.Attrs, values):
+                index = self._indexes[attr]
+                keys = index[value]
+                del keys[key]
+                if not keys:
+                    del index[value]
+        self.openTrades.pop(key, None)
+        self.doneTrades.pop(key, None)
+
+    def select(self, openOnly: bool = False, **criteria) -> List[Trade]:
+        """
+        Get the trades that match all of the given index attributes,
+        optionally only the open trades.
+        """
+        candidates: Dict[OrderKeyType, Trade]
+        if criteria:
+            selections = [
+                self._indexes[attr].get(value, {})
+                for attr, value in criteria.items()]
+            if openOnly:
+                selections.append(self.openTrades)
+            candidates = min(selections, key=len)
+            others = [sel for sel in selections if sel is not candidates]
+            return [
+                trade for key, trade in candidates.items()
+                if all(key in sel for sel in others)]
+        elif openOnly:
+            return list(self.openTrades.values())
+        else:
+            return [
+                trade for keys in self._indexes['conId'].values()
+                for trade in keys.values()]
+
+
 class Wrapper:
     """Wrapper implementation for use with the IB class."""
 
@@ -76,6 +190,9 @@ class Wrapper:
     permId2Trade: Dict[int, Trade]
     """ permId -> Trade """
 
+    tradeIndex: TradeIndex
+    """ Open trades and trades by conId, account, orderRef and parentId """
+
     fills: Dict[str, Fill]
     """ execId -> Fill """
 
@@ -113,6 +230,12 @@ class Wrapper:
     lastTime: datetime
     """ UTC time of last network packet arrival. """
 
+    _tickBuffer: Optional[Dict[Tuple[int, int], tuple]]
+    """ (reqId, tickType) -> (wrapper method, *args) of coalesced ticks """
+
+    _tickPrevs: Dict[Tuple[int, str], List[Any]]
+    """ (reqId, attribute) -> [last value, previous value] in the buffer """
+
     accounts: List[str]
     clientId: int
     wshMetaReqId: int
@@ -128,21 +251,27 @@ class Wrapper:
 
     _logger: logging.Logger
     _timeoutHandle: Union[asyncio.TimerHandle, None]
+    _orderJournal: Optional[OrderJournal]
 
     def __init__(self, ib: 'IB'):
         self.ib = ib
         self._logger = logging.getLogger('ib_insync.wrapper')
         self._timeoutHandle = None
+        self._orderJournal = None
         self.reset()
 
     def reset(self):
+        if self._orderJournal:
+            self._orderJournal.close()
         self.accountValues = {}
         self.acctSummary = {}
         self.portfolio = defaultdict(dict)
         self.positions = defaultdict(dict)
         self.trades = {}
         self.permId2Trade = {}
+        self.tradeIndex = TradeIndex()
         self.fills = {}
+        self._evictedExecIds: Dict[str, None] = {}
         self.newsTicks = []
         self.msgId2NewsBulletin = {}
         self.tickers = {}
@@ -155,6 +284,8 @@ class Wrapper:
         self.pnlKey2ReqId = {}
         self.pnlSingleKey2ReqId = {}
         self.lastTime = datetime.min
+        self._tickBuffer = None
+        self._tickPrevs = {}
         self.accounts = []
         self.clientId = -1
         self.wshMetaReqId = 0
@@ -213,6 +344,17 @@ class Wrapper:
                 else:
                     future.set_exception(result)
 
+    def cancelReq(self, key):
+        """
+        Forget the request of the key, after it has been cancelled with
+        TWS, and cancel its future if it is still pending.
+        """
+        future = self._futures.pop(key, None)
+        self._results.pop(key, None)
+        self._reqId2Contract.pop(key, None)
+        if future and not future.done():
+            future.cancel()
+
     def startTicker(
             self, reqId: int, contract: Contract, tickType: Union[int, str]):
         """
@@ -221,9 +363,12 @@ class Wrapper:
         """
         ticker = self.tickers.get(id(contract))
         if not ticker:
-            ticker = Ticker(
+            tickerClass = CompactTicker if self.ib.CompactTickers else Ticker
+            ticker = tickerClass(
                 contract=contract, ticks=[], tickByTicks=[],
                 domBids=[], domAsks=[], domTicks=[])
+            if self.ib.TickBufferSize:
+                ticker.tickBuffer = TickBuffer(self.ib.TickBufferSize)
             self.tickers[id(contract)] = ticker
         self.reqId2Ticker[reqId] = ticker
         self._reqId2Contract[reqId] = contract
@@ -255,6 +400,48 @@ class Wrapper:
             key = (clientId, orderId)
         return key
 
+    def orderJournal(self) -> Optional[OrderJournal]:
+        """
+        Get the order journal as configured by the IB instance,
+        or None if there is no journal.
+        """
+        path = self.ib.OrderJournalPath
+        journal = self._orderJournal
+        if not path:
+            return None
+        if not journal or journal.path != path \
+                or journal.syncPolicy != self.ib.OrderJournalSync:
+            if journal:
+                journal.close()
+            journal = self._orderJournal = OrderJournal(
+                path, self.ib.OrderJournalSync)
+        return journal
+
+    def restoreTrades(self) -> List[Trade]:
+        """
+        Replay the order journal and add the restored trades and fills
+        that are not known yet. Returns the added trades.
+        """
+        journal = self.orderJournal()
+        if not journal:
+            return []
+        trades, fills = journal.replay()
+        restored = []
+        for key, trade in trades.items():
+            if key in self.trades:
+                continue
+            maxLog = self.ib.MaxTradeLog
+            if maxLog and len(trade.log) > maxLog:
+                del trade.log[:-maxLog]
+            self.trades[key] = trade
+            self.permId2Trade.setdefault(trade.order.permId, trade)
+            self.tradeIndex.update(key, trade)
+            restored.append(trade)
+        for execId, fill in fills.items():
+            self.fills.setdefault(execId, fill)
+        self._logger.info(f'Restored {len(restored)} trades from journal')
+        return restored
+
     def setTimeout(self, timeout: float):
         self.lastTime = datetime.now(timezone.utc)
         if self._timeoutHandle:
@@ -413,23 +600,38 @@ class Wrapper:
             key = self.orderKey(order.clientId, order.orderId, order.permId)
             trade = self.trades.get(key)
             if trade:
-                trade.order.permId = order.permId
-                trade.order.totalQuantity = order.totalQuantity
-                trade.order.lmtPrice = order.lmtPrice
-                trade.order.auxPrice = order.auxPrice
-                trade.order.orderType = order.orderType
-                trade.order.orderRef = order.orderRef
+                o = trade.order
+                if (o.permId != order.permId
+                        or o.totalQuantity != order.totalQuantity
+                        or o.lmtPrice != order.lmtPrice
+                        or o.auxPrice != order.auxPrice
+                        or o.orderType != order.orderType
+                        or o.orderRef != order.orderRef):
+                    o.permId = order.permId
+                    o.totalQuantity = order.totalQuantity
+                    o.lmtPrice = order.lmtPrice
+                    o.auxPrice = order.auxPrice
+                    o.orderType = order.orderType
+                    o.orderRef = order.orderRef
+                    journal = self.orderJournal()
+                    if journal:
+                        journal.modifyOrder(key, o)
             else:
                 # ignore '?' values in the order
-                order = Order(**{
-                    k: v for k, v in dataclassAsDict(order).items()
-                    if v != '?'})
-                contract = Contract.create(**dataclassAsDict(contract))
+                values = order.__dict__
+                for k, default in _orderStrDefaults.items():
+                    if values[k] == '?':
+                        values[k] = default
+                contract = Contract.specialize(contract)
                 orderStatus = OrderStatus(
                     orderId=orderId, status=orderState.status)
                 trade = Trade(contract, order, orderStatus, [], [])
                 self.trades[key] = trade
-                self._logger.info(f'openOrder: {trade}')
+                journal = self.orderJournal()
+                if journal:
+                    journal.newTrade(key, trade)
+                self._logger.info('openOrder: %s', trade)
+            self.tradeIndex.update(key, trade)
             self.permId2Trade.setdefault(order.permId, trade)
             results = self._results.get('openOrders')
             if results is None:
@@ -437,6 +639,7 @@ class Wrapper:
             else:
                 # response to reqOpenOrders or reqAllOpenOrders
                 results.append(trade)
+            trade.ackEvent.emit(trade)
 
         # make sure that the client issues order ids larger than any
         # order id encountered (even from other clients) to avoid
@@ -448,7 +651,7 @@ class Wrapper:
 
     def completedOrder(
             self, contract: Contract, order: Order, orderState: OrderState):
-        contract = Contract.create(**dataclassAsDict(contract))
+        contract = Contract.specialize(contract)
         orderStatus = OrderStatus(
             orderId=order.orderId, status=orderState.status)
         trade = Trade(contract, order, orderStatus, [], [])
@@ -456,6 +659,10 @@ class Wrapper:
         if order.permId not in self.permId2Trade:
             self.trades[order.permId] = trade
             self.permId2Trade[order.permId] = trade
+            self.tradeIndex.update(order.permId, trade)
+            journal = self.orderJournal()
+            if journal:
+                journal.newTrade(order.permId, trade)
 
     def completedOrdersEnd(self):
         self._endReq('completedOrders')
@@ -469,17 +676,26 @@ class Wrapper:
         trade = self.trades.get(key)
         if trade:
             msg: Optional[str]
-            oldStatus = trade.orderStatus.status
-            new = dict(
-                status=status, filled=filled,
-                remaining=remaining, avgFillPrice=avgFillPrice,
-                permId=permId, parentId=parentId,
-                lastFillPrice=lastFillPrice, clientId=clientId,
-                whyHeld=whyHeld, mktCapPrice=mktCapPrice)
-            curr = dataclassAsDict(trade.orderStatus)
-            isChanged = curr != {**curr, **new}
-            if isChanged:
-                dataclassUpdate(trade.orderStatus, **new)
+            s = trade.orderStatus
+            oldStatus = s.status
+            if (status != oldStatus or filled != s.filled
+                    or remaining != s.remaining
+                    or avgFillPrice != s.avgFillPrice
+                    or permId != s.permId or parentId != s.parentId
+                    or lastFillPrice != s.lastFillPrice
+                    or clientId != s.clientId or whyHeld != s.whyHeld
+                    or mktCapPrice != s.mktCapPrice):
+                s.status = status
+                s.filled = filled
+                s.remaining = remaining
+                s.avgFillPrice = avgFillPrice
+                s.permId = permId
+                s.parentId = parentId
+                s.lastFillPrice = lastFillPrice
+                s.clientId = clientId
+                s.whyHeld = whyHeld
+                s.mktCapPrice = mktCapPrice
+                self.tradeIndex.update(key, trade)
                 msg = ''
             elif (status == 'Submitted' and trade.log
                     and trade.log[-1].message == 'Modify'):
@@ -490,8 +706,11 @@ class Wrapper:
 
             if msg is not None:
                 logEntry = TradeLogEntry(self.lastTime, status, msg)
-                trade.log.append(logEntry)
-                self._logger.info(f'orderStatus: {trade}')
+                self._appendLog(trade, logEntry)
+                journal = self.orderJournal()
+                if journal:
+                    journal.orderStatus(key, s, logEntry)
+                self._logger.info('orderStatus: %s', trade)
                 self.ib.orderStatusEvent.emit(trade)
                 trade.statusEvent.emit(trade)
                 if status != oldStatus:
@@ -499,11 +718,75 @@ class Wrapper:
                         trade.filledEvent.emit(trade)
                     elif status == OrderStatus.Cancelled:
                         trade.cancelledEvent.emit(trade)
+                    if status in OrderStatus.DoneStates:
+                        self.pruneTrades()
+            trade.ackEvent.emit(trade)
         else:
             self._logger.error(
                 'orderStatus: No order found for '
                 'orderId %s and clientId %s', orderId, clientId)
 
+    def _appendLog(self, trade: Trade, logEntry: TradeLogEntry):
+        trade.log.append(logEntry)
+        maxLog = self.ib.MaxTradeLog
+        if maxLog and len(trade.log) > maxLog:
+            del trade.log[:-maxLog]
+
+    def pruneTrades(self):
+        """
+        Evict the completed trades that exceed the retention limits of
+        the IB instance. The evicted trades are appended to the trade
+        archive if there is one.
+
+        The fills of the evicted trades are evicted and archived with
+        them. The execIds of the latest evicted fills are remembered, so
+        that a repeated execution of an evicted trade is not added as a
+        new fill; a commission report that arrives after the eviction of
+        its fill is ignored. Call this after the events of a status
+        change have been emitted.
+        """
+        maxDone = self.ib.MaxDoneTrades
+        maxAge = self.ib.MaxDoneTradeAge
+        if not maxDone and not maxAge:
+            return
+        doneTrades = self.tradeIndex.doneTrades
+        now = time.time()
+        evictions = []
+        numDone = len(doneTrades)
+        for key, doneTime in doneTrades.items():
+            if maxDone and numDone > maxDone \
+                    or maxAge and doneTime < now - maxAge:
+                evictions.append((key, doneTime))
+                numDone -= 1
+            else:
+                break
+        if not evictions:
+            return
+        archived = []
+        journal = self.orderJournal()
+        for key, doneTime in evictions:
+            self.tradeIndex.remove(key)
+            if journal:
+                journal.evictTrade(key)
+            trade = self.trades.pop(key, None)
+            if not trade:
+                continue
+            permId = trade.order.permId
+            if self.permId2Trade.get(permId) is trade:
+                del self.permId2Trade[permId]
+            for fill in trade.fills:
+                execId = fill.execution.execId
+                if self.fills.get(execId) is fill:
+                    del self.fills[execId]
+                self._evictedExecIds[execId] = None
+            archived.append((doneTime, trade))
+        evictedExecIds = self._evictedExecIds
+        while len(evictedExecIds) > _maxEvictedExecIds:
+            del evictedExecIds[next(iter(evictedExecIds))]
+        if self.ib.TradeArchivePath:
+            TradeArchive(self.ib.TradeArchivePath).append(archived)
+        self._logger.debug(f'Evicted {len(archived)} completed trades')
+
     def execDetails(
             self, reqId: int, contract: Contract, execution: Execution):
         """
@@ -514,10 +797,10 @@ class Wrapper:
         if execution.orderId == UNSET_INTEGER:
             # bug in TWS: executions of manual orders have unset value
             execution.orderId = 0
+        key = self.orderKey(
+            execution.clientId, execution.orderId, execution.permId)
         trade = self.permId2Trade.get(execution.permId)
         if not trade:
-            key = self.orderKey(
-                execution.clientId, execution.orderId, execution.permId)
             trade = self.trades.get(key)
         if trade and contract == trade.contract:
             contract = trade.contract
@@ -527,20 +810,26 @@ class Wrapper:
         isLive = reqId not in self._futures
         time = self.lastTime if isLive else execution.time
         fill = Fill(contract, execution, CommissionReport(), time)
-        if execId not in self.fills:
+        if execId not in self.fills \
+                and execId not in self._evictedExecIds:
             # first time we see this execution so add it
             self.fills[execId] = fill
+            journal = self.orderJournal()
             if trade:
                 trade.fills.append(fill)
                 logEntry = TradeLogEntry(
                     time,
                     trade.orderStatus.status,
                     f'Fill {execution.shares}@{execution.price}')
-                trade.log.append(logEntry)
+                self._appendLog(trade, logEntry)
+                if journal:
+                    journal.fill(key, fill, logEntry)
                 if isLive:
                     self._logger.info(f'execDetails: {fill}')
                     self.ib.execDetailsEvent.emit(trade, fill)
                     trade.fillEvent(trade, fill)
+            elif journal:
+                journal.fill(None, fill)
         if not isLive:
             self._results[reqId].append(fill)
 
@@ -555,6 +844,9 @@ class Wrapper:
         fill = self.fills.get(commissionReport.execId)
         if fill:
             report = dataclassUpdate(fill.commissionReport, commissionReport)
+            journal = self.orderJournal()
+            if journal:
+                journal.commissionReport(fill.commissionReport)
             self._logger.info(f'commissionReport: {report}')
             trade = self.permId2Trade.get(fill.execution.permId)
             if trade:
@@ -609,6 +901,17 @@ class Wrapper:
             bar.date = parseIBDatetime(bar.date)  # type: ignore
             results.append(bar)
 
+    def historicalDataFields(self, reqId: int, fields: List[str]) -> bool:
+        """
+        Store the raw bar fields if the request is for columnar bars,
+        otherwise return False to have the bars decoded one by one.
+        """
+        results = self._results.get(reqId)
+        if not isinstance(results, BarDataColumns):
+            return False
+        results.addFields(fields)
+        return True
+
     def historicalDataEnd(self, reqId, _start: str, _end: str):
         self._endReq(reqId)
 
@@ -664,6 +967,11 @@ class Wrapper:
     # additional wrapper method provided by Client
     def priceSizeTick(
             self, reqId: int, tickType: int, price: float, size: float):
+        if (self._tickBuffer is not None
+                and tickType not in _tradeTickTypes):
+            self._coalesceTick(
+                reqId, tickType, self.priceSizeTick, price, size)
+            return
         ticker = self.reqId2Ticker.get(reqId)
         if not ticker:
             self._logger.error(f'priceSizeTick: Unknown reqId: {reqId}')
@@ -727,9 +1035,15 @@ class Wrapper:
         if price or size:
             tick = TickData(self.lastTime, tickType, price, size)
             ticker.ticks.append(tick)
+            if ticker.tickBuffer is not None:
+                ticker.tickBuffer.append(self.lastTime, tickType, price, size)
         self.pendingTickers.add(ticker)
 
     def tickSize(self, reqId: int, tickType: int, size: float):
+        if (self._tickBuffer is not None
+                and tickType not in _tradeTickTypes):
+            self._coalesceTick(reqId, tickType, self.tickSize, size)
+            return
         ticker = self.reqId2Ticker.get(reqId)
         if not ticker:
             self._logger.error(f'tickSize: Unknown reqId: {reqId}')
@@ -782,8 +1096,41 @@ class Wrapper:
         if price or size:
             tick = TickData(self.lastTime, tickType, price, size)
             ticker.ticks.append(tick)
+            if ticker.tickBuffer is not None:
+                ticker.tickBuffer.append(self.lastTime, tickType, price, size)
         self.pendingTickers.add(ticker)
 
+    def _coalesceTick(self, reqId: int, tickType: int, method, *args):
+        # keep the last tick per type, in order of last occurrence
+        key = (reqId, tickType)
+        buffer = self._tickBuffer
+        assert buffer is not None
+        buffer.pop(key, None)
+        buffer[key] = (method, *args)
+        # the value before the last change of a ticker attribute,
+        # as prev* would have been without coalescing
+        for attr, value in zip(_prevTickAttrs.get(tickType, ()), args):
+            prevs = self._tickPrevs.get((reqId, attr))
+            if prevs is None:
+                self._tickPrevs[reqId, attr] = [value, None]
+            elif value != prevs[0]:
+                prevs[1] = prevs[0]
+                prevs[0] = value
+
+    def _applyTickBuffer(self):
+        buffer = self._tickBuffer
+        self._tickBuffer = None
+        if buffer:
+            for (reqId, tickType), (method, *args) in buffer.items():
+                method(reqId, tickType, *args)
+        if self._tickPrevs:
+            for (reqId, attr), (_, prev) in self._tickPrevs.items():
+                ticker = self.reqId2Ticker.get(reqId)
+                if ticker and prev is not None:
+                    setattr(ticker, 'prev' + attr[0].upper() + attr[1:], prev)
+                    self.pendingTickers.add(ticker)
+            self._tickPrevs = {}
+
     def tickSnapshotEnd(self, reqId: int):
         self._endReq(reqId)
 
@@ -843,6 +1190,10 @@ class Wrapper:
         self.pendingTickers.add(ticker)
 
     def tickString(self, reqId: int, tickType: int, value: str):
+        if (self._tickBuffer is not None
+                and tickType not in _tradeTickTypes):
+            self._coalesceTick(reqId, tickType, self.tickString, value)
+            return
         ticker = self.reqId2Ticker.get(reqId)
         if not ticker:
             return
@@ -893,6 +1244,9 @@ class Wrapper:
                         ticker.lastSize = size
                     tick = TickData(self.lastTime, tickType, price, size)
                     ticker.ticks.append(tick)
+                    if ticker.tickBuffer is not None:
+                        ticker.tickBuffer.append(
+                            self.lastTime, tickType, price, size)
             elif tickType == 59:
                 # Dividend tick:
                 # https://interactivebrokers.github.io/tws-api/tick_types.html#ib_dividends
@@ -910,6 +1264,9 @@ class Wrapper:
                 f'malformed value: {value!r}')
 
     def tickGeneric(self, reqId: int, tickType: int, value: float):
+        if self._tickBuffer is not None:
+            self._coalesceTick(reqId, tickType, self.tickGeneric, value)
+            return
         ticker = self.reqId2Ticker.get(reqId)
         if not ticker:
             return
@@ -936,6 +1293,8 @@ class Wrapper:
             ticker.rtHistVolatility = value
         tick = TickData(self.lastTime, tickType, value, 0)
         ticker.ticks.append(tick)
+        if ticker.tickBuffer is not None:
+            ticker.tickBuffer.append(self.lastTime, tickType, value, 0)
         self.pendingTickers.add(ticker)
 
     def tickReqParams(
@@ -967,6 +1326,14 @@ class Wrapper:
         # operation: 0 = insert, 1 = update, 2 = delete
         # side: 0 = ask, 1 = bid
         ticker = self.reqId2Ticker[reqId]
+        if ticker.domAggregate is not None:
+            ticker.domAggregate.update(
+                position, marketMaker, operation, side, price, size)
+        if ticker.domBook is not None:
+            ticker.domBook.update(
+                position, marketMaker, operation, side, price, size)
+            self.pendingTickers.add(ticker)
+            return
 
         dom = ticker.domBids if side else ticker.domAsks
         if operation == 0:
@@ -1148,8 +1515,7 @@ class Wrapper:
         # https://interactivebrokers.github.io/tws-api/message_codes.html
         isRequest = reqId in self._futures
         trade = self.trades.get((self.clientId, reqId))
-        warningCodes = {110, 165, 202, 399, 404, 434, 492, 10167}
-        isWarning = errorCode in warningCodes or 2100 <= errorCode < 2200
+        isWarning = isWarningCode(errorCode)
         if errorCode == 110 and isRequest:
             # whatIf request failed
             isWarning = False
@@ -1183,13 +1549,21 @@ class Wrapper:
                     trade.advancedError = advancedOrderRejectJson
                 if not trade.isDone():
                     status = trade.orderStatus.status = OrderStatus.Cancelled
+                    self.tradeIndex.update((self.clientId, reqId), trade)
                     logEntry = TradeLogEntry(
                         self.lastTime, status, msg, errorCode)
-                    trade.log.append(logEntry)
+                    self._appendLog(trade, logEntry)
+                    journal = self.orderJournal()
+                    if journal:
+                        journal.orderStatus(
+                            (self.clientId, reqId), trade.orderStatus,
+                            logEntry)
                     self._logger.warning(f'Canceled order: {trade}')
                     self.ib.orderStatusEvent.emit(trade)
                     trade.statusEvent.emit(trade)
                     trade.cancelledEvent.emit(trade)
+                    self.pruneTrades()
+                trade.ackEvent.emit(trade)
 
         if errorCode == 165:
             # for scan data subscription there are no longer matching results
@@ -1237,8 +1611,14 @@ class Wrapper:
             ticker.tickByTicks = []
             ticker.domTicks = []
         self.pendingTickers = set()
+        if self.ib.CoalesceTicks:
+            self._tickBuffer = {}
 
     def tcpDataProcessed(self):
+        self._applyTickBuffer()
+        journal = self._orderJournal
+        if journal and journal.syncPolicy == 'batch':
+            journal.sync()
         self.ib.updateEvent.emit()
         if self.pendingTickers:
             for ticker in self.pendingTickers:
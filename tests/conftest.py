@@ -1,9 +1,13 @@
-import asyncio
+import datetime as dt
+import time
 
 import pytest
 
 import ib_insync as ibi
 
+t0 = dt.datetime(2024, 1, 2, 15, 30, tzinfo=dt.timezone.utc)
+contract = ibi.Stock('AAPL', 'SMART', 'USD', conId=265598)
+
 
 @pytest.fixture(scope='session')
 def event_loop():
@@ -12,9 +16,41 @@ def event_loop():
     loop.close()
 
 
-@pytest.fixture(scope='session')
-async def ib():
+@pytest.fixture
+def mock():
+    """MockTWS to connect to; Modules can override it to configure it."""
+    mock = ibi.MockTWS().start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def ib(mock, tmp_path):
+    """IB connected to the mock, with its order journal and trade archive."""
     ib = ibi.IB()
-    await ib.connectAsync()
+    ib.OrderJournalPath = str(tmp_path / 'journal')
+    ib.TradeArchivePath = str(tmp_path / 'archive')
+    ib.connect(port=mock.port)
     yield ib
     ib.disconnect()
+
+
+def waitFor(ib, condition, timeout=5):
+    """Run the event loop until the condition holds."""
+    t0 = time.time()
+    while not condition():
+        assert time.time() - t0 < timeout
+        ib.sleep(0.01)
+
+
+def makeTrade(
+        orderId, contract=contract, permId=0, status='Submitted',
+        clientId=1, account='', orderRef='', parentId=0):
+    """Create a trade with a limit order, without placing it."""
+    order = ibi.LimitOrder(
+        'BUY', 10, 100, orderId=orderId, clientId=clientId, permId=permId,
+        account=account, orderRef=orderRef, parentId=parentId)
+    orderStatus = ibi.OrderStatus(
+        orderId=orderId, status=status, permId=permId, clientId=clientId)
+    log = [ibi.TradeLogEntry(t0, status)]
+    return ibi.Trade(contract, order, orderStatus, [], log)
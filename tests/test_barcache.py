@@ -0,0 +1,105 @@
+import datetime as dt
+import os
+
+import pytest
+
+from ib_insync import BarCache, BarData
+
+np = pytest.importorskip('numpy')
+
+utc = dt.timezone.utc
+key = (1234, '1 hour', 'TRADES', True)
+
+
+def hourBars(start, n):
+    return [
+        BarData(start + dt.timedelta(hours=i), 1, 2, 0.5, 1.5, 100, 1.2, 10)
+        for i in range(n)]
+
+
+def test_put_get_and_gaps(tmp_path):
+    cache = BarCache(str(tmp_path))
+    t0 = dt.datetime(2024, 1, 2, tzinfo=utc)
+    t1 = t0 + dt.timedelta(hours=10)
+    assert cache.gaps(key, t0, t1) == [(t0, t1)]
+    cache.put(key, t0, t0 + dt.timedelta(hours=4), hourBars(t0, 4))
+    cache.put(
+        key, t0 + dt.timedelta(hours=6), t1,
+        hourBars(t0 + dt.timedelta(hours=6), 4))
+    assert cache.gaps(key, t0, t1) == [
+        (t0 + dt.timedelta(hours=4), t0 + dt.timedelta(hours=6))]
+    assert cache.gaps(key, t0, t0 + dt.timedelta(hours=3)) == []
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    bars = cache.get(key, t0 + dt.timedelta(hours=2), t1)
+    assert len(bars) == 6
+    assert bars['date'][0] == np.datetime64('2024-01-02T02:00:00')
+
+    # bars that are downloaded again replace the old ones
+    newBars = hourBars(t0, 1)
+    newBars[0].close = 9
+    cache.put(key, t0, t0 + dt.timedelta(hours=1), newBars)
+    assert cache.get(key, t0, t1)['close'][0] == 9
+
+
+def test_forming_bar_not_covered(tmp_path):
+    cache = BarCache(str(tmp_path))
+    now = dt.datetime.now(utc)
+    start = now - dt.timedelta(hours=5)
+    cache.put(key, start, now, hourBars(start, 5))
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    gaps = cache.gaps(key, start, now)
+    # the bar of this hour and the one before are downloaded again
+    assert gaps == [(hour - dt.timedelta(hours=1), now)]
+
+
+def test_daily_naive_start(tmp_path):
+    cache = BarCache(str(tmp_path))
+    dailyKey = (1234, '1 day', 'TRADES', True)
+    bars = [
+        BarData(dt.date(2024, 1, d), 1, 2, 0.5, 1.5, 100, 1.2, 10)
+        for d in (2, 3, 4)]
+    start = dt.datetime(2024, 1, 2)
+    end = dt.datetime(2024, 1, 5, tzinfo=utc)
+    cache.put(dailyKey, start, end, bars)
+    assert cache.gaps(dailyKey, start, end) == []
+    assert len(cache.get(dailyKey, start, end)) == 3
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = BarCache(str(tmp_path))
+    t0 = dt.datetime(2024, 1, 2, tzinfo=utc)
+    t1 = t0 + dt.timedelta(hours=50)
+    keys = [(conId, '1 hour', 'TRADES', True) for conId in (1, 2, 3)]
+    for i, k in enumerate(keys):
+        cache.put(k, t0, t1, hourBars(t0, 50))
+        fileName = cache._fileName(k) + '.json'
+        os.utime(fileName, (1000 + i, 1000 + i))
+    # storing the bars again adds a segment of a third of this size
+    size = sum(os.path.getsize(tmp_path / f) for f in os.listdir(tmp_path))
+    cache.maxBytes = size
+    cache.put(keys[0], t0, t1, hourBars(t0, 50))
+    assert cache.evictions == 1
+    assert cache.gaps(keys[1], t0, t1) == [(t0, t1)]
+    assert cache.gaps(keys[0], t0, t1) == []
+    assert cache.gaps(keys[2], t0, t1) == []
+
+
+def test_segments_are_merged(tmp_path):
+    cache = BarCache(str(tmp_path), maxSegments=2)
+    t0 = dt.datetime(2024, 1, 2, tzinfo=utc)
+    fileName = cache._fileName(key)
+    closes = []
+    for i in range(4):
+        bars = hourBars(t0 + dt.timedelta(hours=i), 2)
+        for bar in bars:
+            bar.close = i
+        cache.put(key, bars[0].date, bars[-1].date, bars)
+        closes.append(list(cache.get(
+            key, t0, t0 + dt.timedelta(hours=10))['close']))
+        # the main file is only rewritten when the segments are merged
+        files = sorted(f for f in os.listdir(tmp_path) if f.endswith('.npy'))
+        assert len(files) == [1, 2, 3, 1][i]
+    assert os.path.basename(fileName) + '.npy' in files
+    assert closes == [
+        [0, 0], [0, 1, 1], [0, 1, 2, 2], [0, 1, 2, 3, 3]]
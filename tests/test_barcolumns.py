@@ -0,0 +1,64 @@
+import datetime as dt
+
+import pytest
+
+import ib_insync as ibi
+
+pytest.importorskip('pandas')
+
+utc = dt.timezone.utc
+contract = ibi.Stock('AAPL', 'SMART', 'USD', conId=265598)
+
+
+@pytest.fixture
+def setup():
+    mock = ibi.MockTWS().start()
+    ib = ibi.IB()
+    ib.connect(port=mock.port)
+    yield mock, ib
+    ib.disconnect()
+    mock.stop()
+
+
+def barFields(dates):
+    fields = []
+    for i, date in enumerate(dates):
+        fields += [date, 100 + i, 101 + i, 99 + i, 100.5 + i, 1000 * i,
+                   100.25 + i, i + 1]
+    return fields
+
+
+def test_intraday_bars(setup):
+    mock, ib = setup
+    t = int(dt.datetime(2024, 1, 2, 14, 30, tzinfo=utc).timestamp())
+    dates = [t + 60 * i for i in range(5)]
+    mock.handlers[20] = lambda session, fields: session.send(
+        17, fields[1], '', '', len(dates), *barFields(dates))
+    bars = ib.reqHistoricalData(
+        contract, '', '1 D', '1 min', 'TRADES', True, formatDate=2)
+    columns = ib.reqHistoricalDataColumns(
+        contract, '', '1 D', '1 min', 'TRADES', True)
+    assert len(columns) == 5
+    df = columns.to_pandas()
+    assert list(df.columns) == list(ibi.BarDataColumns.Names)
+    assert list(df['date']) == [b.date for b in bars]
+    for name in ibi.BarDataColumns.Names[1:]:
+        assert list(df[name]) == [getattr(b, name) for b in bars]
+    assert df['barCount'].dtype == 'int64'
+
+
+def test_daily_bars_in_chunks():
+    columns = ibi.BarDataColumns()
+    columns.addFields([str(f) for f in barFields(['20240102', '20240103'])])
+    columns.addFields([])
+    columns.addFields([str(f) for f in barFields(['20240229'])])
+    assert len(columns) == 3
+    arr = columns.to_numpy()
+    assert [str(d) for d in arr['date'].astype('datetime64[D]')] == [
+        '2024-01-02', '2024-01-03', '2024-02-29']
+    assert list(arr['close']) == [100.5, 101.5, 100.5]
+    df = columns.to_pandas()
+    assert df['date'].dt.tz is None
+    columns.clear()
+    assert len(columns) == 0
+    assert len(columns.to_pandas()) == 0
@@ -0,0 +1,47 @@
+import ib_insync as ibi
+
+packets = [
+    [('priceSizeTick', 1, 10.0, 100), ('priceSizeTick', 2, 10.5, 200),
+     ('tickSize', 0, 150), ('priceSizeTick', 4, 10.25, 5),
+     ('tickSize', 5, 5), ('priceSizeTick', 1, 10.1, 300),
+     ('priceSizeTick', 4, 10.3, 7), ('tickSize', 5, 7),
+     ('priceSizeTick', 1, 10.0, 300)],
+    [('priceSizeTick', 2, 10.6, 200), ('tickSize', 3, 250),
+     ('tickSize', 3, 250), ('priceSizeTick', 2, 10.6, 300),
+     ('priceSizeTick', 4, 10.4, 3), ('tickSize', 5, 3),
+     ('tickString', 48, '10.4;3;1700000000000;1000;10.3;true'),
+     ('tickSize', 8, 1000), ('tickSize', 8, 1010)]]
+
+prevAttrs = [
+    'bid', 'bidSize', 'ask', 'askSize', 'last', 'lastSize', 'volume',
+    'prevBid', 'prevBidSize', 'prevAsk', 'prevAskSize', 'prevLast',
+    'prevLastSize']
+
+
+def run(coalesce):
+    ib = ibi.IB()
+    ib.CoalesceTicks = coalesce
+    ib.TickBufferSize = 100
+    wrapper = ib.wrapper
+    ticker = wrapper.startTicker(1, ibi.Stock('AAPL'), 'mktData')
+    trades = []
+    for packet in packets:
+        wrapper.tcpDataArrived()
+        for method, *args in packet:
+            getattr(wrapper, method)(1, *args)
+        wrapper.tcpDataProcessed()
+        trades += [
+            (t.tickType, t.price, t.size) for t in ticker.ticks
+            if t.tickType in (4, 5, 48)]
+    return ticker, trades
+
+
+def test_coalesced_state_matches():
+    ticker, trades = run(False)
+    coalesced, coalescedTrades = run(True)
+    for attr in prevAttrs:
+        assert getattr(coalesced, attr) == getattr(ticker, attr), attr
+    # trade ticks are never coalesced
+    assert coalescedTrades == trades
+    assert len(coalesced.tickBuffer.trades()[0]) == len(
+        ticker.tickBuffer.trades()[0])
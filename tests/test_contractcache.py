@@ -0,0 +1,101 @@
+import datetime as dt
+import os
+import types
+
+import pytest
+
+import ib_insync as ibi
+import ib_insync.contractcache
+
+day = 24 * 3600
+now = dt.datetime(2024, 3, 1, 12, tzinfo=dt.timezone.utc).timestamp()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(t=now)
+    monkeypatch.setattr(
+        ib_insync.contractcache, 'time',
+        types.SimpleNamespace(time=lambda: clock.t))
+    return clock
+
+
+def details(contract):
+    return ibi.ContractDetails(contract=contract, minTick=0.01)
+
+
+def test_ttl(clock):
+    cache = ibi.ContractDetailsCache(ttl=day)
+    spec = ibi.Stock('AAPL', 'SMART', 'USD')
+    cache.put(spec, [details(ibi.Stock(
+        'AAPL', 'SMART', 'USD', conId=265598, primaryExchange='NASDAQ'))])
+    [cd] = cache.get(spec)
+    assert cd.contract.conId == 265598
+    # the result is a copy that may be modified
+    cd.contract.exchange = 'NASDAQ'
+    assert cache.get(spec)[0].contract.exchange == 'SMART'
+    # by conId, if the other fields agree
+    assert cache.get(ibi.Contract(conId=265598))
+    assert cache.get(ibi.Stock('AAPL', conId=265598))
+    assert cache.get(ibi.Stock('MSFT', conId=265598)) is None
+    assert cache.get(ibi.Stock('AAPL', 'SMART', 'EUR')) is None
+    assert (cache.hits, cache.misses) == (4, 2)
+
+    clock.t += day - 1
+    assert cache.get(spec)
+    clock.t += 1
+    assert cache.get(spec) is None
+    assert cache.get(ibi.Contract(conId=265598)) is None
+
+
+def test_persistence_round_trip(clock, tmp_path):
+    path = str(tmp_path / 'contracts.pkl')
+    cache = ibi.ContractDetailsCache(path, ttl=day, saveDelay=60)
+    spec = ibi.Stock('AAPL', 'SMART', 'USD')
+    cache.put(spec, [details(ibi.Stock(
+        'AAPL', 'SMART', 'USD', conId=265598))])
+    cache.put(ibi.Forex('EURUSD'), [details(ibi.Forex(
+        'EURUSD', conId=12087792))])
+    assert not os.path.exists(path)
+    cache.save()
+
+    loaded = ibi.ContractDetailsCache(path, ttl=day)
+    assert loaded.get(spec) == cache.get(spec)
+    assert loaded.get(ibi.Contract(conId=12087792))[0].contract.symbol \
+        == 'EUR'
+
+    # expired entries are not loaded
+    clock.t += day
+    loaded = ibi.ContractDetailsCache(path, ttl=day)
+    assert loaded._byConId == {}
+    assert loaded._bySpec == {}
+
+    cache.clear()
+    assert not os.path.exists(path)
+
+
+def test_expiry(clock):
+    cache = ibi.ContractDetailsCache(ttl=7 * day)
+    spec = ibi.Future('ES', '202403', 'CME')
+    future = ibi.Future(
+        'ES', '20240301', 'CME', conId=551601561, currency='USD')
+    cache.put(spec, [details(future)])
+    assert cache.get(spec)
+    # expires at the end of the last trading day, before the TTL
+    clock.t += 12 * 3600 - 1
+    assert cache.get(spec)
+    clock.t += 1
+    assert cache.get(spec) is None
+    assert cache.get(ibi.Contract(conId=551601561)) is None
+
+    # contracts past expiry are not cached
+    cache.put(spec, [details(future)])
+    assert cache.get(spec) is None
+
+    # nor is a lookup that includes an expired contract
+    spec = ibi.Future('ES', exchange='CME')
+    cache.put(spec, [
+        details(future),
+        details(ibi.Future('ES', '20240621', 'CME', conId=568550526))])
+    assert cache.get(spec) is None
+    assert cache.get(ibi.Contract(conId=568550526))
@@ -0,0 +1,98 @@
+import math
+
+import ib_insync as ibi
+
+
+def test_updates_match_lists():
+    book = ibi.DepthBook(2)
+    dom = [[], []]
+    updates = [
+        (0, 'A', 0, 1, 99.0, 5), (0, 'B', 0, 1, 99.5, 3),
+        (2, 'C', 0, 1, 98.0, 7), (1, 'D', 1, 1, 99.25, 4),
+        (0, 'E', 0, 0, 100.0, 6), (1, 'F', 0, 0, 100.5, 2),
+        (0, 'B', 2, 1, 0, 0), (5, 'X', 2, 1, 0, 0)]
+    for position, mm, operation, side, price, size in updates:
+        book.update(position, mm, operation, side, price, size)
+        levels = dom[side]
+        if operation == 0:
+            levels.insert(position, ibi.DOMLevel(price, size, mm))
+        elif operation == 1:
+            levels[position] = ibi.DOMLevel(price, size, mm)
+        elif position < len(levels):
+            levels.pop(position)
+    assert book.domLevels(0) == dom[0]
+    assert book.domLevels(1) == dom[1]
+    assert book.numLevels == [2, 2]
+
+    price, size, mm = book.bids()
+    assert price.tolist() == [99.25, 98.0]
+    assert mm.tolist() == ['D', 'C']
+    assert book.depth(1) == 11
+    assert book.depth(1, 1) == 4
+    assert book.sizeTo(1, 99) == 4
+    assert book.sizeTo(0, 100.5) == 8
+    assert book.imbalance() == (11 - 8) / 19
+    bidAvg = (99.25 * 4 + 98 * 7) / 11
+    askAvg = (100 * 6 + 100.5 * 2) / 8
+    assert math.isclose(
+        book.weightedMid(), (bidAvg * 8 + askAvg * 11) / 19)
+
+    book.clear()
+    assert math.isnan(book.weightedMid())
+    assert math.isnan(book.imbalance())
+
+
+def test_depth_subscription():
+    mock = ibi.MockTWS().start()
+    mock.handlers[10] = lambda session, fields: session.send(
+        13, 1, fields[2], 0, 'ARCA', 0, 1, 99.5, 100, 0)
+    ib = ibi.IB()
+    ib.DepthBookArrays = True
+    ib.connect(port=mock.port)
+    ticker = ib.reqMktDepth(ibi.Stock('AAPL', 'SMART', 'USD'))
+    ib.sleep(0.1)
+    assert ticker.domBook.domLevels(1) == [ibi.DOMLevel(99.5, 100, 'ARCA')]
+    assert not ticker.domBids and not ticker.domTicks
+    ib.disconnect()
+    mock.stop()
+
+
+def test_aggregated_book():
+    book = ibi.AggregatedBook()
+    updates = [
+        (0, 'ARCA', 0, 1, 99.5, 100), (1, 'NSDQ', 0, 1, 99.5, 200),
+        (2, 'BATS', 0, 1, 99.0, 300), (0, 'ARCA', 0, 0, 100.0, 50),
+        (1, 'NSDQ', 0, 0, 100.5, 70)]
+    for u in updates:
+        book.update(*u)
+    assert book.bids() == [(99.5, 300), (99.0, 300)]
+    assert book.asks(1) == [(100.0, 50)]
+    assert book.venues(1, 99.5) == {'ARCA': 100, 'NSDQ': 200}
+
+    # NSDQ moves its bid down to the BATS price
+    book.update(1, 'NSDQ', 1, 1, 99.0, 150)
+    assert book.bids() == [(99.5, 100), (99.0, 450)]
+    book.update(0, 'ARCA', 2, 1, 0, 0)
+    assert book.bids(1) == [(99.0, 450)]
+    assert book.venues(1, 99.5) == {}
+    book.clear()
+    assert book.bids() == [] and book.asks() == []
+
+
+def test_aggregated_book_drift():
+    book = ibi.AggregatedBook()
+    for position, size in enumerate([0.1, 0.2, 0.0]):
+        book.update(position, 'PAXOS', 0, 1, 50000.0, size)
+    book.update(3, 'PAXOS', 0, 1, 49999.0, 0.5)
+    assert book.bids() == [(50000.0, 0.1 + 0.2), (49999.0, 0.5)]
+    # the sizes don't add up to exactly zero again
+    book.update(0, 'PAXOS', 2, 1, 0, 0)
+    book.update(0, 'PAXOS', 2, 1, 0, 0)
+    assert book.bids() == [(49999.0, 0.5)]
+    assert book.venues(1, 50000.0) == {'PAXOS': 0.0}
+    # the row of size zero can still be removed
+    book.update(0, 'PAXOS', 2, 1, 0, 0)
+    assert book.venues(1, 50000.0) == {}
+    assert book.bids() == [(49999.0, 0.5)]
+    book.update(0, 'PAXOS', 1, 1, 49998.0, 0.25)
+    assert book.bids() == [(49998.0, 0.25)]
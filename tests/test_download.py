@@ -0,0 +1,84 @@
+import datetime as dt
+
+import pytest
+
+import ib_insync as ibi
+
+pytest.importorskip('numpy')
+
+utc = dt.timezone.utc
+start = dt.datetime(2024, 1, 2, tzinfo=utc)
+end = dt.datetime(2024, 1, 3, tzinfo=utc)
+contract = ibi.Stock('AAPL', 'SMART', 'USD', conId=265598)
+key = (contract.conId, '1 hour', 'TRADES', True)
+
+
+@pytest.fixture
+def setup(tmp_path):
+    mock = ibi.MockTWS().start()
+    ib = ibi.IB()
+    ib.connect(port=mock.port)
+    cache = ibi.BarCache(str(tmp_path))
+    downloader = ibi.HistoricalDownloader(
+        ib, maxRetries=1, retryDelay=0, timeout=0.2, cache=cache)
+    downloader.IdenticalInterval = 0
+    yield mock, downloader, cache
+    ib.disconnect()
+    mock.stop()
+
+
+def download(downloader):
+    return downloader.download(
+        contract, start, end, '1 hour', 'TRADES', useRTH=True)
+
+
+def test_bars_are_cached(setup):
+    mock, downloader, cache = setup
+    t = int(start.timestamp())
+    numSlots = []
+
+    def reply(session, fields):
+        numSlots.append(len(downloader.ib.errorEvent))
+        session.send(
+            17, fields[1], '', '', 2,
+            t, 1, 2, 0.5, 1.5, 100, 1.2, 10,
+            t + 3600, 1, 2, 0.5, 1.5, 100, 1.2, 10)
+
+    mock.handlers[20] = reply
+    bars = download(downloader)
+    assert [b.date for b in bars] == [
+        start, start + dt.timedelta(hours=1)]
+    # the downloader listens to errors only while downloading
+    assert numSlots == [len(downloader.ib.errorEvent) + 1]
+    assert cache.gaps(key, start, end) == []
+
+
+def test_error_raises_and_is_not_cached(setup):
+    mock, downloader, cache = setup
+    mock.handlers[20] = lambda session, fields: session.send(
+        4, 2, fields[1], 200, 'No security definition has been found', '')
+    numSlots = len(downloader.ib.errorEvent)
+    with pytest.raises(ibi.RequestError) as e:
+        download(downloader)
+    assert e.value.code == 200
+    assert len(downloader.ib.errorEvent) == numSlots
+    assert cache.gaps(key, start, end) == [(start, end)]
+
+
+def test_timeout_is_retried_and_not_cached(setup):
+    mock, downloader, cache = setup
+    requests = []
+    mock.handlers[20] = lambda session, fields: requests.append(fields)
+    assert len(download(downloader)) == 0
+    assert len(requests) == 2
+    assert cache.gaps(key, start, end) == [(start, end)]
+
+
+def test_no_data_is_cached(setup):
+    mock, downloader, cache = setup
+    mock.handlers[20] = lambda session, fields: session.send(
+        4, 2, fields[1], 162,
+        'Historical Market Data Service error message:'
+        'HMDS query returned no data: AAPL@SMART Trades', '')
+    assert len(download(downloader)) == 0
+    assert cache.gaps(key, start, end) == []
@@ -0,0 +1,181 @@
+import os
+
+import pytest
+from conftest import contract, makeTrade, t0
+
+import ib_insync as ibi
+
+
+def makeFill(trade, execId, shares=5):
+    execution = ibi.Execution(
+        execId=execId, time=t0, acctNumber='DU1', exchange='NYSE',
+        side='BOT', shares=shares, price=100,
+        permId=trade.order.permId, clientId=trade.order.clientId,
+        orderId=trade.order.orderId)
+    return ibi.Fill(contract, execution, ibi.CommissionReport(), t0)
+
+
+def writeSession(journal):
+    """Write a session of two trades, a fill and a commission report."""
+    trade = makeTrade(1, permId=1001)
+    key = (1, 1)
+    journal.newTrade(key, trade)
+    trade.orderStatus.status = 'PreSubmitted'
+    journal.orderStatus(
+        key, trade.orderStatus, ibi.TradeLogEntry(t0, 'PreSubmitted'))
+    fill = makeFill(trade, 'e1')
+    journal.fill(key, fill, ibi.TradeLogEntry(t0, 'PreSubmitted', 'Fill'))
+    journal.commissionReport(
+        ibi.CommissionReport(execId='e1', commission=1.25, currency='USD'))
+    journal.newTrade((1, 2), makeTrade(2))
+    journal.close()
+
+
+def test_round_trip(tmp_path):
+    journal = ibi.OrderJournal(str(tmp_path / 'journal'), sync='always')
+    writeSession(journal)
+    trades, fills = journal.replay()
+    assert list(trades) == [(1, 1), (1, 2)]
+    trade = trades[1, 1]
+    assert trade.contract == contract
+    assert trade.order.lmtPrice == 100
+    assert trade.order.permId == 1001
+    assert trade.orderStatus.status == 'PreSubmitted'
+    assert [e.status for e in trade.log] == [
+        'Submitted', 'PreSubmitted', 'PreSubmitted']
+    assert trade.fills == [fills['e1']]
+    assert fills['e1'].execution.shares == 5
+    assert fills['e1'].commissionReport.commission == 1.25
+    assert trades[1, 2].orderStatus.status == 'Submitted'
+
+
+def test_truncated_record_is_skipped(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = ibi.OrderJournal(path)
+    writeSession(journal)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        # a crash halfway through a record
+        f.write(b'\x40\x00\x00\x00\x12\x34')
+    records = list(journal.records())
+    assert len(records) == 5
+    assert os.path.getsize(path) == size
+    trades, _ = journal.replay()
+    assert list(trades) == [(1, 1), (1, 2)]
+
+
+def test_crc_mismatch(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = ibi.OrderJournal(path)
+    writeSession(journal)
+    records = list(journal.records())
+    with open(path, 'r+b') as f:
+        # damage the last byte of the data of the last record
+        f.seek(-1, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 0xff]))
+    assert list(journal.records()) == records[:-1]
+    trades, fills = journal.replay()
+    assert list(trades) == [(1, 1)]
+    assert list(fills) == ['e1']
+
+
+def test_checkpoint_then_replay(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = ibi.OrderJournal(path)
+    writeSession(journal)
+    trades, fills = journal.replay()
+    orphan = makeFill(makeTrade(9, permId=9009), 'e9')
+    fills['e9'] = orphan
+    journal.checkpoint(trades, fills)
+    assert len(list(journal.records())) == 4
+    assert not os.path.exists(path + '.tmp')
+
+    # the journal continues after the checkpoint
+    journal.evictTrade((1, 2))
+    journal.close()
+    trades2, fills2 = journal.replay()
+    assert list(trades2) == [(1, 1)]
+    assert trades2[1, 1].orderStatus == trades[1, 1].orderStatus
+    assert trades2[1, 1].log == trades[1, 1].log
+    assert list(fills2) == ['e1', 'e9']
+    assert fills2['e1'].commissionReport.commission == 1.25
+    assert trades2[1, 1].fills == [fills2['e1']]
+
+
+def test_evicted_trade_takes_its_fills(tmp_path):
+    journal = ibi.OrderJournal(str(tmp_path / 'journal'))
+    writeSession(journal)
+    journal.evictTrade((1, 1))
+    journal.close()
+    trades, fills = journal.replay()
+    assert list(trades) == [(1, 2)]
+    assert fills == {}
+
+
+@pytest.fixture
+def journalPath(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = ibi.OrderJournal(path)
+    # never acknowledged, so it didn't reach TWS
+    journal.newTrade((1, 1), makeTrade(1, status='PendingSubmit'))
+    # acknowledged by TWS, but not known anymore
+    journal.newTrade((1, 2), makeTrade(2, permId=1002))
+    # already completed
+    journal.newTrade((1, 3), makeTrade(3, permId=1003, status='Filled'))
+    # from another client
+    journal.newTrade((2, 4), makeTrade(4, clientId=2))
+    journal.close()
+    return path
+
+
+def test_restore_trades(journalPath):
+    ib = ibi.IB()
+    ib.OrderJournalPath = journalPath
+    restored = ib.restoreTrades()
+    assert [t.order.orderId for t in restored] == [1, 2, 3, 4]
+    assert ib.trades() == restored
+    assert ib.openTrades() == [restored[0], restored[1], restored[3]]
+    # known trades are left alone
+    assert ib.restoreTrades() == []
+
+
+def test_reconcile_trades(journalPath):
+    mock = ibi.MockTWS().start()
+    ib = ibi.IB()
+    ib.OrderJournalPath = journalPath
+    try:
+        ib.connect(port=mock.port)
+        trades = {t.order.orderId: t for t in ib.trades()}
+        assert sorted(trades) == [1, 2, 3, 4]
+        assert trades[1].orderStatus.status == 'Cancelled'
+        assert trades[1].log[-1].message == 'Reconciled'
+        assert trades[2].orderStatus.status == 'Submitted'
+        assert trades[3].orderStatus.status == 'Filled'
+        assert trades[4].orderStatus.status == 'Submitted'
+        assert len(trades[3].log) == 1
+    finally:
+        ib.disconnect()
+        mock.stop()
+
+    # the reconciled state was checkpointed to the journal
+    trades, _ = ibi.OrderJournal(journalPath).replay()
+    assert trades[1, 1].orderStatus.status == 'Cancelled'
+    assert trades[1, 2].orderStatus.status == 'Submitted'
+
+
+def test_reconcile_completed_order(journalPath):
+    ib = ibi.IB()
+    ib.OrderJournalPath = journalPath
+    ib.wrapper.clientId = 1
+    restored = ib.restoreTrades()
+    completed = makeTrade(2, permId=1002, status='Filled')
+    ib._reconcileTrades(restored, [restored[3]], [completed])
+    statuses = [t.orderStatus.status for t in restored]
+    assert statuses == ['Cancelled', 'Filled', 'Filled', 'Submitted']
+    assert ib.openTrades() == [restored[3]]
+    # not reconciled if the open orders are unknown
+    trade = makeTrade(5)
+    ib._reconcileTrades([trade], None, [])
+    assert trade.orderStatus.status == 'Submitted'
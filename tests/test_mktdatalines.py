@@ -0,0 +1,102 @@
+import pytest
+
+import ib_insync as ibi
+
+
+def test_rotate_within_budget():
+    mock = ibi.MockTWS().start()
+    lines = set()
+    maxLines = 0
+
+    def reqMktData(session, fields):
+        nonlocal maxLines
+        reqId = fields[2]
+        lines.add(reqId)
+        maxLines = max(maxLines, len(lines))
+
+        def answer():
+            lines.discard(reqId)
+            session.send(1, 6, reqId, 4, 100.5, 10, 0)
+            session.send(57, 1, reqId)
+
+        ibi.util.getLoop().call_later(0.01, answer)
+
+    mock.handlers[1] = reqMktData
+    ib = ibi.IB()
+    ib.client.MaxRequests = 0
+    ib.connect(port=mock.port)
+    mdl = ibi.MktDataLines(ib, budget=5)
+    contracts = [ibi.Stock(f'SYM{i}', 'SMART', 'USD') for i in range(20)]
+    coverages = mdl.rotate(contracts)
+    assert maxLines == 5
+    assert [c.contract for c in coverages] == contracts
+    assert all(c.ticker.last == 100.5 for c in coverages)
+    assert all(c.latency < 1 for c in coverages)
+    # contracts wait in turn for a line, from the start of the rotation
+    waitTimes = [c.waitTime for c in coverages]
+    assert waitTimes == sorted(waitTimes)
+    assert max(waitTimes[:5]) < 0.01
+    assert waitTimes[-1] >= 3 * 0.01
+    assert mdl.inUse() == 0
+
+    for contract in contracts[:5]:
+        mdl.reqMktData(contract)
+    assert mdl.inUse() == 5
+    with pytest.raises(RuntimeError):
+        mdl.reqMktData(contracts[5])
+    mdl.cancelMktData(contracts[0])
+    assert mdl.available() == 1
+    ib.disconnect()
+    mock.stop()
+
+
+def test_snapshots_stream_with_timeout():
+    mock = ibi.MockTWS().start()
+
+    def reqMktData(session, fields):
+        reqId = fields[2]
+        if fields[4] == 'SLOW':
+            return
+        session.send(1, 6, reqId, 4, 100.5, 10, 0)
+        session.send(57, 1, reqId)
+
+    mock.handlers[1] = reqMktData
+    ib = ibi.IB()
+    ib.client.MaxRequests = 0
+    ib.connect(port=mock.port)
+    mdl = ibi.MktDataLines(ib, budget=3)
+    contracts = [ibi.Stock('SLOW', 'SMART', 'USD')] + [
+        ibi.Stock(f'SYM{i}', 'SMART', 'USD') for i in range(10)]
+
+    async def collect():
+        return [t async for t in mdl.snapshots(contracts, timeout=0.2)]
+
+    tickers = ibi.util.run(collect())
+    assert len(tickers) == 11
+    # the slow one does not hold up the others and comes last
+    assert tickers[-1].contract.symbol == 'SLOW'
+    assert tickers[-1].last != tickers[-1].last
+    assert all(t.last == 100.5 for t in tickers[:-1])
+    assert mdl.inUse() == 0
+    assert not ib.wrapper._futures
+    assert not ib.wrapper._results
+    ib.disconnect()
+    mock.stop()
+
+
+def test_cancel_request():
+    wrapper = ibi.Wrapper(None)
+    contract = ibi.Stock('AAPL', 'SMART', 'USD')
+
+    async def cancel():
+        future = wrapper.startReq(1, contract)
+        wrapper.cancelReq(1)
+        return future
+
+    future = ibi.util.run(cancel())
+    assert future.cancelled()
+    assert not wrapper._futures
+    assert not wrapper._results
+    assert not wrapper._reqId2Contract
+    # a late answer to the cancelled request is ignored
+    wrapper.tickSnapshotEnd(1)
@@ -0,0 +1,53 @@
+import ib_insync as ibi
+from ib_insync.mocktws import MockTWS, SessionCapture
+
+
+def test_connect_and_order_acks():
+    mock = MockTWS(accounts=['DU1', 'DU2']).start()
+    ib = ibi.IB()
+    ib.connect(port=mock.port, clientId=7)
+    assert ib.managedAccounts() == ['DU1', 'DU2']
+    assert mock.sessions[0].clientId == 7
+
+    trade = ib.placeOrder(ibi.Stock('AAPL'), ibi.LimitOrder('BUY', 100, 10))
+    ib.sleep(0.1)
+    assert trade.orderStatus.status == 'Submitted'
+    assert trade.orderStatus.remaining == 100
+    ib.cancelOrder(trade.order)
+    ib.sleep(0.1)
+    assert trade.orderStatus.status == 'Cancelled'
+    ib.disconnect()
+    mock.stop()
+
+
+def test_capture_replay(tmp_path):
+    mock = MockTWS().start()
+    mock.handlers[1] = lambda session, fields: session.send(
+        1, 6, fields[2], 4, 101.5, 200, 0)
+    ib = ibi.IB()
+    capture = SessionCapture()
+    capture.attach(ib.client)
+    ib.connect(port=mock.port)
+    ib.sleep(0.2)
+    ticker = ib.reqMktData(ibi.Stock('AAPL'))
+    ib.sleep(0.1)
+    assert ticker.last == 101.5
+    ib.disconnect()
+    mock.stop()
+
+    path = str(tmp_path / 'session.cap')
+    capture.save(path)
+    capture = SessionCapture.load(path)
+    msgIds = [fields[0] for fields in capture.messages()]
+    assert msgIds[:3] == [str(mock.serverVersion), '9', '15']
+    assert '1' in msgIds
+
+    # the tick is replayed well after subscribing again
+    replay = MockTWS(capture=capture, speed=1).start()
+    ib = ibi.IB()
+    ib.connect(port=replay.port)
+    ticker = ib.reqMktData(ibi.Stock('AAPL'))
+    ib.sleep(0.4)
+    assert ticker.last == 101.5
+    ib.disconnect()
+    replay.stop()
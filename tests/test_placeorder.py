@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from conftest import contract, waitFor
+
+import ib_insync as ibi
+
+
+def breakConnection(ib, monkeypatch):
+    # the socket is lost but not noticed by the event loop yet
+    monkeypatch.setattr(ib.client, 'isConnected', lambda: False)
+
+
+def journalTrades(ib):
+    trades, _ = ibi.OrderJournal(ib.OrderJournalPath).replay()
+    return trades
+
+
+def test_failed_new_order_is_discarded(ib, monkeypatch):
+    newOrders = []
+    ib.newOrderEvent += newOrders.append
+    breakConnection(ib, monkeypatch)
+    with pytest.raises(ConnectionError):
+        ib.placeOrder(contract, ibi.LimitOrder('BUY', 1, 100))
+    assert ib.trades() == []
+    assert ib.openTrades() == []
+    assert ib.openTrades(contract) == []
+    assert newOrders == []
+    assert journalTrades(ib) == {}
+
+
+def test_failed_modification_is_undone(ib, monkeypatch):
+    trade = ib.placeOrder(contract, ibi.LimitOrder('BUY', 1, 100))
+    waitFor(ib, lambda: trade.orderStatus.status == 'Submitted')
+    numLog = len(trade.log)
+    breakConnection(ib, monkeypatch)
+    trade.order.lmtPrice = 101
+    with pytest.raises(ConnectionError):
+        ib.placeOrder(contract, trade.order)
+    assert ib.openTrades() == [trade]
+    assert len(trade.log) == numLog
+    restored = list(journalTrades(ib).values())
+    assert len(restored) == 1
+    assert [e.message for e in restored[0].log] == [
+        e.message for e in trade.log]
+
+
+def test_failed_bulk_orders_are_discarded(ib, monkeypatch):
+    trade = ib.placeOrder(contract, ibi.LimitOrder('BUY', 1, 100))
+    waitFor(ib, lambda: trade.orderStatus.status == 'Submitted')
+    numLog = len(trade.log)
+    breakConnection(ib, monkeypatch)
+    pairs = [
+        (contract, ibi.LimitOrder('BUY', 1, 90 + i)) for i in range(3)]
+    pairs.insert(1, (contract, trade.order))
+    with pytest.raises(ConnectionError):
+        ib.placeOrders(pairs)
+    assert ib.trades() == [trade]
+    assert ib.openTrades() == [trade]
+    assert len(trade.log) == numLog
+    assert list(journalTrades(ib).values())[0].order.orderId \
+        == trade.order.orderId
+    assert len(journalTrades(ib)) == 1
+
+    # the orders can be placed once the connection is back
+    monkeypatch.undo()
+    trades, acks = ib.placeOrders(pairs)
+    waitFor(ib, acks.done)
+    assert len(ib.openTrades()) == 4
+
+
+def holdOrders(mock):
+    # keep the placed orders instead of acking them
+    held = []
+    mock.handlers[3] = lambda session, fields: held.append((session, fields))
+    return held
+
+
+def test_modification_is_acked_by_tws(ib, mock):
+    trade = ib.placeOrder(contract, ibi.LimitOrder('BUY', 1, 100))
+    waitFor(ib, lambda: trade.orderStatus.status == 'Submitted')
+    held = holdOrders(mock)
+    trade.order.lmtPrice = 101
+    trades, acks = ib.placeOrders([(contract, trade.order)])
+    waitFor(ib, lambda: held)
+    ib.sleep(0.1)
+    assert not acks.done()
+    mock._placeOrder(*held[0])
+    waitFor(ib, acks.done)
+    assert acks.result() == [trade]
+
+
+def test_order_acks_time_out(ib, mock):
+    holdOrders(mock)
+    trades, acks = ib.placeOrders(
+        [(contract, ibi.LimitOrder('BUY', 1, 100))], timeout=0.1)
+    waitFor(ib, acks.done)
+    with pytest.raises(asyncio.TimeoutError):
+        acks.result()
+
+
+def test_order_acks_fail_on_disconnect(ib, mock):
+    held = holdOrders(mock)
+    trades, acks = ib.placeOrders(
+        [(contract, ibi.LimitOrder('BUY', 1, 100))])
+    waitFor(ib, lambda: held)
+    ib.disconnect()
+    assert acks.done()
+    with pytest.raises(ConnectionError):
+        acks.result()
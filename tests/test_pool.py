@@ -0,0 +1,58 @@
+import pytest
+
+import ib_insync as ibi
+
+contracts = [
+    ibi.Stock(symbol, 'SMART', 'USD', conId=conId)
+    for symbol, conId in [('AAPL', 1), ('MSFT', 2), ('IBM', 3), ('F', 4)]]
+
+
+def snapshot(session, fields):
+    # last price tells which client ID and contract the request came from
+    reqId, conId = fields[2], int(fields[3])
+    session.send(1, 6, reqId, 4, session.clientId * 1000 + conId, 1, 0)
+    session.send(57, 1, reqId)
+
+
+def dropConnection(mock, pool, clientId):
+    session = next(s for s in mock.sessions if s.clientId == clientId)
+    session.close()
+    ib = pool.ibs[clientId - 1]
+    while ib.isConnected():
+        try:
+            ib.sleep(0.01)
+        except ConnectionError:
+            # the socket disconnect is raised from within the event loop
+            pass
+
+
+@pytest.fixture
+def setup():
+    mock = ibi.MockTWS().start()
+    mock.handlers[1] = snapshot
+    pool = ibi.IBPool(size=3, port=mock.port).connect()
+    yield mock, pool
+    pool.disconnect()
+    mock.stop()
+
+
+def test_least_loaded_routing(setup):
+    mock, pool = setup
+    assert pool.isConnected()
+    assert [ib.client.clientId for ib in pool.ibs] == [1, 2, 3]
+    tickers = pool.reqTickers(*contracts)
+    assert [t.contract for t in tickers] == contracts
+    assert [t.last for t in tickers] == [2001, 3002, 2003, 3004]
+    assert [pool.load(i) for i in range(3)] == [0, 0, 0]
+
+
+def test_connection_drops(setup):
+    mock, pool = setup
+    dropConnection(mock, pool, 3)
+    assert not pool.isConnected()
+    tickers = pool.reqTickers(*contracts)
+    assert [t.last for t in tickers] == [2001, 2002, 2003, 2004]
+
+    dropConnection(mock, pool, 2)
+    with pytest.raises(ConnectionError):
+        pool.reqTickers(*contracts)
@@ -0,0 +1,116 @@
+import time
+
+from conftest import contract, waitFor
+
+import ib_insync as ibi
+import ib_insync.wrapper
+
+
+def place(ib, n):
+    trades = [
+        ib.placeOrder(contract, ibi.LimitOrder('BUY', 1, 100 + i))
+        for i in range(n)]
+    waitFor(ib, lambda: all(
+        t.orderStatus.status == 'Submitted' for t in trades))
+    return trades
+
+
+def cancel(ib, trades):
+    for trade in trades:
+        ib.cancelOrder(trade.order)
+    waitFor(ib, lambda: all(
+        t.orderStatus.status == 'Cancelled' for t in trades))
+
+
+def fill(ib, trade, execId):
+    order = trade.order
+    execution = ibi.Execution(
+        execId=execId, orderId=order.orderId, clientId=order.clientId,
+        permId=order.permId, shares=1, price=100)
+    ib.wrapper.execDetails(-1, trade.contract, execution)
+    ib.wrapper.orderStatus(
+        order.orderId, 'Filled', 1, 0, 100, order.permId, 0, 100,
+        order.clientId, '')
+
+
+def test_max_done_trades(ib):
+    ib.MaxDoneTrades = 2
+    trades = place(ib, 5)
+    cancel(ib, trades[:4])
+    assert ib.trades() == [trades[2], trades[3], trades[4]]
+    assert ib.openTrades() == [trades[4]]
+    archived = ib.archivedTrades()
+    assert [t.order.orderId for t in archived] == [
+        t.order.orderId for t in trades[:2]]
+    assert all(t.orderStatus.status == 'Cancelled' for t in archived)
+
+
+def test_max_done_trade_age(ib):
+    ib.MaxDoneTradeAge = 0.05
+    trades = place(ib, 3)
+    cancel(ib, trades[:1])
+    assert trades[0] in ib.trades()
+    time.sleep(0.1)
+    cancel(ib, trades[1:2])
+    assert ib.trades() == trades[1:]
+    assert [t.order.orderId for t in ib.archivedTrades()] == [
+        trades[0].order.orderId]
+
+
+def test_prune_after_events(ib):
+    ib.MaxDoneTrades = 1
+    trades = place(ib, 2)
+    cancel(ib, trades[:1])
+    seen = []
+
+    def onStatus(trade):
+        seen.append((trade.log[-1].status, trades[0] in ib.trades()))
+
+    ib.orderStatusEvent += onStatus
+    cancel(ib, trades[1:])
+    # the events see the completed trade logged and the older one
+    # not evicted yet
+    assert seen[-1] == ('Cancelled', True)
+    assert ib.trades() == trades[1:]
+
+
+def test_fills_are_evicted_with_their_trade(ib):
+    ib.MaxDoneTrades = 1
+    trades = place(ib, 2)
+    fill(ib, trades[0], 'e0')
+    fill(ib, trades[1], 'e1')
+    assert ib.trades() == trades[1:]
+    assert [f.execution.execId for f in ib.fills()] == ['e1']
+    archived = ib.archivedTrades()
+    assert [f.execution.execId for f in archived[0].fills] == ['e0']
+
+    # a repeated execution of the evicted trade isn't added again
+    fill(ib, trades[0], 'e0')
+    assert [f.execution.execId for f in ib.fills()] == ['e1']
+    assert len(ib.trades()) == 1
+
+    # nor is a late commission report
+    report = ibi.CommissionReport(execId='e0', commission=1.5)
+    ib.wrapper.commissionReport(report)
+    assert [f.execution.execId for f in ib.fills()] == ['e1']
+
+
+def test_evicted_exec_ids_are_bounded(ib, monkeypatch):
+    monkeypatch.setattr(ib_insync.wrapper, '_maxEvictedExecIds', 2)
+    ib.MaxDoneTrades = 1
+    trades = place(ib, 4)
+    for i, trade in enumerate(trades):
+        fill(ib, trade, f'e{i}')
+    assert list(ib.wrapper._evictedExecIds) == ['e1', 'e2']
+
+
+def test_max_trade_log(ib):
+    ib.MaxTradeLog = 2
+    trade, = place(ib, 1)
+    for price in (101, 102, 103):
+        trade.order.lmtPrice = price
+        ib.placeOrder(trade.contract, trade.order)
+    assert [e.message for e in trade.log] == ['Modify', 'Modify']
+    ib.cancelOrder(trade.order)
+    assert len(trade.log) == 2
+    assert trade.log[-1].status == 'PendingCancel'
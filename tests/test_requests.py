@@ -5,6 +5,15 @@ import ib_insync as ibi
 pytestmark = pytest.mark.asyncio
 
 
+@pytest.fixture(scope='session')
+async def ib():
+    # connects to a running TWS or gateway
+    ib = ibi.IB()
+    await ib.connectAsync()
+    yield ib
+    ib.disconnect()
+
+
 async def test_request_error_raised(ib):
     contract = ibi.Forex('EURUSD')
     order = ibi.MarketOrder('BUY', 100)
@@ -0,0 +1,77 @@
+import ib_insync as ibi
+from ib_insync.client import _contractFields
+
+
+def reference(fields):
+    """Serialize without any caching, as the client used to do."""
+    parts = []
+    for field in fields:
+        if isinstance(field, ibi.Contract):
+            parts += [str(v) for v in _contractFields(field)]
+        elif field is None:
+            parts.append('')
+        elif isinstance(field, bool):
+            parts.append('1' if field else '0')
+        else:
+            parts.append(str(field))
+    parts.append('')
+    return '\0'.join(parts).encode()
+
+
+def contracts():
+    return [
+        ibi.Stock('AAPL', 'SMART', 'USD'),
+        ibi.Stock('AAPL', 'SMART', 'USD', conId=265598),
+        ibi.Option('SPY', '20240119', 470, 'C', 'SMART'),
+        ibi.Option('SPY', '20240119', 470.0, 'C', 'SMART'),
+        ibi.Option('SPY', '20240119', 470.5, 'C', 'SMART'),
+        ibi.Future('ES', '202403', 'CME', multiplier='50'),
+        ibi.Contract(conId=True),
+        ibi.Contract(conId=1),
+        ibi.Forex('EURUSD')]
+
+
+def test_cached_equals_uncached():
+    client = ibi.Client(ibi.Wrapper(None))
+    messages = [
+        (3, 12, c, '', '', 'BUY', 100, 'LMT', 1.5) for c in contracts()]
+    messages += [(1, 5, c) for c in contracts()]
+    messages += [(c, 7) for c in contracts()]
+    messages.append((1, contracts()[0], contracts()[2], 'x'))
+    for _ in range(2):
+        # the second time around the contracts come from the cache
+        for fields in messages:
+            assert client._serialize(fields) == reference(fields)
+            client2 = ibi.Client(ibi.Wrapper(None))
+            assert client2._serialize(fields) == reference(fields)
+
+
+def test_equal_values_of_other_type():
+    client = ibi.Client(ibi.Wrapper(None))
+    a = client._serialize([ibi.Option('SPY', '20240119', 470, 'C')])
+    b = client._serialize([ibi.Option('SPY', '20240119', 470.0, 'C')])
+    assert b'\x00470\x00' in a
+    assert b'\x00470.0\x00' in b
+
+
+def test_modified_contract():
+    client = ibi.Client(ibi.Wrapper(None))
+    contract = ibi.Stock('AAPL', 'SMART', 'USD')
+    client._serialize([contract])
+    contract.conId = 265598
+    assert client._serialize([contract]) == reference([contract])
+
+
+def test_least_recently_used_are_evicted():
+    client = ibi.Client(ibi.Wrapper(None))
+    stocks = [ibi.Stock(f'S{i}', 'SMART', 'USD') for i in range(10001)]
+    for stock in stocks[:10000]:
+        client._serialize([stock])
+    client._serialize([stocks[0]])
+    client._serialize([stocks[10000]])
+    cache = client._contractCache
+    assert len(cache) == 10000
+    keys = [key[:12] for key in cache]
+    assert _contractFields(stocks[0]) in keys
+    assert _contractFields(stocks[1]) not in keys
+    assert _contractFields(stocks[10000]) in keys
@@ -0,0 +1,210 @@
+import pytest
+
+import ib_insync.client
+from ib_insync import Client, Wrapper
+
+
+class FakeLoop:
+    """Event loop stand-in with a manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        timer = FakeTimer(when, callback, args)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, dt):
+        """Advance the clock, running the timers at their due time."""
+        end = self.now + dt
+        while True:
+            due = [
+                t for t in self.timers
+                if not t.cancelled and t.when <= end]
+            if not due:
+                break
+            timer = min(due, key=lambda t: t.when)
+            self.timers.remove(timer)
+            self.now = max(self.now, timer.when)
+            timer.callback(*timer.args)
+        self.now = end
+
+
+class FakeTimer:
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeConn:
+
+    def __init__(self):
+        self.sent = []
+
+    def sendMsgs(self, buf):
+        self.sent.extend(msg[4:-1].decode() for msg in buf)
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = FakeLoop()
+    monkeypatch.setattr(ib_insync.client, 'getLoop', lambda: loop)
+    return loop
+
+
+@pytest.fixture
+def client(loop):
+    client = Client(Wrapper(None))
+    client.conn = FakeConn()
+    return client
+
+
+def msg(msgId, n):
+    return f'{msgId}\0{n}\0'
+
+
+def test_no_throttling_ignores_class_budgets(client, loop):
+    client.MaxRequests = 0
+    client.ClassBudgets = (0, 0, 0, 10)
+    client.reset()
+    client.sendMsgs([msg(9, n) for n in range(100)])
+    assert len(client.conn.sent) == 100
+    assert not client._isThrottling
+    assert not loop.timers
+
+
+def test_burst_then_steady_rate(client, loop):
+    client.sendMsgs([msg(1, n) for n in range(100)])
+    assert len(client.conn.sent) == client.RequestsBurst
+    assert client._isThrottling
+    loop.advance(1)
+    assert len(client.conn.sent) == client.RequestsBurst + client.MaxRequests
+    loop.advance(1.2)
+    assert len(client.conn.sent) == 100
+    assert not client._isThrottling
+    assert client.conn.sent == [msg(1, n)[:-1] for n in range(100)]
+
+
+def test_rate_within_any_interval(client, loop):
+    times = []
+    for step in range(400):
+        client.sendMsgs([msg(1, step)])
+        times += [loop.now] * (len(client.conn.sent) - len(times))
+        loop.advance(0.01)
+    limit = client.MaxRequests + client.RequestsBurst
+    for i, t in enumerate(times):
+        inWindow = sum(
+            1 for t2 in times[i:] if t2 < t + client.RequestsInterval)
+        assert inWindow <= limit
+
+
+def test_priority_class_goes_first(client, loop):
+    client.sendMsgs([msg(1, n) for n in range(50)])
+    client.sendMsgs([msg(3, 0)])
+    assert msg(3, 0)[:-1] not in client.conn.sent
+    loop.advance(1 / client.MaxRequests + 1e-6)
+    assert client.conn.sent[-1] == msg(3, 0)[:-1]
+
+
+def test_budgeted_class_does_not_starve_others(client, loop):
+    client.ClassBudgets = (20, 0, 0, 0)
+    client.reset()
+    client.sendMsgs([msg(3, n) for n in range(200)])
+    client.sendMsgs([msg(1, n) for n in range(200)])
+    for _ in range(400):
+        loop.advance(0.01)
+    orders = [m for m in client.conn.sent if m.startswith('3\0')]
+    mktData = [m for m in client.conn.sent if m.startswith('1\0')]
+    # orders are capped by their budget, market data gets the rest
+    assert len(orders) <= client.RequestsBurst + 4 * 20
+    assert len(mktData) >= 4 * (client.MaxRequests - 20)
+    assert orders == [msg(3, n)[:-1] for n in range(len(orders))]
+    stats = client.throttleStats()
+    assert stats[Client.ORDERS].sent == len(orders)
+    assert stats[Client.ORDERS].queued == 200 - len(orders)
+    assert stats[Client.MARKETDATA].maxDelay > 0
+
+
+def test_reference_data_budget(client, loop):
+    budget = client.ClassBudgets[Client.REFERENCEDATA]
+    client.sendMsgs([msg(9, n) for n in range(100)])
+    loop.advance(1)
+    sent = len(client.conn.sent)
+    assert sent <= client.RequestsBurst + budget
+    assert sent >= budget
+
+
+def test_connection_stats(client, loop):
+    client._apiReady = True
+    client.conn.numBytesSent = client.conn.numMsgSent = 0
+    client.sendMsgs([msg(1, n) for n in range(10)])
+    loop.advance(1)
+    stats = client.connectionStats()
+    # a tuple, with the histogram of delays appended
+    startTime, duration, *_, delays = stats
+    assert delays is stats.throttleDelays
+    assert stats._asdict()['throttleDelays'] == delays
+    assert delays[0] == client.RequestsBurst
+    assert sum(delays.values()) == 10
+    assert client.connectionStats().throttleDelays is not delays
+
+
+def reqMktData(reqId):
+    return f'1\00011\0{reqId}\0'
+
+
+def cancelMktData(reqId):
+    return f'2\0002\0{reqId}\0'
+
+
+def placeOrder(orderId, lmtPrice):
+    return f'3\0{orderId}\0LMT\0{lmtPrice}\0'
+
+
+def cancelOrder(orderId):
+    return f'4\0001\0{orderId}\0'
+
+
+def test_cancel_of_queued_request_drops_both(client, loop):
+    client.sendMsgs([reqMktData(n) for n in range(10)])
+    client.sendMsgs([cancelMktData(9)])
+    loop.advance(1)
+    assert client.conn.sent == [reqMktData(n)[:-1] for n in range(9)]
+    assert not client._pending
+    assert not client._isThrottling
+
+    # a cancel of a request that was sent can go first
+    client.sendMsgs([reqMktData(n) for n in range(10, 20)])
+    client.sendMsgs([cancelMktData(10)])
+    loop.advance(1)
+    sent = client.conn.sent[9:]
+    assert len(sent) == 11
+    assert sent.index(reqMktData(10)[:-1]) \
+        < sent.index(cancelMktData(10)[:-1])
+
+
+def test_cancel_and_modify_keep_their_order(client, loop):
+    client.sendMsgs([reqMktData(n) for n in range(10)])
+    # a cancel followed by a modification, and the other way around;
+    # an order is never dropped, as it may modify a live order
+    client.sendMsgs([cancelOrder(77), placeOrder(77, 101)])
+    client.sendMsgs([placeOrder(78, 100), cancelOrder(78)])
+    loop.advance(1)
+    sent = client.conn.sent
+    assert len(sent) == 14
+    assert sent.index(cancelOrder(77)[:-1]) \
+        < sent.index(placeOrder(77, 101)[:-1])
+    assert sent.index(placeOrder(78, 100)[:-1]) \
+        < sent.index(cancelOrder(78)[:-1])
+    assert not client._pending
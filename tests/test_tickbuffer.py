@@ -0,0 +1,48 @@
+import ib_insync as ibi
+
+contract = ibi.Stock('AAPL', 'SMART', 'USD', conId=265598)
+
+
+def test_trades_counted_once():
+    ib = ibi.IB()
+    ib.TickBufferSize = 10
+    wrapper = ib.wrapper
+    ticker = wrapper.startTicker(1, ibi.Stock('AAPL'), 'mktData')
+    for price, size in [(10.0, 5), (10.5, 7)]:
+        wrapper.tcpDataArrived()
+        wrapper.priceSizeTick(1, 4, price, size)
+        wrapper.tickSize(1, 5, size)
+        wrapper.priceSizeTick(1, 1, price - 0.1, 100)
+        wrapper.tcpDataProcessed()
+    time, price, size = ticker.tickBuffer.trades()
+    assert price.tolist() == [10.0, 10.5]
+    assert size.tolist() == [5, 7]
+    assert ticker.tickBuffer.vwap() == (10 * 5 + 10.5 * 7) / 12
+    assert ticker.tickBuffer.trades(1)[1].tolist() == [10.5]
+
+
+def test_trades_from_rt_volume():
+    mock = ibi.MockTWS().start()
+    ib = ibi.IB()
+    ib.TickBufferSize = 10
+    ib.connect(port=mock.port)
+    try:
+        wrapper = ib.wrapper
+        ticker = ib.reqMktData(contract, '233')
+        reqId = wrapper.ticker2ReqId['mktData'][ticker]
+        for price, size, t in [(10.0, 5, 1700000000000),
+                               (10.5, 7, 1700000001000)]:
+            # TWS sends the same trade as a last and an RT volume tick
+            wrapper.tcpDataArrived()
+            wrapper.priceSizeTick(reqId, 4, price, size)
+            wrapper.tickSize(reqId, 5, size)
+            wrapper.tickString(
+                reqId, 48, f'{price};{size};{t};1000;10.3;true')
+            wrapper.tcpDataProcessed()
+        time, price, size = ticker.tickBuffer.trades()
+        assert price.tolist() == [10.0, 10.5]
+        assert size.tolist() == [5, 7]
+        assert ticker.tickBuffer.vwap() == (10 * 5 + 10.5 * 7) / 12
+    finally:
+        ib.disconnect()
+        mock.stop()
@@ -0,0 +1,57 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from ib_insync.ticker import Bar, BarList, Tickfilter
+
+t0 = datetime(2024, 1, 2, 15, 30, tzinfo=timezone.utc)
+
+
+def feed(source, ticks):
+    for seconds, price, size in ticks:
+        source.emit(t0 + timedelta(seconds=seconds), price, size)
+
+
+def test_bar_list_trims_in_chunks():
+    bars = BarList(maxLength=8)
+    lengths = []
+    for i in range(100):
+        bars.append(Bar(t0 + timedelta(seconds=i), close=i))
+        lengths.append(len(bars))
+    assert max(lengths) == 10
+    assert min(lengths[8:]) == 8
+    assert [b.close for b in bars[-8:]] == list(range(92, 100))
+
+
+def test_bars_with_max_length():
+    source = Tickfilter((4,))
+    tickBars = source.tickbars(2, maxLength=2)
+    dollarBars = source.dollarbars(1000)
+    imbalanceBars = source.imbalancebars(2)
+    feed(source, [
+        (0, 10, 50), (1, 11, 50), (2, 12, 10), (3, 12, 10),
+        (4, 11, 100), (5, 10, 10), (6, 9, 10)])
+
+    assert len(tickBars.bars) == 2
+    assert [b.close for b in tickBars.bars] == [10, 9]
+    assert [b.count for b in dollarBars.bars] == [2, 3, 2]
+    assert dollarBars.bars[1].volume == 120
+    # up, up completes; then up, down, down, down completes on -2
+    assert [b.count for b in imbalanceBars.bars] == [3, 4]
+
+
+def test_rolling_aggregators():
+    source = Tickfilter((4,))
+    vwap = source.vwap(10)
+    twap = source.twap(10)
+    vol = source.volatility(10)
+    ewma = source.ewma(0.5)
+    values = []
+    vwap.connect(lambda time, value: values.append(value))
+    feed(source, [(0, 10, 100), (5, 20, 100), (12, 30, 200)])
+
+    assert values == [10, 15, 80 / 3]
+    # 10 for 0..5 and 20 for 5..12 of the window 2..12
+    assert math.isclose(twap.value, (10 * 3 + 20 * 7) / 10)
+    assert math.isclose(
+        vol.value, math.hypot(math.log(20 / 10), math.log(30 / 20)))
+    assert ewma.value == 22.5
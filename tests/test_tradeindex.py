@@ -0,0 +1,172 @@
+import itertools
+
+import pytest
+from conftest import makeTrade, waitFor
+
+import ib_insync as ibi
+from ib_insync.wrapper import TradeIndex
+
+contracts = [
+    ibi.Stock('AAPL', 'SMART', 'USD', conId=265598),
+    ibi.Stock('MSFT', 'SMART', 'USD', conId=272093)]
+accounts = ['DU1', 'DU2']
+orderRefs = ['', 'a', 'b']
+
+
+def bruteForce(trades, openOnly=False, **criteria):
+    values = {
+        'conId': lambda t: t.contract.conId,
+        'account': lambda t: t.order.account,
+        'orderRef': lambda t: t.order.orderRef,
+        'parentId': lambda t: t.order.parentId}
+    return [
+        t for t in trades
+        if (not openOnly or t.isActive())
+        and all(values[k](t) == v for k, v in criteria.items())]
+
+
+def allCriteria():
+    options = {
+        'conId': [None] + [c.conId for c in contracts],
+        'account': [None] + accounts,
+        'orderRef': [None] + orderRefs[1:],
+        'parentId': [None, 1, 2]}
+    for combo in itertools.product(*options.values()):
+        yield {k: v for k, v in zip(options, combo) if v is not None}
+
+
+def keyed(trades):
+    return sorted(t.order.orderId for t in trades)
+
+
+@pytest.fixture
+def trades():
+    trades = {}
+    for orderId, (contract, account, orderRef, parentId) in enumerate(
+            itertools.product(contracts, accounts, orderRefs, [0, 1, 2]),
+            start=10):
+        trades[orderId] = makeTrade(
+            orderId, contract, account=account, orderRef=orderRef,
+            parentId=parentId)
+    return trades
+
+
+def test_select_matches_brute_force(trades):
+    index = TradeIndex()
+    for key, trade in trades.items():
+        index.update(key, trade)
+    for criteria in allCriteria():
+        for openOnly in (False, True):
+            assert keyed(index.select(openOnly, **criteria)) == keyed(
+                bruteForce(trades.values(), openOnly, **criteria))
+
+
+def test_status_transitions(trades):
+    index = TradeIndex()
+    for key, trade in trades.items():
+        index.update(key, trade)
+    assert len(index.openTrades) == len(trades)
+    assert not index.doneTrades
+
+    # completing moves a trade from open to done, once
+    done = [k for k in trades if k % 3 == 0]
+    for key in done:
+        trades[key].orderStatus.status = 'Filled'
+        index.update(key, trades[key])
+    doneTimes = dict(index.doneTrades)
+    assert list(doneTimes) == done
+    for key in done:
+        index.update(key, trades[key])
+    assert index.doneTrades == doneTimes
+
+    for criteria in allCriteria():
+        for openOnly in (False, True):
+            assert keyed(index.select(openOnly, **criteria)) == keyed(
+                bruteForce(trades.values(), openOnly, **criteria))
+
+
+def test_changed_order_is_reindexed(trades):
+    index = TradeIndex()
+    for key, trade in trades.items():
+        index.update(key, trade)
+    key, trade = next(iter(trades.items()))
+    trade.order.account = 'DU3'
+    trade.order.orderRef = 'c'
+    index.update(key, trade)
+    assert index.select(account='DU3') == [trade]
+    assert index.select(orderRef='c', openOnly=True) == [trade]
+    assert trade not in index.select(account=accounts[0])
+    assert keyed(index.select(account=accounts[0])) == keyed(
+        bruteForce(trades.values(), account=accounts[0]))
+
+
+def test_remove(trades):
+    index = TradeIndex()
+    for key, trade in trades.items():
+        index.update(key, trade)
+    removed = [k for k in trades if k % 2]
+    trades[removed[0]].orderStatus.status = 'Cancelled'
+    index.update(removed[0], trades[removed[0]])
+    for key in removed:
+        index.remove(key)
+        del trades[key]
+    index.remove(12345)
+    assert not index.doneTrades
+    assert keyed(index.select()) == sorted(trades)
+    assert keyed(index.select(True)) == sorted(trades)
+    for criteria in allCriteria():
+        assert keyed(index.select(**criteria)) == keyed(
+            bruteForce(trades.values(), **criteria))
+    # no empty buckets are left behind
+    for key in list(trades):
+        index.remove(key)
+    assert all(not idx for idx in index._indexes.values())
+    assert not index._values and not index.openTrades
+
+
+@pytest.fixture
+def mock():
+    mock = ibi.MockTWS(accounts=accounts).start()
+    yield mock
+    mock.stop()
+
+
+def test_ib_filters(ib):
+    placed = []
+    for contract, account, orderRef in itertools.product(
+            contracts, accounts, orderRefs):
+        order = ibi.LimitOrder(
+            'BUY', 1, 100, account=account, orderRef=orderRef)
+        placed.append(ib.placeOrder(contract, order))
+    parent = placed[0]
+    child = ib.placeOrder(contracts[0], ibi.LimitOrder(
+        'SELL', 1, 110, parentId=parent.order.orderId))
+    placed.append(child)
+    waitFor(ib, lambda: all(
+        t.orderStatus.status == 'Submitted' for t in placed))
+
+    cancelled = placed[1::3]
+    for trade in cancelled:
+        ib.cancelOrder(trade.order)
+    waitFor(ib, lambda: all(
+        t.orderStatus.status == 'Cancelled' for t in cancelled))
+
+    assert len(ib.trades()) == len(placed)
+    assert len(ib.openTrades()) == len(placed) - len(cancelled)
+    for contract in (None, *contracts):
+        for account in ['', *accounts]:
+            for orderRef in orderRefs:
+                args = (contract, account, orderRef)
+                criteria = ib._tradeCriteria(*args, 0)
+                expected = bruteForce(placed, **criteria)
+                assert keyed(ib.trades(*args)) == keyed(expected)
+                assert sorted(o.orderId for o in ib.orders(*args)) \
+                    == keyed(expected)
+                expectedOpen = bruteForce(placed, True, **criteria)
+                assert keyed(ib.openTrades(*args)) == keyed(expectedOpen)
+                assert sorted(o.orderId for o in ib.openOrders(*args)) \
+                    == keyed(expectedOpen)
+    assert ib.trades(parentId=parent.order.orderId) == [child]
+    assert ib.openOrders(
+        contracts[0], parentId=parent.order.orderId) == [child.order]
+    assert ib.openTrades(contracts[1], parentId=parent.order.orderId) == []